@@ -0,0 +1,102 @@
+"""
+Benchmark of the betting algorithm on a synthetic dataset (see benchmarks.synthetic_dataset).
+
+Times loading with DBLoader, preprocessing.start, EventCollection.calculate_bet_sizes, MultiEventCollection.from_event_dataframe
+for every k in K_VALUES and overlap_utility_grouped_by_day of the single events and of every multi-event collection.
+Preprocessing is also run with per-stage profiling (see bet_algorithm.profiling) for a breakdown of its stages.
+Timings, sizes, the stage breakdown and the dataset parameters are saved as JSON to OUTPUT (with the current commit, if any) to compare across commits.
+
+With the default tax almost no event has a positive edge, so TAX defaults to 1 here (see bench_backtest).
+
+Usage: python -m benchmarks.bench_algorithm [DAYS [MATCHES_PER_DAY [OUTPUT [TAX]]]]
+"""
+
+import sys
+import json
+import tempfile
+import platform
+import subprocess
+from datetime import datetime, timedelta
+from time import time
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.preprocessing as preprocessing
+import betting_assistant.bet_algorithm.profiling as profiling
+from betting_assistant.bet_algorithm.event_collections import EventCollection, MultiEventCollection
+from betting_assistant.bet_algorithm.events import Event
+from benchmarks.synthetic_dataset import write_dataset, BET_TYPES, BOOKMAKERS
+
+
+K_VALUES = [2, 3]
+FIRST_DAY = datetime(2023, 1, 1)
+SEED = 0
+
+
+def timed(f):
+    start = time()
+    result = f()
+    return result, time() - start
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    n_matches = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    output = sys.argv[3] if len(sys.argv) > 3 else "bench_algorithm.json"
+    Event.TAX = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+
+    days = [f"{day.year}_{day.month}_{day.day}" for day in (FIRST_DAY + timedelta(days=i) for i in range(n_days))]
+    timings, sizes = dict(), dict()
+
+    with tempfile.TemporaryDirectory() as root:
+        _, timings['generate'] = timed(lambda: write_dataset(root, days, n_matches, seed=SEED))
+
+        data_loading.scraper_package_path = root
+        data, timings['load'] = timed(lambda: data_loading.DBLoader(days=days).all_data)
+
+    event_df, timings['preprocessing.start'] = timed(lambda: preprocessing.start(data))
+    sizes['rows'], sizes['events'] = len(data), len(event_df)
+
+    with profiling.profile_stages() as profiler:
+        preprocessing.start(data.copy())
+    stages = profiler.report()
+
+    collection = EventCollection(event_df)
+    _, timings['EventCollection.calculate_bet_sizes'] = timed(collection.calculate_bet_sizes)
+    sizes['events with bets'] = int((collection.event_table.s.sum(axis=1) > 0).sum())
+
+    utilities, timings['overlap_utility_grouped_by_day (k=1)'] = timed(collection.overlap_utility_grouped_by_day)
+    final_budgets = {'1': float(utilities.prod())}
+
+    for k in K_VALUES:
+        multi_collection, timings[f'MultiEventCollection.from_event_dataframe (k={k})'] = timed(lambda: MultiEventCollection.from_event_dataframe(event_df, k))
+        sizes[f'multi-events (k={k})'] = len(multi_collection.get_event_df())
+
+        utilities, timings[f'overlap_utility_grouped_by_day (k={k})'] = timed(multi_collection.overlap_utility_grouped_by_day)
+        final_budgets[str(k)] = float(utilities.prod())
+
+    report = {
+        'commit': commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dataset': {'days': n_days, 'matches per day': n_matches, 'bet types': BET_TYPES, 'bookmakers': BOOKMAKERS, 'seed': SEED, 'tax': Event.TAX},
+        'sizes': sizes,
+        'timings': timings,
+        'preprocessing stages': stages.to_dict(orient='records'),
+        'final budgets': final_budgets,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print(f"{n_days} days x {n_matches} matches: {sizes['rows']} odds rows, {sizes['events']} events ({sizes['events with bets']} with bets)")
+    for name, seconds in timings.items():
+        print(f"{name + ':':48} {seconds:8.3f} s")
+    print(stages.to_string(index=False))
+    print(f"final budgets: {final_budgets}")
+    print(f"saved to {output}")
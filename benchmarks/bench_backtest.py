@@ -0,0 +1,120 @@
+"""
+Benchmark of the overlap backtest (GenericEventCollection.overlap_utility).
+
+Compares the OverlapSimulation engine against the previous DataFrame.apply implementation and checks that both give the same final budget,
+and that the incremental portfolio state gives the final budget of building the collective utility state from scratch for every decision.
+
+Usage: python -m benchmarks.bench_backtest [START_DATE END_DATE [K [TAX]]]
+
+With the default tax almost no event has a positive edge; TAX = 1 leaves enough bets for a meaningful comparison.
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from time import time
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.preprocessing as preprocessing
+import betting_assistant.bet_algorithm.utils as utils
+from betting_assistant.bet_algorithm.backtest import OverlapSimulation
+from betting_assistant.bet_algorithm.event_collections import EventCollection, MultiEventCollection
+from betting_assistant.bet_algorithm.events import Event
+from betting_assistant.bet_algorithm.portfolio import Portfolio
+from betting_assistant.bet_algorithm.utility import CollectiveUtilityOptimizer
+
+
+def legacy_overlap_utility(event_df: pd.DataFrame) -> float:
+    """
+    Previous implementation: bet and evaluation copies of the frame sorted by date and walked with DataFrame.apply.
+    """
+
+    actions_bet = event_df.copy()
+    actions_bet["Action"] = "Bet"
+    actions_bet["Date spec"] = actions_bet.index.get_level_values('Retrieval date')
+
+    actions_eval = event_df.copy()
+    actions_eval["Action"] = "Evaluation"
+    actions_eval["Date spec"] = actions_eval["End date"]
+
+    actions = pd.concat([actions_bet, actions_eval], axis=0)
+    actions = preprocessing.sort_by_column(actions, "Date spec")
+
+    budget = 1.0
+    portfolio = Portfolio()
+    def handle_row(row):
+        nonlocal budget
+        action = row["Action"]
+
+        if action == "Bet" and budget < 0.0001:
+            row["Event"].replaced = True
+
+        elif action == "Bet":
+            event = row["Event"]
+            event.replaced = False
+            event.retrieval_budget = budget
+            event.calculate_entangled_bet_size(ongoing_events=portfolio.entangled_events(event), portfolio=portfolio)
+
+            if event.s.sum() > 0:
+                portfolio.place(event)
+                budget -= np.sum(event.s) * event.retrieval_budget
+            else:
+                event.replaced = True
+
+        elif action == "Evaluation" and not row["Event"].replaced:
+            event = row["Event"]
+            portfolio.settle(event)
+            budget += event.total_return(row["Outcome"])
+
+    actions.apply(handle_row, axis=1)
+
+    return budget
+
+
+class StatelessPortfolio(Portfolio):
+    """
+    Portfolio whose collective optimizers build their state from the ongoing events (state=None).
+    """
+
+    def collective_optimizer(self, ongoing_events, event) -> CollectiveUtilityOptimizer:
+        return CollectiveUtilityOptimizer(ongoing_events=ongoing_events, event=event)
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+if __name__ == "__main__":
+    start, end = (sys.argv[1], sys.argv[2]) if len(sys.argv) > 2 else ('2022_10_10', '2022_10_25')
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    if len(sys.argv) > 4:
+        Event.TAX = float(sys.argv[4])
+
+    event_df = preprocessing.start(data_loading.StoreLoader(days=utils.days_list_dbformat(start, end)).all_data)
+    collection = EventCollection(event_df) if k == 1 else MultiEventCollection.from_event_dataframe(event_df, k)
+    event_df = collection.get_event_df()
+
+    # bet sizes are recalculated by both runs, so the second run sees the same inputs as the first
+    new, t_new = timed(lambda: OverlapSimulation.from_event_df(event_df).run())
+    old, t_old = timed(lambda: legacy_overlap_utility(event_df))
+
+    stateless_simulation = OverlapSimulation.from_event_df(event_df)
+    stateless_simulation.portfolio = StatelessPortfolio()
+    stateless, t_stateless = timed(stateless_simulation.run)
+
+    # with no bets made, only building the action order and the action loop itself are timed
+    simulation = OverlapSimulation.from_event_df(event_df)
+    simulation.MIN_BUDGET = np.inf
+    _, t_new_driver = timed(simulation.run)
+
+    print(f"{start} - {end}: {len(event_df)} events ({k}-event combinations)")
+    print(f"final budget:           {new:.12f} (previous: {old:.12f})")
+    print(f"DataFrame.apply:        {t_old:8.3f} s")
+    print(f"OverlapSimulation:      {t_new:8.3f} s ({t_new_driver:.3f} s of it ordering and dispatch)")
+    print(f"without state:          {t_stateless:8.3f} s (final budget {stateless:.12f})")
+    print(f"speedup:                {t_old / t_new:8.1f}x ({t_old - t_new:.3f} s less)")
+
+    assert new == old
+    assert np.isclose(new, stateless, rtol=1e-9, atol=0)
@@ -0,0 +1,151 @@
+"""
+Benchmark of the betexplorer odds table parser (scraper_betexplorer.get_betexplorer_odds).
+
+Parses a corpus of match-odds responses with the one-pass table walk (with BeautifulSoup and with lxml.html trees)
+and with the previous selector-per-bookmaker parser, and checks that all give the same bets.
+By default the corpus is synthetic (see benchmarks.scraper_feeds); RESPONSE_DIR is a directory of captured responses named '<bet type>_<match id>.txt'.
+
+Usage: python -m benchmarks.bench_betexplorer_parser [N_RESPONSES | RESPONSE_DIR]
+"""
+
+import os
+import sys
+import random
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from time import time
+from typing import List
+
+import betting_assistant.scraper.scraper_betexplorer as scraper_betexplorer
+from betting_assistant.scraper.scraper_betexplorer import bookie_ids, betexplorer_odds_response, get_betexplorer_odds
+from benchmarks.scraper_feeds import BETEXPLORER_LINES, betexplorer_corpus, load_betexplorer_corpus
+
+
+def select_bookie_rows(soup, bookie_id: int) -> list:
+    # "tr:has(> td:has(> a[data-bid='...']))"
+    rows = soup.select("tr:has(a[data-bid='" + str(bookie_id) + "'])")
+    return [tr for tr in rows if any(td.name == 'td' and td.find('a', attrs={'data-bid': str(bookie_id)}, recursive=False) is not None for td in tr.find_all(recursive=False))]
+
+
+def legacy_get_betexplorer_odds(http_response: tuple, bt_values: List[int]) -> dict: # bet type values
+    """
+    Previous implementation: one selector query over the whole tree per bookmaker.
+
+    The nested :has() selectors it used are rejected by soupsieve 3; 'select_bookie_rows()' evaluates them as before.
+    """
+
+    match_id, bet_type, soup = http_response
+    d = datetime.now()
+    retrieval_date = '{d.day},{d.month},{d.year},{d.hour}'.format(d = d) + d.strftime(",%M")
+    no_val = np.any(pd.isnull(bt_values))
+    bt_values = [str(val) for val in bt_values]
+
+
+
+    div = soup.select_one('tr:has(> th[class="table-main__detail-odds"])')
+    if div is not None:
+        n_outcomes = len(div.select('th[class="table-main__detail-odds"]'))
+    else:
+        n_outcomes = 0 # we won't be able to fetch odds
+
+    
+
+    bets = {val: {"ID": match_id, "Retrieval date": retrieval_date} for val in bt_values}
+
+
+    if no_val:
+        for bookie_id in bookie_ids:
+            a = next(iter(select_bookie_rows(soup, bookie_id)), None)
+
+            if a is None:
+                continue
+            
+            b = a.select('td[data-odd]:not(.inactive)')
+
+            if b is None or len(b) != n_outcomes:
+                continue
+
+            bets[str(np.nan)][str(bookie_id)] = str([float(elem_odds['data-odd']) for elem_odds in b])
+
+    else:
+        for bookie_id in bookie_ids:
+            a = select_bookie_rows(soup, bookie_id)
+
+            if a is None or a == []:
+                continue
+            
+            for tr in a:
+                val = tr.select_one('td[class="table-main__doubleparameter"]')
+                if val is None:
+                    continue
+                val = val.text
+
+                try:
+                    val = str(float(val))
+                except:
+                    continue
+
+                if val not in bt_values:
+                    continue
+                
+                b = tr.select('td[data-odd]:not(.inactive)')
+
+                if b is None or len(b) != n_outcomes:
+                    continue
+
+                bets[str(val)][str(bookie_id)] = str([float(elem_odds['data-odd']) for elem_odds in b])
+
+
+    return bets
+
+
+def requested_values(rng: random.Random, bet_type: str) -> list:
+    # bet type values of flashscore bets: a few of the lines and one that is not listed, or NaN
+    if bet_type not in BETEXPLORER_LINES:
+        return [np.nan]
+    return rng.sample(BETEXPLORER_LINES[bet_type], 3) + [10.5]
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        corpus = load_betexplorer_corpus(sys.argv[1])
+    else:
+        corpus = betexplorer_corpus(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
+    rng = random.Random(0)
+    values = [requested_values(rng, bet_type) for _, bet_type, _ in corpus]
+
+    def build(tree_builder):
+        scraper_betexplorer.TREE_BUILDER = tree_builder
+        return [betexplorer_odds_response(match_id, bet_type, text) for match_id, bet_type, text in corpus]
+
+    soups, t_soup = timed(lambda: build('bs4'))
+    trees, t_lxml = timed(lambda: build('lxml'))
+
+    old, t_old = timed(lambda: [legacy_get_betexplorer_odds(response, bt_values) for response, bt_values in zip(soups, values)])
+    new, t_new = timed(lambda: [get_betexplorer_odds(response, bt_values) for response, bt_values in zip(soups, values)])
+    new_lxml, t_new_lxml = timed(lambda: [get_betexplorer_odds(response, bt_values) for response, bt_values in zip(trees, values)])
+
+    n_bytes = sum(len(text.encode()) for _, _, text in corpus)
+    print(f"{len(corpus)} responses, {n_bytes / 2**20:.1f} MiB, {sum(len(bet) - 2 for bets in new for bet in bets.values())} bookmaker odds")
+    print(f"BeautifulSoup tree:              {t_soup:8.3f} s")
+    print(f"lxml.html tree:                  {t_lxml:8.3f} s")
+    print(f"selector per bookmaker (soup):   {t_old:8.3f} s")
+    print(f"one-pass table walk (soup):      {t_new:8.3f} s ({t_old / t_new:.1f}x)")
+    print(f"one-pass table walk (lxml):      {t_new_lxml:8.3f} s")
+    print(f"total, previous vs lxml:         {t_soup + t_old:8.3f} s -> {t_lxml + t_new_lxml:.3f} s ({(t_soup + t_old) / (t_lxml + t_new_lxml):.1f}x)")
+
+    # retrieval dates may differ if the runs cross a minute
+    def comparable(bets):
+        return [(val, [(key, value) for key, value in bet.items() if key != "Retrieval date"]) for val, bet in bets.items()]
+
+    mismatches = [match_id for (match_id, _, _), o, n, l in zip(corpus, old, new, new_lxml) if not comparable(o) == comparable(n) == comparable(l)]
+    for match_id in mismatches[:10]:
+        print("mismatch:", match_id)
+    assert len(mismatches) == 0
@@ -0,0 +1,95 @@
+"""
+Benchmark of joining odds with match data and results in Loader._combine_odds_match_data.
+
+Compares the index-aligned join against the previous per-row lookup implementation and checks that both give the same output.
+
+Usage: python -m benchmarks.bench_data_loading [START_DATE END_DATE]
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from time import time
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.utils as utils
+
+
+def legacy_combine_odds_match_data(loader: data_loading.Loader) -> pd.DataFrame:
+    """
+    Previous implementation: one .loc lookup per odds row and column, results parsed row by row.
+    """
+
+    def get_date(id):
+        try:
+            return loader.match_data.loc[id]["Date"]
+        except:
+            return np.nan
+
+    def get_result(id):
+        try:
+            return loader.raw_results.loc[id]["Result"]
+        except:
+            return np.nan
+
+    def get_partial_results(id):
+        try:
+            return loader.raw_results.loc[id]["Partial results"]
+        except:
+            return np.nan
+
+    dates = loader.odds["ID"].apply(get_date)
+    results_raw = loader.odds["ID"].apply(get_result)
+    results = results_raw.apply(lambda x: np.nan if np.any(pd.isnull(x)) else [int(elem) for elem in x[1:-1].split(', ')])
+    partial_results_raw = loader.odds["ID"].apply(get_partial_results)
+    partial_results = partial_results_raw.apply(lambda x: np.nan if np.any(pd.isnull(x)) else [[int(elem1) for elem1 in elem[1:].split(', ')] for elem in x[1:-2].split('], ')])
+
+    data = pd.DataFrame()
+    data["Date"] = dates
+    data["Result"] = results
+    data["Partial results"] = partial_results
+
+    data = pd.concat([data, loader.odds], axis=1)
+    data = data.dropna(subset=["Date"])
+
+    return data
+
+
+def load_raw_results(days):
+    dfs = []
+    for day in days:
+        try:
+            results = pd.read_csv(data_loading.scraper_package_path + '/data/results/' + day + '.csv')
+            results.index = results["ID"]
+            dfs.append(results.drop(columns=["ID"]))
+        except FileNotFoundError:
+            pass
+
+    results = pd.DataFrame() if len(dfs) == 0 else pd.concat(dfs, axis=0)
+    return results[~results.index.duplicated(keep='first')]
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+if __name__ == "__main__":
+    start, end = (sys.argv[1], sys.argv[2]) if len(sys.argv) == 3 else ('2022_9_20', '2022_9_27')
+    days = utils.days_list_dbformat(start, end)
+
+    loader = data_loading.DBLoader(days=days)
+    loader.raw_results = load_raw_results(days)
+
+    print(f"{len(days)} days, {len(loader.odds)} odds rows, {len(loader.match_data)} matches, {len(loader.results)} results")
+
+    parsed_results, t_parse_new = timed(loader._load_results)
+    new, t_new = timed(loader._combine_odds_match_data)
+    old, t_old = timed(lambda: legacy_combine_odds_match_data(loader))
+
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+    print(f"per-row lookup:      {t_old:8.3f} s")
+    print(f"index-aligned join:  {t_new:8.3f} s (+ {t_parse_new:.3f} s parsing results)")
+    print(f"speedup:             {t_old / (t_new + t_parse_new):8.1f}x")
@@ -0,0 +1,184 @@
+"""
+Benchmark of the flashscore odds feed parser (scraper_flashscore.get_flashscore_odds).
+
+Parses a corpus of feeds with the single-pass tokenizer and with the previous tree-based parser, and checks that both give the same bets.
+By default the corpus is synthetic (see benchmarks.scraper_feeds); FEED_DIR is a directory of captured feeds named '<sport>_<match id>.txt'.
+
+Usage: python -m benchmarks.bench_flashscore_parser [N_FEEDS | FEED_DIR]
+"""
+
+import os
+import re
+import sys
+import numpy as np
+from time import time
+
+from betting_assistant.scraper.aliases import flashscore_aliases
+from betting_assistant.scraper.scraper_flashscore import get_flashscore_odds
+from benchmarks.scraper_feeds import flashscore_corpus, load_flashscore_corpus
+
+
+def legacy_get_flashscore_odds(http_response: dict) -> list:
+    """
+    Previous implementation: regex records, a tree of Node objects rebuilt per call and a quadratic duplicate scan.
+    """
+
+    match_id = http_response['match_id']
+    text = http_response['text']
+    sport = http_response['sport']
+
+    matches = list(re.finditer(r"(.*?)~", text))
+
+    class Node:
+        def __init__(self, level, parent, label, value):
+            self.children = []
+            self.level = level
+            self.parent = parent
+            self.label = label
+            self.value = value
+
+    class Tree:
+        def __init__(self):
+            self.root = Node(-1, None, None, None)
+
+        def addNode(self, level, label, value):
+            c = self.root
+            while len(c.children) > 0 and (c.children[0].level != level):
+                c = c.children[-1]
+            c.children.append(Node(level, c, label, value))
+        
+        @staticmethod
+        def printableTree(root):
+            if len(root.children) == 0:
+                return []
+
+            if root.children[0].level == 3: # compile odds
+                return [[elem1 for elem1 in [root.label, root.value] if elem1 is not None] + elem for elem in [[{k.label: str(k.value) for k in root.children}]]]
+
+            else:
+                r = []
+
+                for c in root.children:
+                    r += [[elem1 for elem1 in [root.label, root.value] if elem1 is not None] + elem for elem in Tree.printableTree(c)]
+
+                return r
+
+        def printTree(self):
+            for elem in Tree.printableTree(self.root):
+                odds = elem.pop(-1)
+                bet_data = {"Bet type": elem}
+                bet_data.update(odds)
+                print(bet_data)
+        
+        # clean branches with no odds
+        @staticmethod
+        def staticCleanTree(node):
+            # check if leaf
+            if len(node.children) == 0:
+                if node.level != 3:
+                    # prune single branch
+                    while node.parent is not None and len(node.parent.children) == 1:
+                        node = node.parent
+
+                    if node.parent is not None:
+                        p = node.parent
+                        p.children.remove(node)
+                    else:
+                        node.children = []
+            
+            else:
+                for c in node.children:
+                    Tree.staticCleanTree(c)
+        
+        def cleanTree(self):
+            Tree.staticCleanTree(self.root)
+            
+        def matchBets(self):
+            match_bets = []
+
+            for elem in Tree.printableTree(self.root):
+                odds = elem.pop(-1)
+                bet_data = {"Bet type": elem}
+                bet_data.update(odds)
+                match_bets.append(bet_data)
+            
+            return match_bets
+
+        
+
+    tree = Tree()
+
+    for match in matches:
+        d = {elem.group(1): elem.group(2) for elem in re.finditer(r"(.*?)÷(.*?)¬", match.group(1))}
+        if 'OA' in d.keys():
+            tree.addNode(0, d['OAI'], None)
+        elif 'OB' in d.keys():
+            tree.addNode(1, d['OBI'], None)
+        elif 'OC' in d.keys():
+            tree.addNode(2, None, d['OC'])
+        elif 'OE' in d.keys() and d['OG']=='1':
+            tree.addNode(3, d['OE'], [float(re.search(r"[.0-9]*$", val).group(0)) for key, val in d.items() if key[0] == 'X'])
+
+    tree.cleanTree()
+
+    # tree.printTree()
+
+    match_bets = []
+
+    for bet in tree.matchBets():
+        bt_id = None
+
+        if str(bet['Bet type']) in flashscore_aliases[sport].keys():
+            bt_id = flashscore_aliases[sport][str(bet['Bet type'])]
+            bet['Bet type value'] = np.nan
+            bet['Bet type'] = bt_id
+
+            found_duplicate = False
+            for i, b in enumerate(match_bets):
+                if b['Bet type'] == bet['Bet type'] and b['Bet type value'] == bet['Bet type value']:
+                    found_duplicate = True
+                    if len(bet.keys()) > len(b.keys()):
+                        match_bets[i] = bet
+                        break
+            if not found_duplicate:
+                match_bets.append(bet)
+
+        elif str(bet['Bet type'][:-1]) in flashscore_aliases[sport].keys():
+            bt_id = flashscore_aliases[sport][str(bet['Bet type'][:-1])]
+            bet['Bet type value'] = float(bet['Bet type'][-1])
+            bet['Bet type'] = bt_id
+            match_bets.append(bet)
+    
+    return match_bets
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        corpus = load_flashscore_corpus(sys.argv[1])
+    else:
+        corpus = flashscore_corpus(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
+    responses = [{'match_id': match_id, 'text': text, 'sport': sport} for match_id, sport, text in corpus]
+
+    old, t_old = timed(lambda: [legacy_get_flashscore_odds(response) for response in responses])
+    new, t_new = timed(lambda: [get_flashscore_odds(response) for response in responses])
+
+    n_bytes = sum(len(response['text'].encode()) for response in responses)
+    print(f"{len(responses)} feeds, {n_bytes / 2**20:.1f} MiB, {sum(map(len, new))} bets")
+    print(f"tree parser:          {t_old:8.3f} s ({n_bytes / 2**20 / t_old:6.1f} MiB/s)")
+    print(f"single-pass parser:   {t_new:8.3f} s ({n_bytes / 2**20 / t_new:6.1f} MiB/s)")
+    print(f"speedup:              {t_old / t_new:8.1f}x")
+
+    # bets are compared with their keys in order, and NaN bet type values as equal
+    def comparable(bets):
+        return [[(key, 'nan' if key == 'Bet type value' and value != value else value) for key, value in bet.items()] for bet in bets]
+
+    mismatches = [response['match_id'] for response, o, n in zip(responses, old, new) if comparable(o) != comparable(n)]
+    for match_id in mismatches[:10]:
+        print("mismatch:", match_id)
+    assert len(mismatches) == 0
@@ -0,0 +1,59 @@
+"""
+Benchmark of the on-disk cache of preprocessed data (bet_algorithm.preprocessed_cache).
+
+Loads two overlapping ranges of days, the second starting and ending OFFSET days after the first, into an empty temporary cache,
+then the second range again from the warm cache. Reports the time of every load and the number of days preprocessed for it,
+and checks that every load equals preprocessing.start(DBLoader(days).all_data).
+
+Usage: python -m benchmarks.bench_preprocessed_cache [START_DATE END_DATE [OFFSET]]
+"""
+
+import sys
+import tempfile
+import pandas as pd
+from datetime import datetime, timedelta
+from time import time
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.preprocessing as preprocessing
+import betting_assistant.bet_algorithm.preprocessed_cache as preprocessed_cache
+import betting_assistant.bet_algorithm.utils as utils
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+def shifted(day: str, offset: int) -> str:
+    date = datetime(*map(int, day.split('_'))) + timedelta(days=offset)
+    return f"{date.year}_{date.month}_{date.day}"
+
+
+if __name__ == "__main__":
+    start, end = (sys.argv[1], sys.argv[2]) if len(sys.argv) > 2 else ('2022_10_10', '2022_10_16')
+    offset = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    ranges = [utils.days_list_dbformat(start, end), utils.days_list_dbformat(shifted(start, offset), shifted(end, offset))]
+
+    # count the days preprocessed for every load
+    preprocessed = []
+    preprocess_day = preprocessed_cache.preprocess_day
+    def counted_preprocess_day(day, info_days):
+        preprocessed.append(day)
+        return preprocess_day(day, info_days)
+    preprocessed_cache.preprocess_day = counted_preprocess_day
+
+    with tempfile.TemporaryDirectory() as cache_path:
+        preprocessed_cache.cache_path = cache_path
+
+        for name, days in [('first range, cold', ranges[0]), ('second range', ranges[1]), ('second range, warm', ranges[1])]:
+            preprocessed.clear()
+            cached, t_cached = timed(lambda: preprocessed_cache.load(days))
+            uncached, t_uncached = timed(lambda: preprocessing.start(data_loading.DBLoader(days=days).all_data))
+
+            print(f"{name + ':':20} {days[0]} - {days[-1]}: {len(cached)} rows, {len(preprocessed)} of {len(days)} days preprocessed, "
+                  f"{t_cached:.3f} s (uncached: {t_uncached:.3f} s)")
+
+            pd.testing.assert_frame_equal(cached, uncached)
@@ -0,0 +1,57 @@
+"""
+Benchmark of result classification (preprocessing.add_outcome_column).
+
+Classifies every odds row with a result in the archive with ResultClassifier.classify_array and with the row-wise ResultClassifier.classify,
+and checks that both give the same outcomes.
+
+Usage: python -m benchmarks.bench_result_classification [START_DATE END_DATE]
+"""
+
+import os
+import sys
+import numpy as np
+from time import time
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.data_store as data_store
+import betting_assistant.bet_algorithm.utils as utils
+import betting_assistant.scraper.segment_log as segment_log
+from betting_assistant.bet_algorithm.result_classification import ResultClassifier
+
+
+def archive_days():
+    return segment_log.days(os.path.join(data_store.data_path, 'odds'))
+
+
+def timed(f):
+    t = time()
+    result = f()
+    return result, time() - t
+
+
+if __name__ == "__main__":
+    days = utils.days_list_dbformat(sys.argv[1], sys.argv[2]) if len(sys.argv) == 3 else archive_days()
+
+    data = data_loading.DBLoader(days=days).all_data
+    data = data[data["Result"].notna()]
+
+    bet_types = data["Bet type"].to_numpy(dtype=np.int64)
+    bet_type_values = data["Bet type value"].to_numpy(dtype=float)
+    goals = np.array(data["Result"].tolist(), dtype=np.int64).reshape((-1, 2))
+
+    def classify_rows():
+        # previous add_outcome_column
+        return data.apply(lambda x: ResultClassifier.bet_type_outcomes[x["Bet type"]-1].index(ResultClassifier.classify(x["Bet type"], x["Bet type value"], x["Result"], x["Partial results"])), axis=1).to_numpy()
+
+    old, t_old = timed(classify_rows)
+    new, t_new = timed(lambda: ResultClassifier.classify_array(bet_types, bet_type_values, goals[:, 0], goals[:, 1]))
+
+    print(f"{len(days)} days, {len(data)} rows with results")
+    print(f"DataFrame.apply of classify:      {t_old:8.3f} s")
+    print(f"ResultClassifier.classify_array:  {t_new:8.3f} s")
+    print(f"speedup:                          {t_old / t_new:8.1f}x")
+
+    mismatches = np.flatnonzero(old != new)
+    for i in mismatches[:10]:
+        print("mismatch:", bet_types[i], bet_type_values[i], goals[i], old[i], new[i])
+    assert len(mismatches) == 0
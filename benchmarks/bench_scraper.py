@@ -0,0 +1,144 @@
+"""
+Throughput benchmark of the scraper (scraper_main.scrape_matches) end to end.
+
+Scrapes matches from local stub servers (benchmarks.stub_server.StubServer) standing in for flashscore.pl and betexplorer.com,
+with LATENCY seconds added to every response, for several numbers of matches and per-host connection caps.
+Reports matches/s, requests/s, CPU time spent parsing responses in the scraping thread, and peak memory traced by tracemalloc
+(in a separate run, as tracing slows the scraper down). The stub servers run in the same process.
+
+By default responses are synthetic (see benchmarks.scraper_feeds). With RECORDED_DAY (Y_M_D), the matches in that day's match data
+are scraped from responses recorded with http_cache.MODE = 'record' (the latest recording at or before http_cache.TIME).
+
+Usage: python -m benchmarks.bench_scraper [LATENCY] [RECORDED_DAY]
+"""
+
+import io
+import os
+import sys
+import json
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from time import time, thread_time
+from typing import Dict, List
+
+import betting_assistant.scraper.scraper_main as scraper_main
+import betting_assistant.scraper.scraper_flashscore as scraper_flashscore
+import betting_assistant.scraper.scraper_betexplorer as scraper_betexplorer
+import betting_assistant.scraper.http_cache as http_cache
+import betting_assistant.scraper.segment_log as segment_log
+from betting_assistant.scraper.aliases import sports
+from benchmarks.stub_server import StubServer
+from benchmarks.scraper_feeds import scrape_responses
+
+
+FLASHSCORE = "https://d.flashscore.pl"
+BETEXPLORER = "https://www.betexplorer.com"
+
+MATCH_COUNTS = [25, 100, 200]
+CONNECTIONS = {'2/4': {"d.flashscore.pl": 2, "www.betexplorer.com": 4},
+               '3/6 (default)': {},
+               '6/12': {"d.flashscore.pl": 6, "www.betexplorer.com": 12}} # flashscore/betexplorer connections
+
+# functions parsing responses, timed in the scraper modules
+PARSERS = [(scraper_flashscore, 'get_flashscore_odds'), (scraper_betexplorer, 'betexplorer_odds_response'), (scraper_betexplorer, 'get_betexplorer_odds')]
+
+
+class RecordedResponses:
+    """
+    Responses of 'origin' recorded in http_cache, looked up by request path like the response dictionaries of StubServer.
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin
+
+    def get(self, path: str) -> str | None:
+        return http_cache.lookup(self.origin + path, http_cache.TIME, latest=True)
+
+
+def recorded_responses(day: str):
+    match_data = segment_log.read_day(os.path.join(os.path.dirname(scraper_main.__file__), 'data', 'match_data'), day)
+    match_links = {sport: match_data[match_data['Sport'] == sport]['Link'].tolist() for sport in sports}
+
+    return RecordedResponses(FLASHSCORE), RecordedResponses(BETEXPLORER), match_links
+
+
+def first_matches(match_links: Dict[str, List[str]], n: int) -> Dict[str, List[str]]:
+    links = [(sport, link) for sport in sports for link in match_links[sport]][:n]
+    return {sport: [link for link_sport, link in links if link_sport == sport] for sport in sports}
+
+
+@contextmanager
+def parse_timer():
+    # yields a list whose element accumulates the thread CPU time spent in PARSERS
+    cpu = [0.0]
+
+    def timed_parser(f):
+        def wrapper(*args, **kwargs):
+            start = thread_time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                cpu[0] += thread_time() - start
+        return wrapper
+
+    originals = [(module, name, getattr(module, name)) for module, name in PARSERS]
+    for module, name, f in originals:
+        setattr(module, name, timed_parser(f))
+    try:
+        yield cpu
+    finally:
+        for module, name, f in originals:
+            setattr(module, name, f)
+
+
+def scrape(flashscore, betexplorer, match_links: Dict[str, List[str]], latency: float, connections: Dict[str, int], trace: bool = False) -> dict:
+    with StubServer(flashscore, latency) as f, StubServer(betexplorer, latency) as b, parse_timer() as parse_cpu, redirect_stdout(io.StringIO()):
+        fetcher_options = {"connections": connections, "origins": {FLASHSCORE: f.url, BETEXPLORER: b.url}}
+
+        if trace:
+            tracemalloc.start()
+        start, start_cpu = time(), thread_time()
+        bets = scraper_main.scrape_matches(match_links, fetcher_options=fetcher_options)
+        wall, cpu = time() - start, thread_time() - start_cpu
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        requests = f.requests + b.requests
+
+    return {'bets': bets, 'wall': wall, 'cpu': cpu, 'parse_cpu': parse_cpu[0], 'requests': requests, 'peak': peak}
+
+
+# retrieval dates may differ if the runs cross a minute
+def comparable(bets: list) -> List[str]:
+    return [json.dumps({key: str(value) for key, value in bet.items() if key != 'Retrieval date'}, sort_keys=True) for bet in bets]
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+
+    if len(sys.argv) > 2:
+        flashscore, betexplorer, match_links = recorded_responses(sys.argv[2])
+    else:
+        flashscore, betexplorer, match_links = scrape_responses(max(MATCH_COUNTS))
+
+    print(f"latency {latency * 1000:.0f} ms, betexplorer tree builder '{scraper_betexplorer.TREE_BUILDER}'")
+    print(f"{'matches':>7} {'connections':>14} {'bets':>6} {'requests':>8} {'wall s':>7} {'matches/s':>9} {'requests/s':>10} {'CPU s':>6} {'parse CPU s':>11} {'peak MiB':>8}")
+
+    for n in MATCH_COUNTS:
+        links = first_matches(match_links, n)
+        n_matches = sum(len(sport_links) for sport_links in links.values())
+        reference = None
+
+        for name, connections in CONNECTIONS.items():
+            result = scrape(flashscore, betexplorer, links, latency, connections)
+            peak = scrape(flashscore, betexplorer, links, latency, connections, trace=True)['peak']
+
+            print(f"{n_matches:>7} {name:>14} {len(result['bets']):>6} {result['requests']:>8} {result['wall']:>7.2f} {n_matches / result['wall']:>9.1f} "
+                  f"{result['requests'] / result['wall']:>10.1f} {result['cpu']:>6.2f} {result['parse_cpu']:>11.2f} {peak / 2**20:>8.1f}")
+
+            # every connection setting scrapes the same bets
+            if reference is None:
+                reference = comparable(result['bets'])
+            assert comparable(result['bets']) == reference
@@ -0,0 +1,106 @@
+"""
+Benchmark of the numerical utility optimizers (UtilityOptimizer and CollectiveUtilityOptimizer) on k-event combinations.
+
+Compares the previous setup (random starting point, finite-difference gradients, null variable in the search space)
+with analytic gradients, the deterministic starting point and the reduced search space.
+Reports objective and gradient evaluations per solve, wall time and the difference in attained expected log utility.
+
+Usage: python -m benchmarks.bench_utility [DAY [K [N_EVENTS [TAX]]]]
+
+With the default tax almost no combination has a positive edge and both setups stop at zero bet size;
+TAX = 1 leaves enough value bets for a meaningful comparison.
+"""
+
+import sys
+import numpy as np
+from time import time
+from scipy.optimize import minimize
+
+import betting_assistant.bet_algorithm.data_loading as data_loading
+import betting_assistant.bet_algorithm.preprocessing as preprocessing
+import betting_assistant.bet_algorithm.utility as utility
+from betting_assistant.bet_algorithm.event_collections import MultiEventCollection
+from betting_assistant.bet_algorithm.events import Event
+
+
+class Counted:
+    """
+    Wrap a function and count its calls.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.f(*args)
+
+
+def legacy_solve(uopt, budget: float):
+    f = Counted(uopt.expected_log_utility)
+    result = minimize(lambda x: -f(x),
+                    (1/(uopt.event.m+1))*np.random.random(uopt.event.m),
+                    constraints=[{'type': 'ineq', 'fun': lambda x: budget-x.sum()},
+                                {'type': 'eq', 'fun': lambda x: x[-1]}],
+                    bounds=[(0,1)]*uopt.event.m,
+                    tol=0.0001)
+    return result.x, f.calls, 0
+
+def new_solve(uopt, budget: float):
+    f = Counted(uopt.expected_log_utility)
+    g = Counted(uopt.gradient_log_utility)
+    s0 = utility.initial_bet_size(uopt.event, budget)
+    s = utility.maximize_log_utility(f, g, s0, budget)
+    return s, f.calls, g.calls
+
+
+def run(name, optimizers, budgets):
+    print(name)
+    for label, solve in (("previous", legacy_solve), ("analytic", new_solve)):
+        t = time()
+        solutions = [solve(uopt, budget) for uopt, budget in zip(optimizers, budgets)]
+        t = time() - t
+
+        n_f = np.mean([sol[1] for sol in solutions])
+        n_g = np.mean([sol[2] for sol in solutions])
+        utilities = np.array([uopt.expected_log_utility(sol[0]) for uopt, sol in zip(optimizers, solutions)])
+        print(f"  {label:10s} {n_f:7.1f} utility evals, {n_g:6.1f} gradient evals per solve, {1000*t/len(optimizers):7.2f} ms per solve")
+        if label == "previous":
+            previous_utilities = utilities
+    print(f"  max utility difference (analytic - previous): {np.max(utilities - previous_utilities):.2e}, min: {np.min(utilities - previous_utilities):.2e}")
+
+
+if __name__ == "__main__":
+    day = sys.argv[1] if len(sys.argv) > 1 else '2022_9_27'
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    n_events = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    if len(sys.argv) > 4:
+        Event.TAX = float(sys.argv[4])
+
+    np.random.seed(0)
+
+    event_df = preprocessing.start(data_loading.StoreLoader(days=[day]).all_data)
+    events = MultiEventCollection.from_event_dataframe(event_df.iloc[:k*n_events], k).get_event_df()["Event"].tolist()
+
+    optimizers = [utility.UtilityOptimizer(event) for event in events]
+    run(f"UtilityOptimizer, {len(optimizers)} {k}-event combinations", optimizers, [1.0]*len(optimizers))
+
+    # every combination is placed against the previous combination that shares a bet with it
+    collective, budgets = [], []
+    last_with_bet_id = dict()
+    for event in events:
+        ongoing = [last_with_bet_id[bid] for bid in event.bet_id if bid in last_with_bet_id][:1]
+        event.retrieval_budget = 1.0
+        if len(ongoing) > 0:
+            cuopt = utility.CollectiveUtilityOptimizer(ongoing_events=ongoing, event=event)
+            collective.append(cuopt)
+            budgets.append(1-cuopt.current_bet_size)
+
+        # give the event a small nonzero bet so that it matters as an ongoing event
+        event.s = np.full(event.varshape, 0.01)
+        event.calculated_prt = event.profit_ratio_tensor(event.s)
+        for bid in event.bet_id:
+            last_with_bet_id[bid] = event
+
+    run(f"CollectiveUtilityOptimizer, {len(collective)} {k}-event combinations with one ongoing combination", collective, budgets)
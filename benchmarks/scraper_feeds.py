@@ -0,0 +1,157 @@
+"""
+Synthetic scraper responses for the scraper benchmarks.
+
+Flashscore odds feeds are generated in the format read by scraper_flashscore.get_flashscore_odds:
+bet type (OA), scope (OB) and bet type value (OC) records followed by bookmaker odds records (OE), with inactive odds,
+odds movements ('1.90[d]1.85'), lines without active odds and bet types or scopes the scraper does not know.
+Betexplorer match-odds responses are JSON-wrapped odds tables (one per line for lined bet types) as read by scraper_betexplorer.get_betexplorer_odds,
+with bookmakers the scraper does not know, inactive odds and unparsable bet type values.
+
+Captured responses can be used instead of synthetic ones: a directory of files named '<sport>_<match id>.txt' with flashscore feeds,
+or '<bet type>_<match id>.txt' with betexplorer responses.
+
+scrape_responses() gives both sites' responses of whole scrape cycles, keyed by request path, for serving with benchmarks.stub_server.StubServer.
+"""
+
+import os
+import json
+import random
+from typing import Dict, List, Tuple
+
+from betting_assistant.scraper.aliases import sports, polish_bks, betexplorer_aliases
+from betting_assistant.scraper.scraper_betexplorer import bookie_ids
+
+
+FLASHSCORE_BET_TYPES = {'1x2': 3, 'under-over': 2, 'moneyline': 2, 'asian-handicap': 2, 'double-chance': 3, 'both-teams-to-score': 2,
+                        'correct-score': 1, 'odd-even': 2} # bet type -> number of outcomes; the last two are not scraped
+FLASHSCORE_SCOPES = ['ft', 'ft-include-ot', '1st-half']
+LINES = {'under-over': [0.5, 1.5, 2.5, 3.5, 4.5, 5.5], 'asian-handicap': [-2.5, -1.5, -0.5, 0.5, 1.5, 2.5], 'correct-score': ['1:0', '2:1']}
+
+BETEXPLORER_BET_TYPES = {'1x2': 3, 'ou': 2, 'ha': 2, 'ah': 2, 'dc': 3, 'bts': 2} # bet type -> number of outcomes
+BETEXPLORER_LINES = {'ou': LINES['under-over'], 'ah': LINES['asian-handicap']}
+
+
+def match_id(i: int) -> str:
+    return f"{i:08d}"[-8:]
+
+
+def _odds(rng: random.Random) -> str:
+    odds = f"{rng.uniform(1.05, 8.0):.2f}"
+    if rng.random() < 0.3: # odds movement
+        return f"{rng.uniform(1.05, 8.0):.2f}[{rng.choice('ud')}]{odds}"
+    return odds
+
+
+def flashscore_feed(rng: random.Random, bookmakers: List[int] = polish_bks) -> str:
+    records = []
+    for bet_type, n_outcomes in FLASHSCORE_BET_TYPES.items():
+        records.append(f"OA÷{rng.randint(1, 99)}¬OAI÷{bet_type}¬")
+
+        for scope in rng.sample(FLASHSCORE_SCOPES, rng.randint(1, len(FLASHSCORE_SCOPES))):
+            records.append(f"OB÷{rng.randint(1, 9)}¬OBI÷{scope}¬")
+
+            for value in LINES.get(bet_type, [None]):
+                if value is not None:
+                    records.append(f"OC÷{value}¬")
+
+                active = rng.random() < 0.8 # lines without active odds are left out by the scraper
+                for bookmaker in rng.sample(bookmakers, rng.randint(1, len(bookmakers))):
+                    odds = "".join(f"X{'ABCDE'[j]}÷{_odds(rng)}¬" for j in range(n_outcomes))
+                    records.append(f"OE÷{bookmaker}¬OG÷{int(active and rng.random() < 0.9)}¬OH÷0¬{odds}")
+
+    return f"A1÷{rng.getrandbits(32):08x}¬~" + "".join(record + "~" for record in records)
+
+
+def flashscore_corpus(n: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Return 'n' synthetic feeds as (match id, sport, text).
+    """
+
+    rng = random.Random(seed)
+    return [(match_id(i), rng.choice(sports), flashscore_feed(rng)) for i in range(n)]
+
+
+def load_flashscore_corpus(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Return captured feeds in directory 'path' as (match id, sport, text).
+    """
+
+    corpus = []
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith('.txt'):
+            continue
+        sport, _, match_id = filename[:-4].rpartition('_')
+        with open(os.path.join(path, filename), encoding='utf-8') as f:
+            corpus.append((match_id, sport, f.read()))
+
+    return corpus
+
+
+def _odds_row(rng: random.Random, bid: int, n_outcomes: int, value) -> str:
+    cells = [f'<td class="h-text-left over-s-only"><a href="/bookmaker/{bid}/" class="in-bookmaker-logo-link in-bookmaker-logo-link--primary l{bid}" data-bid="{bid}">b{bid}</a></td>']
+    if value is not None:
+        cells.append(f'<td class="table-main__doubleparameter">{value}</td>')
+    for _ in range(n_outcomes):
+        inactive = " inactive" if rng.random() < 0.03 else ""
+        cells.append(f'<td class="table-main__detail-odds table-main__detail-odds--hasarchive{inactive}" data-odd="{rng.uniform(1.05, 8.0):.2f}" data-created="19,10,2022,12:44">'
+                     f'<span><span><span data-odd="{rng.uniform(1.05, 8.0):.2f}"></span></span></span></td>')
+    cells.append('<td class="table-main__odds--hide"><span class="table-main__odds--payout">95.1%</span></td>')
+
+    return f'<tr data-originid="1">{"".join(cells)}</tr>'
+
+
+def betexplorer_response(rng: random.Random, bet_type: str) -> str:
+    n_outcomes = BETEXPLORER_BET_TYPES[bet_type]
+    header = '<tr><th class="h-text-left">Bookmakers</th>' + "".join(f'<th class="table-main__detail-odds">{i+1}</th>' for i in range(n_outcomes)) + '<th></th></tr>'
+
+    tables = []
+    for value in BETEXPLORER_LINES.get(bet_type, [None]):
+        bookmakers = rng.sample(bookie_ids + [16, 18, 49, 417], rng.randint(3, len(bookie_ids) + 4))
+        rows = [_odds_row(rng, bid, n_outcomes, value if rng.random() < 0.98 else "-") for bid in bookmakers]
+        tables.append(f'<table class="table-main h-mb15 sortable" id="sortable-{len(tables)+1}"><thead>{header}</thead><tbody>{"".join(rows)}</tbody></table>')
+
+    # the site escapes '/' in the JSON string
+    return json.dumps({"odds": f'<div class="box-overflow"><div class="box-overflow__in">{"".join(tables)}</div></div>'}).replace('/', '\\/')
+
+
+def betexplorer_corpus(n: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Return 'n' synthetic betexplorer odds responses as (match id, bet type, text).
+    """
+
+    rng = random.Random(seed)
+    bet_types = list(BETEXPLORER_BET_TYPES)
+    return [(match_id(i), bet_types[i % len(bet_types)], betexplorer_response(rng, bet_types[i % len(bet_types)])) for i in range(n)]
+
+
+def load_betexplorer_corpus(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Return captured betexplorer responses in directory 'path' as (match id, bet type, text).
+    """
+
+    return load_flashscore_corpus(path) # same file naming: '<bet type>_<match id>.txt'
+
+
+def match_link(i: int, sport: str) -> str:
+    return f"https://www.betexplorer.com/{sport}/country-{i % 7}/league-{i % 13}/home-away-{i}/{match_id(i)}/"
+
+
+def scrape_responses(n: int, seed: int = 0) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, List[str]]]:
+    """
+    Return synthetic responses for scraping 'n' matches: (flashscore responses, betexplorer responses, match links),
+    with responses keyed by request path and match links in the format of scraper_main.load_match_links().
+    """
+
+    rng = random.Random(seed)
+    flashscore, betexplorer = dict(), dict()
+    match_links = {sport: [] for sport in sports}
+
+    for i in range(n):
+        sport = sports[i % len(sports)]
+        match_links[sport].append(match_link(i, sport))
+
+        flashscore[f"/x/feed/df_od_1_{match_id(i)}"] = flashscore_feed(rng)
+        for bet_type in BETEXPLORER_BET_TYPES:
+            betexplorer[f"/match-odds/{match_id(i)}/0/{bet_type}/"] = betexplorer_response(rng, bet_type)
+
+    return flashscore, betexplorer, match_links
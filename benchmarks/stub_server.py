@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # clients closing connections early are not errors of the stub
+
+
+class StubServer:
+    """
+    Local HTTP server serving recorded responses, for running the scrapers offline.
+
+    'responses' maps request paths (e.g. "/x/feed/df_od_1_2TdgWEPK") to response texts; other paths get an empty 404 response.
+    Every response is delayed by 'latency' seconds. Connections are kept alive (HTTP/1.1).
+
+    Usage:
+        with StubServer(responses) as server:
+            fetcher = Fetcher(origins={"https://d.flashscore.pl": server.url})
+    """
+
+    def __init__(self, responses: Dict[str, str], latency: float = 0.0, port: int = 0):
+        self.responses = responses
+        self.latency = latency
+        self.port = port
+
+        self.lock = threading.Lock()
+        self.requests = 0 # number of requests served
+        self.connections = 0 # number of connections accepted
+        self.active = 0 # number of requests being served
+        self.max_active = 0
+
+        self.server: _Server | None = None
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+
+                try:
+                    if stub.latency > 0:
+                        time.sleep(stub.latency)
+
+                    text = stub.responses.get(self.path)
+                    body = b"" if text is None else text.encode()
+
+                    self.send_response(404 if text is None else 200)
+                    self.send_header("Content-Type", "text/plain; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self.server = _Server(("127.0.0.1", self.port), self.handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,157 @@
+"""
+Synthetic odds, match data and results in the scraper's archive format, for the algorithm benchmarks.
+
+Scores of every match are Poisson distributed with home and away rates that drift between retrievals.
+Bookmakers quote the fair odds of the current rates with their margin and some noise (Pinnacle, '25', with the lowest margin),
+every 30 minutes (at minutes 1 and 31, like scraper_main.loop) during the hours before the match.
+The result is drawn from the rates at the start of the match, so the odds are calibrated like real ones.
+
+Every bookmaker column of the archive is present; bookmakers not in 'bookmakers' have no odds.
+Files are written to '<root>/data/<table>/<Y_M_D>.csv' for the tables 'odds', 'match_data' and 'results',
+i.e. with data_loading.scraper_package_path = root, data_loading.DBLoader loads them like the scraper's archive.
+
+Usage: python -m benchmarks.synthetic_dataset ROOT START_DATE END_DATE [MATCHES_PER_DAY]
+"""
+
+import os
+import sys
+import string
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from scipy.stats import poisson
+from typing import Dict, List
+
+from betting_assistant.scraper.aliases import bks, polish_bks, flashscore_aliases
+
+
+SPORT_SCORES = {'soccer': 1.35, 'hockey': 1.5, 'baseball': 4.5, 'handball': 13.0, 'basketball': 80.0} # mean score of a team
+SPORT_SHARES = {'soccer': 0.6, 'hockey': 0.1, 'baseball': 0.05, 'handball': 0.1, 'basketball': 0.15}
+
+BET_TYPES = [1, 2, 3, 4, 5, 6]
+BOOKMAKERS = polish_bks + [25, 11, 147, 148]
+MARGINS = {25: 0.025} # margin of a bookmaker; others get DEFAULT_MARGIN
+DEFAULT_MARGIN = 0.06
+
+ODDS_NOISE = 0.03 # standard deviation of log odds around the bookmaker's price
+RATE_DRIFT = 0.02 # standard deviation of log rates between retrievals
+HOURS_BEFORE = 3 # hours before the match during which odds are retrieved
+
+
+def _match_id(rng: np.random.Generator) -> str:
+    return "".join(rng.choice(list(string.ascii_letters + string.digits), 8))
+
+
+def _score_matrix(home_rate: float, away_rate: float) -> np.ndarray:
+    # probabilities of (home score, away score)
+    n = int(max(home_rate, away_rate) + 8 * np.sqrt(max(home_rate, away_rate)) + 10)
+    return np.outer(poisson.pmf(np.arange(n), home_rate), poisson.pmf(np.arange(n), away_rate))
+
+
+def _lines(center: float) -> List[float]:
+    # half lines around 'center' and the nearest whole line
+    base = np.floor(center) + 0.5
+    return sorted([base - 1, base, base + 1, float(np.round(center))])
+
+
+def _bets(bet_type: int, scores: np.ndarray, home_rate: float, away_rate: float) -> Dict[float, List[float]]:
+    """
+    Return {bet type value: fair probabilities of the bet type variables}, with stakes returned in a push.
+    """
+
+    home, away = np.indices(scores.shape)
+    p1, px, p2 = scores[home > away].sum(), scores[home == away].sum(), scores[home < away].sum()
+
+    def with_push(win, lose):
+        return [win / (win + lose), lose / (win + lose)]
+
+    if bet_type == 1: # 1x2
+        return {np.nan: [p1, px, p2]}
+    if bet_type == 2: # under-over
+        total = home + away
+        return {value: with_push(scores[total > value].sum(), scores[total < value].sum()) for value in _lines(home_rate + away_rate)}
+    if bet_type == 3: # money-line
+        return {np.nan: with_push(p1, p2)}
+    if bet_type == 4: # asian-handicap
+        diff = home - away
+        return {value: with_push(scores[diff + value > 0].sum(), scores[diff + value < 0].sum()) for value in _lines(away_rate - home_rate)}
+    if bet_type == 5: # double-chance
+        return {np.nan: [p1 + px, p1 + p2, px + p2]}
+    if bet_type == 6: # both-teams-to-score
+        yes = scores[(home > 0) & (away > 0)].sum()
+        return {np.nan: [yes, 1 - yes]}
+
+    raise ValueError
+
+
+def _quote(rng: np.random.Generator, probabilities: List[float], margin: float) -> str | float:
+    odds = 1 / (np.asarray(probabilities) * (1 + margin)) * np.exp(rng.normal(0, ODDS_NOISE, len(probabilities)))
+    if not np.all(np.isfinite(odds)):
+        return np.nan
+
+    return str([float(elem) for elem in np.round(np.maximum(odds, 1.01), 2)])
+
+
+def day_tables(rng: np.random.Generator, day: datetime, n_matches: int, bet_types: List[int] = BET_TYPES, bookmakers: List[int] = BOOKMAKERS) -> Dict[str, pd.DataFrame]:
+    """
+    Return the 'odds', 'match_data' and 'results' tables of 'n_matches' matches starting on 'day'.
+    """
+
+    odds, match_data, results = [], [], []
+
+    for _ in range(n_matches):
+        sport = rng.choice(list(SPORT_SHARES), p=list(SPORT_SHARES.values()))
+        sport_bet_types = [bt for bt in bet_types if bt in flashscore_aliases[sport].values()]
+        match_id = _match_id(rng)
+        start = day + timedelta(minutes=int(rng.integers(0, 24 * 4)) * 15)
+
+        match_data.append({"ID": match_id, "Link": f"https://www.betexplorer.com/{sport}/country/league/home-away/{match_id}/",
+                           "Date": f"{start.year},{start.month},{start.day},{start.hour},{start.minute:02d}", "Sport": sport, "Country": "country", "League": "league"})
+
+        strength = rng.lognormal(0, 0.3)
+        log_rates = np.log(SPORT_SCORES[sport] * np.array([strength, 1 / strength]))
+        offered = {bookmaker: bookmaker in bookmakers and (bookmaker == 25 or rng.random() < 0.8) for bookmaker in bks} # every bet needs pinnacle odds
+
+        # retrievals at minutes 1 and 31 before the start
+        retrieval = start - timedelta(hours=HOURS_BEFORE)
+        retrieval = retrieval.replace(minute=1 if retrieval.minute < 31 else 31, second=0)
+        while retrieval < start:
+            log_rates += rng.normal(0, RATE_DRIFT, 2)
+            home_rate, away_rate = np.exp(log_rates)
+            scores = _score_matrix(home_rate, away_rate)
+            retrieval_date = f"{retrieval.day},{retrieval.month},{retrieval.year},{retrieval.hour},{retrieval.minute:02d}"
+
+            for bet_type in sport_bet_types:
+                for value, probabilities in _bets(bet_type, scores, home_rate, away_rate).items():
+                    row = {"Bet type": bet_type, "Bet type value": value, "ID": match_id, "Retrieval date": retrieval_date}
+                    for bookmaker in bks:
+                        row[str(bookmaker)] = _quote(rng, probabilities, MARGINS.get(bookmaker, DEFAULT_MARGIN)) if offered[bookmaker] else np.nan
+                    odds.append(row)
+
+            retrieval += timedelta(minutes=30)
+
+        home_rate, away_rate = np.exp(log_rates)
+        goals = [int(rng.poisson(home_rate)), int(rng.poisson(away_rate))]
+        first_half = [int(rng.binomial(goal, 0.45)) for goal in goals]
+        results.append({"ID": match_id, "Result": str(goals), "Partial results": str([first_half, [goal - half for goal, half in zip(goals, first_half)]])})
+
+    return {'odds': pd.DataFrame(odds), 'match_data': pd.DataFrame(match_data), 'results': pd.DataFrame(results)}
+
+
+def write_dataset(root: str, days: List[str], n_matches: int, bet_types: List[int] = BET_TYPES, bookmakers: List[int] = BOOKMAKERS, seed: int = 0) -> None:
+    """
+    Write 'n_matches' synthetic matches for every day in 'days' (Y_M_D) to '<root>/data/<table>/<day>.csv'.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    for day in days:
+        for table, df in day_tables(rng, datetime(*map(int, day.split('_'))), n_matches, bet_types, bookmakers).items():
+            os.makedirs(os.path.join(root, 'data', table), exist_ok=True)
+            df.to_csv(os.path.join(root, 'data', table, day + '.csv'), index=False)
+
+
+if __name__ == "__main__":
+    from betting_assistant.bet_algorithm.utils import days_list_dbformat
+
+    write_dataset(sys.argv[1], days_list_dbformat(sys.argv[2], sys.argv[3]), int(sys.argv[4]) if len(sys.argv) > 4 else 200)
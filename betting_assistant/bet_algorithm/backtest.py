@@ -0,0 +1,174 @@
+"""
+Module for the event-driven backtest of betting on events that overlap in time.
+
+Every event gives two actions: a bet at its retrieval date and an evaluation at its end date.
+Actions are ordered once on the integer timestamps (minutes since the epoch) and then replayed over plain lists of events and outcomes.
+"""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Tuple
+
+from .events import Event, MultiEvent
+from .bet_identifier import BetIdentifier
+from .portfolio import Portfolio
+
+
+def action_order(bet_times: np.ndarray, evaluation_times: np.ndarray) -> np.ndarray:
+    """
+    Return the order of actions [bets..., evaluations...] by time.
+
+    Action i < len(bet_times) is the bet on event i, action len(bet_times) + i is the evaluation of event i.
+    """
+
+    times = np.concatenate([bet_times, evaluation_times])
+
+    # stable, so that simultaneous actions keep their order: bets before evaluations, both in the order of the events
+    return np.argsort(times, kind='stable')
+
+
+class OverlapSimulation:
+    MIN_BUDGET = 0.0001 # no bets are made below this budget
+
+    def __init__(self, events: list, outcomes: list, bet_times: np.ndarray, evaluation_times: np.ndarray):
+        """
+        'bet_times' and 'evaluation_times' are integer timestamps (e.g. minutes since the epoch) of the events.
+        """
+
+        self.events = events
+        self.outcomes = outcomes
+        self.order = action_order(bet_times, evaluation_times)
+
+        self.budget = 1.0
+        self.bet_count = 0 # number of bets made
+        self.portfolio = Portfolio()
+
+    @classmethod
+    def from_event_df(cls, event_df: pd.DataFrame):
+        """
+        Create a simulation from a DataFrame with columns "Event", "Outcome", "End date" and index level "Retrieval date".
+        """
+
+        bet_times = event_df.index.get_level_values("Retrieval date").to_numpy(dtype=np.int64)
+        evaluation_times = event_df["End date"].to_numpy(dtype=np.int64)
+
+        return cls(event_df["Event"].tolist(), event_df["Outcome"].tolist(), bet_times, evaluation_times)
+
+    def bet(self, event) -> None:
+        if self.budget < self.MIN_BUDGET:
+            event.replaced = True
+            return
+
+        event.replaced = False
+        event.retrieval_budget = self.budget
+        event.calculate_entangled_bet_size(ongoing_events=self.portfolio.entangled_events(event), portfolio=self.portfolio)
+
+        if event.s.sum() > 0:
+            self.bet_count += 1
+            self.portfolio.place(event)
+            self.budget -= np.sum(event.s) * event.retrieval_budget
+        else:
+            event.replaced = True
+
+    def evaluate(self, event, outcome) -> None:
+        if event.replaced:
+            return
+
+        self.portfolio.settle(event)
+        self.budget += event.total_return(outcome)
+
+    def run(self) -> float:
+        """
+        Replay all actions and return the final budget.
+        """
+
+        n = len(self.events)
+        for action in self.order.tolist():
+            if action < n:
+                self.bet(self.events[action])
+            else:
+                self.evaluate(self.events[action-n], self.outcomes[action-n])
+
+        return self.budget
+
+
+def pack_event_df(event_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Pack a DataFrame of events (as accepted by OverlapSimulation.from_event_df) into flat arrays, e.g. for sending to another process.
+
+    Multi-events are stored as their single-event legs: leg i of the packed events has probabilities of length shapes[i, 1],
+    a variable-to-outcome odds matrix of shape shapes[i], an outcome space (canonical outcome indices, stored like the probabilities) and one outcome;
+    event j consists of legs leg_offsets[j]:leg_offsets[j+1].
+    """
+
+    events = event_df["Event"].tolist()
+    outcomes = event_df["Outcome"].tolist()
+    legs = [leg for event in events for leg in event.get_events()]
+
+    leg_offsets = np.zeros(len(events)+1, dtype=np.int64)
+    np.cumsum([len(event.get_events()) for event in events], out=leg_offsets[1:])
+
+    return {"leg_offsets": leg_offsets,
+            "multi": np.array([event.type == "MultiEvent" for event in events], dtype=bool),
+            "shapes": np.array([leg.var2outcome_odds.shape for leg in legs], dtype=np.int64).reshape((-1, 2)),
+            "probabilities": np.concatenate([leg.probabilities for leg in legs]) if len(legs) > 0 else np.zeros(0),
+            "odds": np.concatenate([leg.var2outcome_odds.ravel() for leg in legs]) if len(legs) > 0 else np.zeros(0),
+            "outcome_spaces": np.concatenate([leg.outcomes for leg in legs]).astype(np.int64) if len(legs) > 0 else np.zeros(0, dtype=np.int64),
+            "match_ids": np.array([leg.bet_id[0].match_id for leg in legs], dtype=str),
+            "bet_types": np.array([leg.bet_id[0].bet_type for leg in legs], dtype=np.int64),
+            "bet_type_values": np.array([np.nan if leg.bet_id[0].bet_type_value is None else leg.bet_id[0].bet_type_value for leg in legs], dtype=float),
+            "outcomes": np.array([o for event, outcome in zip(events, outcomes) for o in (outcome if event.type == "MultiEvent" else [outcome])], dtype=np.int64),
+            "bet_times": event_df.index.get_level_values("Retrieval date").to_numpy(dtype=np.int64),
+            "evaluation_times": event_df["End date"].to_numpy(dtype=np.int64)}
+
+def unpack_events(arrays: Dict[str, np.ndarray]) -> Tuple[list, list]:
+    """
+    Rebuild the events and outcomes packed by pack_event_df.
+    """
+
+    shapes = arrays["shapes"]
+    probability_offsets = np.concatenate([[0], np.cumsum(shapes[:, 1])]).tolist()
+    odds_offsets = np.concatenate([[0], np.cumsum(shapes[:, 0] * shapes[:, 1])]).tolist()
+
+    legs = [Event(arrays["probabilities"][probability_offsets[i]:probability_offsets[i+1]],
+                  arrays["odds"][odds_offsets[i]:odds_offsets[i+1]].reshape(shape),
+                  [BetIdentifier(match_id, bet_type, bet_type_value)],
+                  outcomes=arrays["outcome_spaces"][probability_offsets[i]:probability_offsets[i+1]])
+            for i, (shape, match_id, bet_type, bet_type_value) in enumerate(zip(shapes.tolist(), arrays["match_ids"].tolist(), arrays["bet_types"].tolist(), arrays["bet_type_values"].tolist()))]
+    leg_outcomes = arrays["outcomes"].tolist()
+
+    events, outcomes = [], []
+    for start, end, multi in zip(arrays["leg_offsets"][:-1].tolist(), arrays["leg_offsets"][1:].tolist(), arrays["multi"].tolist()):
+        events.append(MultiEvent(legs[start:end]) if multi else legs[start])
+        outcomes.append(leg_outcomes[start:end] if multi else leg_outcomes[start])
+
+    return events, outcomes
+
+def simulate_packed(arrays: Dict[str, np.ndarray], tax: float, part_kelly: float) -> float:
+    """
+    Run an OverlapSimulation on packed events and return the final budget.
+
+    'tax' and 'part_kelly' are the Event class settings of the calling process, which a worker process does not necessarily share.
+    """
+
+    Event.TAX, Event.PART_KELLY = tax, part_kelly
+    events, outcomes = unpack_events(arrays)
+
+    return OverlapSimulation(events, outcomes, arrays["bet_times"], arrays["evaluation_times"]).run()
+
+def overlap_utilities(event_dfs: List[pd.DataFrame], workers: int | None = 1, chunksize: int = 1) -> List[float]:
+    """
+    Return final budgets of independent overlap simulations of 'event_dfs', in the same order.
+
+    With workers other than 1, the simulations run in a pool of 'workers' processes (None - one per core), 'chunksize' DataFrames per task.
+    Events are then sent packed (see pack_event_df) and the events of the calling process are left unchanged.
+    """
+
+    if workers == 1:
+        return [OverlapSimulation.from_event_df(event_df).run() for event_df in event_dfs]
+
+    packed = [pack_event_df(event_df) for event_df in event_dfs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(simulate_packed, packed, repeat(Event.TAX), repeat(Event.PART_KELLY), chunksize=chunksize))
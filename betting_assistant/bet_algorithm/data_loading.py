@@ -1,24 +1,29 @@
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from typing import List, Optional
 
 from .utils import datetime2str_dbformat
-from ..scraper import scraper_main
+from . import data_store
+from ..scraper import scraper_main, segment_log
 
 
-scraper_package_path = '/'.join(scraper_main.__file__.split('\\')[-3:-1])
+scraper_package_path = os.path.dirname(scraper_main.__file__)
 
 class Loader:
     """
     Generic data loader class
+
+    Odds are loaded for 'days' (today by default), match data and results for 'info_days' (by default the same days).
     """
 
-    def __init__(self, days: List[str] | None = None):
+    def __init__(self, days: List[str] | None = None, info_days: List[str] | None = None):
         if days is None:
             days = [datetime2str_dbformat(datetime.now())]
     
         self.days = days
+        self.info_days = days if info_days is None else info_days
         self.odds = self._load_odds()
         self._prepare_odds()
         self.match_data = self._load_match_data()
@@ -39,9 +44,9 @@ class Loader:
         """
 
         dfs = []
-        for day in self.days:
+        for day in self.info_days:
             try:
-                match_data = pd.read_csv(scraper_package_path + '/data/match_data/' + day + '.csv')
+                match_data = segment_log.read_day(scraper_package_path + '/data/match_data/', day)
                 match_data.index = match_data["ID"]
                 match_data = match_data.drop(columns=["ID"])
 
@@ -60,9 +65,9 @@ class Loader:
         """
 
         dfs = []
-        for day in self.days:
+        for day in self.info_days:
             try:
-                results = pd.read_csv(scraper_package_path + '/data/results/' + day + '.csv')
+                results = segment_log.read_day(scraper_package_path + '/data/results/', day)
                 results.index = results["ID"]
                 results = results.drop(columns=["ID"])
 
@@ -73,15 +78,20 @@ class Loader:
         results = pd.DataFrame() if len(dfs) == 0 else pd.concat(dfs, axis=0)
         results = results[~results.index.duplicated(keep='first')]
 
+        # changing csv's str format to python list; results are parsed in bulk into arrays first
+        if not results.empty:
+            goals, result_valid = data_store.parse_results(results["Result"])
+            partial_results, partial_valid = data_store.parse_partial_results(results["Partial results"])
+            parsed = data_store.results_frame(results.index.to_numpy(), goals, result_valid, partial_results, partial_valid)
+            results["Result"] = parsed["Result"].to_numpy()
+            results["Partial results"] = parsed["Partial results"].to_numpy()
+
         return results
 
-    def _prepare_odds(self) -> pd.DataFrame:
+    def _arrange_odds(self) -> None:
+        """
+        Drop rows with no ID and move the identifying columns to the front
         """
-        Return an organized DataFrame with odds
-        """    
-
-        if self.odds.empty:
-            return
 
         # clean the dataframe; drop rows with no ID
         self.odds = self.odds.dropna(subset=["ID"])
@@ -95,6 +105,16 @@ class Loader:
         cols = first_cols + cols
         self.odds = self.odds[cols]
 
+    def _prepare_odds(self) -> pd.DataFrame:
+        """
+        Return an organized DataFrame with odds
+        """    
+
+        if self.odds.empty:
+            return
+
+        self._arrange_odds()
+
 
         # changing csv's str format to python list
         for col in self.odds.columns.tolist()[4:]:
@@ -110,36 +130,12 @@ class Loader:
         if self.odds.empty:
             return pd.DataFrame()
 
-        def get_date(id):
-            try:
-                return self.match_data.loc[id]["Date"]
-            except:
-                return np.nan
-        
-        def get_result(id):
-            try:
-                return self.results.loc[id]["Result"]
-            except:
-                return np.nan
-
-        def get_partial_results(id):
-            try:
-                return self.results.loc[id]["Partial results"]
-            except:
-                return np.nan
-
-
-        dates = self.odds["ID"].apply(get_date)
-        results_raw = self.odds["ID"].apply(get_result)
-        results = results_raw.apply(lambda x: np.nan if np.any(pd.isnull(x)) else [int(elem) for elem in x[1:-1].split(', ')])
-        partial_results_raw = self.odds["ID"].apply(get_partial_results)
-        partial_results = partial_results_raw.apply(lambda x: np.nan if np.any(pd.isnull(x)) else [[int(elem1) for elem1 in elem[1:].split(', ')] for elem in x[1:-2].split('], ')])
+        # match data and results indexed by match ID, joined with the odds in a single index-aligned lookup
+        match_info = pd.concat([self.match_data.reindex(columns=["Date"]),
+                                self.results.reindex(columns=["Result", "Partial results"])], axis=1)
 
-
-        data = pd.DataFrame()
-        data["Date"] = dates
-        data["Result"] = results
-        data["Partial results"] = partial_results
+        data = match_info.reindex(self.odds["ID"])
+        data.index = self.odds.index
 
         data = pd.concat([data, self.odds], axis=1)
 
@@ -166,7 +162,7 @@ class DBLoader(Loader):
         dfs = []
         for day in self.days:
             try:
-                odds = pd.read_csv(scraper_package_path + '/data/odds/' + day + '.csv')
+                odds = segment_log.read_day(scraper_package_path + '/data/odds/', day)
 
                 dfs.append(odds)
             except FileNotFoundError:
@@ -191,3 +187,67 @@ class ScraperDataLoader(Loader):
 
         odds_list = scraper_main.scraper_runner(max = 5)
         return pd.DataFrame(odds_list)
+
+
+class StoreLoader(Loader):
+    """
+    Loader class for loading data from the typed columnar store (see data_store).
+
+    Serves the same purpose as DBLoader, but listed odds and results are read from typed arrays instead of being parsed from strings.
+    The csv archive has to be converted first with data_store.convert_archive().
+    """
+
+    def _load_tables(self, table: str, decode, days: List[str]) -> List[pd.DataFrame]:
+        dfs = []
+        for day in days:
+            try:
+                dfs.append(decode(data_store.load_day(table, day)))
+            except FileNotFoundError:
+                pass
+
+        return dfs
+
+    @staticmethod
+    def _index_by_id(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        df = pd.DataFrame() if len(dfs) == 0 else pd.concat(dfs, axis=0)
+        if df.empty:
+            return df
+
+        df.index = df["ID"]
+        df = df.drop(columns=["ID"])
+        df = df[~df.index.duplicated(keep='first')]
+
+        return df
+
+    def _load_odds(self) -> pd.DataFrame:
+        """
+        Load odds from the store
+        """
+
+        dfs = self._load_tables('odds', data_store.decode_odds, self.days)
+
+        return pd.DataFrame() if len(dfs) == 0 else pd.concat(dfs, axis=0, ignore_index=True)
+
+    def _prepare_odds(self) -> pd.DataFrame:
+        """
+        Return an organized DataFrame with odds; listed odds are already python lists
+        """
+
+        if self.odds.empty:
+            return
+
+        self._arrange_odds()
+
+    def _load_match_data(self) -> pd.DataFrame:
+        """
+        Load match data from the store
+        """
+
+        return self._index_by_id(self._load_tables('match_data', data_store.decode_table, self.info_days))
+
+    def _load_results(self) -> pd.DataFrame:
+        """
+        Load results from the store
+        """
+
+        return self._index_by_id(self._load_tables('results', data_store.decode_results, self.info_days))
@@ -0,0 +1,286 @@
+"""
+Module for the typed columnar data store.
+
+The scraper archives odds, match data and results as per-day csv files, with listed odds kept as stringified lists (e.g. "[1.85, 2.05]").
+The store keeps the same three tables partitioned by day in compressed numpy .npz files, with listed odds stored as fixed-width float arrays per bookmaker,
+so that loading a day requires no string parsing.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from ..scraper import scraper_main, segment_log
+
+
+data_path = os.path.join(os.path.dirname(scraper_main.__file__), 'data')
+store_path = os.path.join(data_path, 'store')
+
+tables = ['odds', 'match_data', 'results']
+odds_key_columns = ['ID', 'Retrieval date', 'Bet type', 'Bet type value']
+
+
+@dataclass
+class RaggedArray:
+    """
+    Rows of varying length stored as one flat 'values' array and row boundaries 'offsets',
+    i.e. row i is values[offsets[i]:offsets[i+1]].
+    """
+
+    values: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_lists(cls, rows: List[list], row_shape: tuple = ()):
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        offsets = np.zeros(len(rows)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.array([elem for row in rows for elem in row], dtype=np.int64).reshape((-1,) + row_shape)
+
+        return cls(values, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def take(self, indices: np.ndarray) -> "RaggedArray":
+        """
+        Return a RaggedArray consisting of the rows given by 'indices'.
+        """
+
+        lengths = self.lengths()[indices]
+        offsets = np.zeros(len(indices)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # positions of the selected values in the flat array
+        starts = np.repeat(self.offsets[:-1][indices] - offsets[:-1], lengths)
+        positions = starts + np.arange(offsets[-1])
+
+        return RaggedArray(self.values[positions], offsets)
+
+    def tolist(self) -> List[list]:
+        values = self.values.tolist()
+        return [values[start:end] for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+
+
+def object_array(elements: list) -> np.ndarray:
+    """
+    Return a 1-D object array of 'elements', even if the elements are equal-length lists.
+    """
+
+    return np.fromiter(elements, dtype=object, count=len(elements))
+
+
+def _encode_column(column: pd.Series) -> np.ndarray:
+    # numeric columns are kept as they are, text columns are stored as fixed-width unicode with '' in place of NaN
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        return column.to_numpy()
+    return np.array(column.fillna('').astype(str).tolist(), dtype=str)
+
+def _decode_column(array: np.ndarray) -> np.ndarray:
+    if array.dtype.kind != 'U':
+        return array
+    column = array.astype(object)
+    column[array == ''] = np.nan
+    return column
+
+
+def _parse_listed_odds(cell) -> Optional[List[float]]:
+    return None if np.any(pd.isnull(cell)) else [float(elem) for elem in cell[1:-1].split(', ')]
+
+def encode_odds(odds: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Encode a day of odds in the csv format into arrays.
+
+    Listed odds of every bookmaker are stored in a single float array of shape (rows, bookmakers, width), padded with NaN.
+    """
+
+    bookmakers = [col for col in odds.columns.tolist() if col not in odds_key_columns]
+    listed_odds = {bk: odds[bk].apply(_parse_listed_odds).tolist() for bk in bookmakers}
+    width = max([len(elem) for bk in bookmakers for elem in listed_odds[bk] if elem is not None], default=0)
+
+    odds_array = np.full(shape=(len(odds), len(bookmakers), width), fill_value=np.nan)
+    for j, bk in enumerate(bookmakers):
+        for i, elem in enumerate(listed_odds[bk]):
+            if elem is not None:
+                odds_array[i, j, :len(elem)] = elem
+
+    arrays = {col: _encode_column(odds[col]) for col in odds_key_columns}
+    arrays["bookmakers"] = np.array(bookmakers, dtype=str)
+    arrays["odds"] = odds_array
+
+    return arrays
+
+def decode_odds(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Return an odds DataFrame ['ID', 'Retrieval date', 'Bet type', 'Bet type value', <bookmakers>] with listed odds as python lists.
+    """
+
+    data = {col: _decode_column(arrays[col]) for col in odds_key_columns}
+
+    odds_array = arrays["odds"]
+    lengths = np.sum(~np.isnan(odds_array), axis=2)
+    for j, bk in enumerate(arrays["bookmakers"].tolist()):
+        cells = np.full(shape=(odds_array.shape[0],), fill_value=np.nan, dtype=object)
+        for width in np.unique(lengths[:, j]):
+            if width == 0:
+                continue
+            rows = np.flatnonzero(lengths[:, j] == width)
+            cells[rows] = object_array(odds_array[rows, j, :width].tolist())
+        data[bk] = cells
+
+    return pd.DataFrame(data)
+
+
+def encode_table(table: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Encode a plain table (such as match data) into arrays, column by column.
+    """
+
+    arrays = {col: _encode_column(table[col]) for col in table.columns}
+    arrays["columns"] = np.array(table.columns.tolist(), dtype=str)
+
+    return arrays
+
+def decode_table(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame({col: _decode_column(arrays[col]) for col in arrays["columns"].tolist()})
+
+
+def parse_int_lists(column: pd.Series) -> Tuple[RaggedArray, np.ndarray]:
+    """
+    Parse a column of stringified (possibly nested) integer lists, e.g. "[1, 2]" or "[[0, 1], [1, 1]]", into a flat ragged array.
+
+    Returns the ragged array and a mask of non-null rows; null rows are left empty.
+    """
+
+    valid = column.notna().to_numpy()
+    stripped = column[valid].astype(str).str.replace(r'[\[\] ]', '', regex=True)
+    non_empty = (stripped.str.len() > 0).to_numpy()
+
+    lengths = np.zeros(len(column), dtype=np.int64)
+    lengths[np.flatnonzero(valid)[non_empty]] = stripped[non_empty].str.count(',').to_numpy() + 1
+    offsets = np.zeros(len(column)+1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # a single split over all rows instead of one per row
+    values = np.array(','.join(stripped[non_empty].tolist()).split(','), dtype=np.int64) if offsets[-1] > 0 else np.zeros(0, dtype=np.int64)
+
+    return RaggedArray(values, offsets), valid
+
+def parse_results(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of stringified results "[<home goals>, <away goals>]" into an integer array of shape (rows, 2) and a mask of non-null rows.
+    """
+
+    ragged, valid = parse_int_lists(column)
+    goals = np.zeros(shape=(len(column), 2), dtype=np.int64)
+    goals[valid] = ragged.values.reshape((-1, 2))
+
+    return goals, valid
+
+def parse_partial_results(column: pd.Series) -> Tuple[RaggedArray, np.ndarray]:
+    """
+    Parse a column of stringified partial results "[[<home goals>, <away goals>], ...]" into a ragged array of goal pairs and a mask of non-null rows.
+    """
+
+    ragged, valid = parse_int_lists(column)
+
+    return RaggedArray(ragged.values.reshape((-1, 2)), ragged.offsets // 2), valid
+
+def results_frame(ids: np.ndarray, goals: np.ndarray, result_valid: np.ndarray, partial_results: RaggedArray, partial_valid: np.ndarray) -> pd.DataFrame:
+    """
+    Return a results DataFrame ['ID', 'Result', 'Partial results'] with results as python lists (NaN for null rows).
+    """
+
+    result_lists = object_array(goals.tolist())
+    result_lists[~result_valid] = np.nan
+    partial_lists = object_array(partial_results.tolist())
+    partial_lists[~partial_valid] = np.nan
+
+    return pd.DataFrame({"ID": ids, "Result": result_lists, "Partial results": partial_lists})
+
+
+def encode_results(results: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Encode a day of results into arrays.
+
+    Final results are stored as an integer array of shape (rows, 2), partial results as a ragged array of (home, away) goal pairs.
+    """
+
+    goals, result_valid = parse_results(results["Result"])
+    partial_results, partial_valid = parse_partial_results(results["Partial results"])
+
+    return {"ID": _encode_column(results["ID"]),
+            "goals": goals,
+            "result_valid": result_valid,
+            "partial_values": partial_results.values,
+            "partial_offsets": partial_results.offsets,
+            "partial_valid": partial_valid}
+
+def decode_results(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Return a results DataFrame ['ID', 'Result', 'Partial results'] with results as python lists.
+    """
+
+    partial_results = RaggedArray(arrays["partial_values"], arrays["partial_offsets"])
+
+    return results_frame(_decode_column(arrays["ID"]), arrays["goals"], arrays["result_valid"], partial_results, arrays["partial_valid"])
+
+
+def day_path(table: str, day: str) -> str:
+    return os.path.join(store_path, table, day + '.npz')
+
+def save_day(table: str, day: str, arrays: Dict[str, np.ndarray]) -> None:
+    os.makedirs(os.path.join(store_path, table), exist_ok=True)
+    np.savez_compressed(day_path(table, day), **arrays)
+
+def load_day(table: str, day: str) -> Dict[str, np.ndarray]:
+    """
+    Load arrays of a table for the given day. Raises FileNotFoundError if the day is not in the store.
+    """
+
+    with np.load(day_path(table, day), allow_pickle=False) as f:
+        return {key: f[key] for key in f.files}
+
+
+encoders = {'odds': encode_odds, 'match_data': encode_table, 'results': encode_results}
+
+def convert_day(day: str) -> List[str]:
+    """
+    Convert the csv files of the given day into the store. Return the list of converted tables.
+    """
+
+    converted = []
+    for table in tables:
+        try:
+            df = segment_log.read_day(os.path.join(data_path, table), day)
+        except FileNotFoundError:
+            continue
+
+        save_day(table, day, encoders[table](df))
+        converted.append(table)
+
+    return converted
+
+def convert_archive(days: List[str] | None = None) -> Dict[str, List[str]]:
+    """
+    Convert the csv archive into the store. By default, every day found in the archive is converted.
+    """
+
+    if days is None:
+        days = sorted({day for table in tables for day in segment_log.days(os.path.join(data_path, table))})
+
+    return {day: convert_day(day) for day in days}
+
+
+if __name__ == "__main__":
+    import sys
+    from .utils import days_list_dbformat
+
+    days = days_list_dbformat(sys.argv[1], sys.argv[2]) if len(sys.argv) == 3 else None
+    for day, converted in convert_archive(days).items():
+        print(day, converted)
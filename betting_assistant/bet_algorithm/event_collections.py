@@ -1,12 +1,13 @@
 import pandas as pd
 import numpy as np
 from typing import List
-from collections import defaultdict
 
 from .events import Event, MultiEvent
-from .utils import latest_date_str
+from .utils import minutes2dates
 from .bet_identifier import BetIdentifier
-from . import preprocessing
+from . import utility
+from .backtest import OverlapSimulation, overlap_utilities
+from .event_table import EventTable
 
 
 class GenericEventCollection:
@@ -14,6 +15,7 @@ class GenericEventCollection:
         # event_df is required to have:
         # columns "Event", "Outcome", "End date" 
         # index level "Retrieval date"
+        # (dates in minutes since the epoch)
         raise NotImplementedError
 
     def set_event_df(self, event_df): # abstract
@@ -21,82 +23,27 @@ class GenericEventCollection:
 
 
     def calculate_bet_sizes(self):
-        self.get_event_df()["Event"].apply(lambda x: x.calculate_bet_size())
+        events = self.get_event_df()["Event"].tolist()
+        for event, kelly_s in zip(events, utility.UtilityOptimizer.kelly_bet_sizes(events)):
+            event.set_kelly_bet_size(kelly_s)
 
     def filter_zero_bet_size(self):
         total_bet_size = self.get_event_df()["Event"].apply(lambda x: x.s.sum() != 0)
         self.set_event_df(self.get_event_df()[total_bet_size])
 
+    @staticmethod
+    def retrieval_days(event_df: pd.DataFrame) -> np.ndarray:
+        """
+        Return the day of retrieval of every row in "Y,M,D" format.
+        """
+
+        days, inverse = np.unique(event_df.index.get_level_values("Retrieval date").to_numpy() // (24*60), return_inverse=True)
+
+        return minutes2dates(days * (24*60), fields=3)[inverse]
+
     def _util_overlap_utility(self, event_df: pd.DataFrame):
         # two types of action: making a bet, and evaluating a bet after the event has ended
-        actions_bet = event_df.copy()
-        actions_bet["Action"] = "Bet"
-        actions_bet["Date spec"] = actions_bet.index.get_level_values('Retrieval date')
-
-        actions_eval = event_df.copy()
-        actions_eval["Action"] = "Evaluation"
-        actions_eval["Date spec"] = actions_eval["End date"]
-
-        actions = pd.concat([actions_bet, actions_eval], axis=0)
-        actions = preprocessing.sort_by_column(actions, "Date spec")
-
-
-        budget = 1.0
-        current_bet_count = 0
-        bet_id_map_event = defaultdict(list)
-        DEBUG = True
-        MAX_ENTANGLED = 20
-        def handle_row(row):
-            nonlocal budget, bet_id_map_event, current_bet_count
-            action = row["Action"]
-
-            if action == "Bet" and budget < 0.0001:
-                row["Event"].replaced = True
-
-            elif action == "Bet":
-                event = row["Event"]
-                event.replaced = False
-                event.retrieval_budget = budget
-                bet_id = event.bet_id
-
-                events_with_common_bet_id = set()
-                for bid in bet_id:
-                    for e in bet_id_map_event[bid]:
-                        if len(events_with_common_bet_id) == MAX_ENTANGLED:
-                            break
-                        events_with_common_bet_id.add(e)
-
-                event.calculate_entangled_bet_size(ongoing_events=list(events_with_common_bet_id)[:4])
-
-                if event.s.sum() > 0:
-                    current_bet_count += 1
-                    for bid in bet_id:
-                        bet_id_map_event[bid].append(event)
-                    budget -= np.sum(event.s) * event.retrieval_budget
-                    if DEBUG:
-                        print("budget:", budget)
-                        print("bet")
-                        print(current_bet_count, "bets remaining")
-                else:
-                    event.replaced = True
-                
-
-            elif action == "Evaluation" and not row["Event"].replaced:
-                event = row["Event"]
-                outcomes = row["Outcome"]
-                if DEBUG:
-                    print('budget:', budget)
-                    print("evaluation")
-                    print(current_bet_count, "bets remaining")
-                current_bet_count -= 1
-                bet_id = event.bet_id
-                for bid in bet_id:
-                    bet_id_map_event[bid].remove(event)
-                budget += event.total_return(outcomes)
-
-        actions.apply(handle_row, axis=1)
-
-        return budget
+        return OverlapSimulation.from_event_df(event_df).run()
 
     def overlap_utility(self):
         """
@@ -107,18 +54,21 @@ class GenericEventCollection:
 
         return self._util_overlap_utility(events_df)
 
-    def overlap_utility_grouped_by_day(self):
+    def overlap_utility_grouped_by_day(self, workers: int | None = 1, chunksize: int = 1):
         """
         Utility for event collection where events overlap in time, grouped by day of retrieval.
+
+        Days are simulated independently; with workers other than 1 they run in a pool of processes (see backtest.overlap_utilities).
         """
 
         event_df: pd.DataFrame = self.get_event_df().copy()
-        event_df["Day"] = event_df.apply(lambda x: ','.join(x.name[0].split(',')[:3]), axis=1)
+        event_df["Day"] = self.retrieval_days(event_df)
 
-        grouped = event_df.groupby(["Day"])
-        utilities = grouped.apply(self._util_overlap_utility)
+        grouped = event_df.groupby("Day")
+        days = list(grouped.groups)
+        utilities = overlap_utilities([grouped.get_group(day) for day in days], workers=workers, chunksize=chunksize)
 
-        return utilities
+        return pd.Series(utilities, index=pd.Index(days, name="Day"))
         
 
 
@@ -135,22 +85,31 @@ class GenericEventCollection:
         
     def expected_utility_grouped_by_day(self):
         event_df: pd.DataFrame = self.get_event_df().copy()
-        event_df["Day"] = event_df.apply(lambda x: ','.join(x.name[0].split(',')[:3]), axis=1)
+        event_df["Day"] = self.retrieval_days(event_df)
         event_df["Expected utility"] = event_df["Event"].apply(lambda event: event.keu)
 
         return event_df.groupby(["Day"])["Expected utility"].sum()
 
     def utility_grouped_by_day(self):
         event_df: pd.DataFrame = self.get_event_df().copy()
-        event_df["Day"] = event_df.apply(lambda x: ','.join(x.name[0].split(',')[:3]), axis=1)
+        event_df["Day"] = self.retrieval_days(event_df)
         event_df["Utility"] = event_df.apply(lambda x: x["Event"].log_utility(x["Outcome"]), axis=1)
 
         return event_df.groupby(["Day"])["Utility"].sum()
 
 
 class EventCollection(GenericEventCollection):
-    def __init__(self, event_df: pd.DataFrame):
-        self.event_df = event_df
+    def __init__(self, event_df: pd.DataFrame, event_table: EventTable | None = None):
+        """
+        Events are stored in an EventTable aligned with the rows of 'event_df'.
+        Without 'event_table', it is built from the "Event" column of 'event_df' if present, otherwise from preprocessed rows.
+        """
+
+        if event_table is None:
+            event_table = EventTable.from_events(event_df["Event"].tolist()) if "Event" in event_df.columns else EventTable.from_event_df(event_df)
+
+        self.event_df = event_df.drop(columns=["Event"], errors='ignore')
+        self.event_table = event_table
 
     @classmethod
     def from_event_dataframe(cls, event_df: pd.DataFrame):
@@ -158,10 +117,35 @@ class EventCollection(GenericEventCollection):
     
 
     def get_event_df(self):
-        return self.event_df
+        # Event views of the table rows, created on every call
+        return self.event_df.assign(Event=self.event_table.events())
 
     def set_event_df(self, event_df):
-        self.event_df = event_df
+        self.__init__(event_df)
+
+    def calculate_bet_sizes(self):
+        self.event_table.calculate_bet_sizes()
+
+    def filter_zero_bet_size(self):
+        nonzero = self.event_table.s.sum(axis=1) != 0
+        self.event_df = self.event_df[nonzero]
+        self.event_table = self.event_table.take(np.flatnonzero(nonzero))
+
+    def expected_utility(self):
+        return self.event_table.keu.sum()
+
+    def utility(self):
+        return self.event_table.log_utilities(self.event_df["Outcome"].to_numpy(dtype=np.int64)).sum()
+
+    def expected_utility_grouped_by_day(self):
+        expected_utility = pd.Series(self.event_table.keu, index=pd.Index(self.retrieval_days(self.event_df), name="Day"), name="Expected utility")
+
+        return expected_utility.groupby(level="Day").sum()
+
+    def utility_grouped_by_day(self):
+        utility = pd.Series(self.event_table.log_utilities(self.event_df["Outcome"].to_numpy(dtype=np.int64)), index=pd.Index(self.retrieval_days(self.event_df), name="Day"), name="Utility")
+
+        return utility.groupby(level="Day").sum()
 
 
 class MultiEventCollection(GenericEventCollection):
@@ -186,12 +170,12 @@ class MultiEventCollection(GenericEventCollection):
 
     def combine_grouped_events(self, rows: pd.DataFrame) -> pd.DataFrame:
         multi_event = MultiEvent.from_series(rows["Event"])
-        new_row = pd.DataFrame({"Event": [multi_event], "Outcome": [rows["Outcome"].tolist()], "End date": [latest_date_str(rows["End date"].tolist())]})
+        new_row = pd.DataFrame({"Event": [multi_event], "Outcome": [rows["Outcome"].tolist()], "End date": [rows["End date"].max()]})
 
         return new_row
 
     def group_events(self, event_collection: EventCollection, k: int): # k - number of events in a MultiEvent
-        event_df = event_collection.event_df.copy()
+        event_df = event_collection.get_event_df()
 
         event_df['Subgroup spec'] = event_df.groupby(level=["Retrieval date", "Bookmaker"]).cumcount()
         event_df['Subgroup spec'] = event_df['Subgroup spec'].apply(lambda x: (x - (x%k)) // k)
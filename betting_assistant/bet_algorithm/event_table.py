@@ -0,0 +1,239 @@
+"""
+Module for the columnar storage of single events.
+
+An EventTable keeps the probabilities, variable-to-outcome odds matrices, bet sizes and expected log utilities of many single events
+in contiguous arrays, padded to the largest bet type, instead of one Event object per row.
+Impossible outcomes of a bet (e.g. a returned stake on a .5 line) are pruned: every row keeps only its possible outcomes,
+together with their canonical indices in ResultClassifier.bet_type_outcomes.
+Event objects are created on demand as views of the table rows.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List
+
+from .events import Event
+from .bet_identifier import BetIdentifier
+from .result_classification import BetTypeTable, ResultClassifier, Var2outcomeSchema
+from . import utility
+
+
+def _values(event_df: pd.DataFrame, name: str) -> np.ndarray:
+    # values of a column or an index level
+    if name in event_df.columns:
+        return event_df[name].to_numpy()
+    return event_df.index.get_level_values(name).to_numpy()
+
+
+class EventTable:
+    def __init__(self, probabilities: np.ndarray, var2outcome_odds: np.ndarray, m: np.ndarray, n: np.ndarray,
+                 match_ids: np.ndarray, bet_types: np.ndarray, bet_type_values: np.ndarray,
+                 s: np.ndarray | None = None, keu: np.ndarray | None = None, outcomes: np.ndarray | None = None):
+        """
+        Row i is an event with m[i] variables (the null variable included) and n[i] outcomes:
+        probabilities[i, :n[i]], var2outcome_odds[i, :m[i], :n[i]] and bet sizes s[i, :m[i]]. Padding is zero.
+        Outcome j of row i is the outcome outcomes[i, j] of the bet type (by default, j).
+
+        Expected log utilities 'keu' are NaN until bet sizes are calculated.
+        """
+
+        self.probabilities = probabilities
+        self.var2outcome_odds = var2outcome_odds
+        self.m = m
+        self.n = n
+
+        self.match_ids = match_ids
+        self.bet_types = bet_types
+        self.bet_type_values = bet_type_values # NaN if the bet type has no value
+
+        self.s = np.zeros(shape=var2outcome_odds.shape[:2]) if s is None else s
+        self.keu = np.full(shape=(len(m),), fill_value=np.nan) if keu is None else keu
+        self.outcomes = np.broadcast_to(np.arange(probabilities.shape[1]), probabilities.shape).copy() if outcomes is None else outcomes
+
+    @classmethod
+    def empty(cls, size: int, max_m: int, max_n: int):
+        return cls(np.zeros(shape=(size, max_n)), np.zeros(shape=(size, max_m, max_n)),
+                   np.zeros(size, dtype=np.int64), np.zeros(size, dtype=np.int64),
+                   np.empty(size, dtype=object), np.zeros(size, dtype=np.int64), np.full(shape=(size,), fill_value=np.nan),
+                   outcomes=np.zeros(shape=(size, max_n), dtype=np.int64))
+
+    @classmethod
+    def from_event_df(cls, event_df: pd.DataFrame):
+        """
+        Create a table from preprocessed rows with columns (or index levels) "ID", "Bet type", "Bet type value", "Odds" and "Probability".
+
+        Variable-to-outcome odds matrices are built per bet type from the listed odds, with the null variable appended,
+        and restricted to the possible outcomes of the line class of the bet type value.
+        """
+
+        bet_types = _values(event_df, "Bet type").astype(np.int64)
+        listed_odds = event_df["Odds"].tolist()
+        probabilities = event_df["Probability"].tolist()
+
+        max_m = np.max(BetTypeTable.n_variables[bet_types-1], initial=0) + 1
+        max_n = np.max(BetTypeTable.n_outcomes[bet_types-1], initial=0)
+        table = cls.empty(len(event_df), max_m, max_n)
+        table.match_ids[:] = _values(event_df, "ID")
+        table.bet_types[:] = bet_types
+        table.bet_type_values[:] = _values(event_df, "Bet type value").astype(float)
+        line_classes = ResultClassifier.line_class(table.bet_type_values)
+
+        groups = bet_types * len(ResultClassifier.line_classes) + line_classes
+        for group in np.unique(groups).tolist():
+            rows = np.flatnonzero(groups == group)
+            bet_type, line_class = bet_types[rows[0]], line_classes[rows[0]]
+            possible = BetTypeTable.possible_outcomes[bet_type-1][line_class]
+            m, n = BetTypeTable.n_variables[bet_type-1], len(possible)
+
+            odds = np.array([listed_odds[i] for i in rows], dtype=float).reshape((-1, m))
+            coefficient = Var2outcomeSchema.bet_type_odds_coefficient[bet_type-1][:, possible]
+            constant = Var2outcomeSchema.bet_type_constant[bet_type-1][:, possible]
+            table.var2outcome_odds[rows, :m, :n] = odds[:, :, None] * coefficient + constant
+            table.var2outcome_odds[rows, m, :n] = 1 # null variable
+            table.probabilities[rows, :n] = np.array([probabilities[i] for i in rows], dtype=float).reshape((-1, BetTypeTable.n_outcomes[bet_type-1]))[:, possible]
+            table.outcomes[rows, :n] = possible
+            table.m[rows] = m + 1
+            table.n[rows] = n
+
+        return table
+
+    @classmethod
+    def from_events(cls, events: List[Event]):
+        """
+        Create a table from single events (with 2-D variable-to-outcome odds matrices).
+        """
+
+        if any(event.type != "Event" for event in events):
+            raise ValueError("EventTable stores single events only")
+
+        table = cls.empty(len(events), max([event.m for event in events], default=0), max([event.n for event in events], default=0))
+        for i, event in enumerate(events):
+            table.probabilities[i, :event.n] = event.probabilities
+            table.var2outcome_odds[i, :event.m, :event.n] = event.var2outcome_odds
+            table.outcomes[i, :event.n] = event.outcomes
+            table.m[i], table.n[i] = event.m, event.n
+
+            bet_id = event.bet_id[0]
+            table.match_ids[i], table.bet_types[i] = bet_id.match_id, bet_id.bet_type
+            table.bet_type_values[i] = np.nan if bet_id.bet_type_value is None else bet_id.bet_type_value
+
+            if event.s is not None:
+                table.s[i, :event.m] = event.s.reshape((-1,))
+                table.keu[i] = event.keu
+
+        return table
+
+    def __len__(self) -> int:
+        return len(self.m)
+
+    def take(self, indices: np.ndarray) -> "EventTable":
+        """
+        Return a table consisting of the rows given by 'indices'.
+        """
+
+        return EventTable(self.probabilities[indices], self.var2outcome_odds[indices], self.m[indices], self.n[indices],
+                          self.match_ids[indices], self.bet_types[indices], self.bet_type_values[indices], self.s[indices], self.keu[indices],
+                          self.outcomes[indices])
+
+    def bet_identifier(self, i: int) -> BetIdentifier:
+        return BetIdentifier(self.match_ids[i], int(self.bet_types[i]), self.bet_type_values[i])
+
+    def event(self, i: int) -> Event:
+        """
+        Return an Event whose probabilities, odds matrix and bet sizes are views of row i.
+        """
+
+        m, n = self.m[i], self.n[i]
+        event = Event(self.probabilities[i, :n], self.var2outcome_odds[i, :m, :n], [self.bet_identifier(i)], outcomes=self.outcomes[i, :n])
+        if not np.isnan(self.keu[i]):
+            event.s = self.s[i, :m]
+            event.keu = self.keu[i]
+            event.calculated_prt = event.profit_ratio_tensor(event.s)
+
+        return event
+
+    def events(self) -> List[Event]:
+        return [self.event(i) for i in range(len(self))]
+
+    def shape_groups(self):
+        """
+        Yield (rows, m, n) for every group of rows with the same number of variables and outcomes.
+        """
+
+        shapes = self.m * (self.var2outcome_odds.shape[2]+1) + self.n
+        for shape in np.unique(shapes).tolist():
+            rows = np.flatnonzero(shapes == shape)
+            yield rows, self.m[rows[0]], self.n[rows[0]]
+
+    def profit_ratios(self, rows: np.ndarray, m: int, n: int, s: np.ndarray) -> np.ndarray:
+        """
+        Return profit-to-budget ratios (rows, outcomes) of bet sizes 's' (rows, m) on rows of the same shape.
+        """
+
+        return np.matmul(Event.TAX * self.var2outcome_odds[rows, :m, :n].transpose((0, 2, 1)) - 1, s[:, :, None])[:, :, 0]
+
+    def expected_log_utilities(self, rows: np.ndarray, m: int, n: int, s: np.ndarray) -> np.ndarray:
+        """
+        Vectorized UtilityOptimizer.expected_log_utility on rows of the same shape.
+        """
+
+        prt = self.profit_ratios(rows, m, n, s)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilities = np.sum(self.probabilities[rows, :n] * np.log(1 + prt), axis=1)
+
+        return np.where(np.any(prt <= -1, axis=1), -100, utilities)
+
+    def diagonal_outcomes(self, rows: np.ndarray, m: int, n: int):
+        """
+        Vectorized UtilityOptimizer.diagonal_outcomes on rows of the same shape.
+
+        Returns a mask of diagonal rows and, for every row, the outcome won by each (non-null) variable.
+        """
+
+        wins = (self.var2outcome_odds[rows, :m-1, :n] != 0) & (self.probabilities[rows, None, :n] > 0) # the last variable is the null variable
+        diagonal = np.all(wins.sum(axis=2) == 1, axis=1) & np.all(wins.sum(axis=1) <= 1, axis=1)
+
+        return diagonal, np.argmax(wins, axis=2)
+
+    def calculate_bet_sizes(self) -> None:
+        """
+        Set bet sizes to the Event.PART_KELLY fraction of Kelly bet sizes (see Event.set_kelly_bet_size).
+
+        Diagonal rows are solved together per shape with utility.diagonal_kelly_bet_size(), the rest one by one through Event views.
+        """
+
+        for rows, m, n in self.shape_groups():
+            diagonal, outcomes = self.diagonal_outcomes(rows, m, n)
+
+            for i in rows[~diagonal].tolist():
+                event = self.event(i)
+                event.calculate_bet_size()
+                self.s[i, :m] = event.s.reshape((-1,))
+                self.keu[i] = event.keu
+
+            rows, outcomes = rows[diagonal], outcomes[diagonal]
+            if len(rows) == 0:
+                continue
+            p = np.take_along_axis(self.probabilities[rows, :n], outcomes, axis=1)
+            c = Event.TAX * np.take_along_axis(self.var2outcome_odds[rows, :m-1, :n], outcomes[:, :, None], axis=2)[:, :, 0]
+
+            kelly_s = np.append(utility.diagonal_kelly_bet_size(p, c), np.zeros(shape=(len(rows), 1)), axis=1)
+            kelly_s *= kelly_s > 0.01 # discard small bet sizes
+            kelly_s[self.expected_log_utilities(rows, m, n, kelly_s) <= 1e-6] = 0
+
+            s = Event.PART_KELLY * kelly_s
+            self.s[rows, :m] = s
+            self.keu[rows] = self.expected_log_utilities(rows, m, n, s)
+
+    def log_utilities(self, outcomes: np.ndarray) -> np.ndarray:
+        """
+        Vectorized Event.log_utility: logarithmic utility of the outcome (canonical index) of every row.
+        """
+
+        # position of the outcome among the outcomes of the row; padding (zero) comes after the possible outcomes, which are increasing
+        positions = np.sum((self.outcomes < outcomes.reshape((-1, 1))) & (np.arange(self.outcomes.shape[1]) < self.n.reshape((-1, 1))), axis=1)
+
+        # padded variables have zero bet size, so they do not contribute
+        coefficients = Event.TAX * np.take_along_axis(self.var2outcome_odds, positions.reshape((-1, 1, 1)), axis=2)[:, :, 0] - 1
+
+        return np.log(np.sum(coefficients * self.s, axis=1) + 1)
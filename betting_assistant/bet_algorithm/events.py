@@ -13,12 +13,18 @@ class Event:
     TAX: float = 0.88 # tax multiplier
     PART_KELLY: float = 0.4
 
-    def __init__(self, probabilities: np.ndarray, var2outcome_odds: np.ndarray, bet_identifier: List[BetIdentifier], add_null_variable: bool = False, suppress_calculation: bool = True):
+    def __init__(self, probabilities: np.ndarray, var2outcome_odds: np.ndarray, bet_identifier: List[BetIdentifier], add_null_variable: bool = False, suppress_calculation: bool = True, outcomes: np.ndarray | None = None):
+        """
+        'outcomes' are the canonical indices (in ResultClassifier.bet_type_outcomes) of the outcomes the event is defined on, in increasing order.
+        By default, all outcomes of the bet type; events with impossible outcomes pruned carry only the possible ones.
+        """
+
         self.bet_id: List[BetIdentifier] = bet_identifier[:]
 
         self.probabilities = probabilities
         self.n: int = self.probabilities.shape[0]
         self.m = var2outcome_odds.shape[0]
+        self.outcomes = np.arange(self.n) if outcomes is None else outcomes
 
         # adding an additional null variable with odds 1 for every outcome (for the sake of combining events into a multievent)
         if add_null_variable:
@@ -48,15 +54,29 @@ class Event:
 
     def calculate_bet_size(self):
         uopt = utility.UtilityOptimizer(event=self) 
-        self.s = self.PART_KELLY * uopt.kelly_bet_size()
-        self.keu = uopt.expected_log_utility(self.s)
+        self.set_kelly_bet_size(uopt.kelly_bet_size())
+
+    def set_kelly_bet_size(self, kelly_s: np.ndarray):
+        """
+        Set the bet size to the PART_KELLY fraction of the Kelly bet size 'kelly_s'.
+        """
+
+        self.s = self.PART_KELLY * kelly_s
+        self.keu = utility.UtilityOptimizer(event=self).expected_log_utility(self.s)
         self.calculated_prt = self.profit_ratio_tensor(self.s)
 
-    def calculate_entangled_bet_size(self, ongoing_events):
+    def calculate_entangled_bet_size(self, ongoing_events, portfolio=None):
+        """
+        'portfolio' (portfolio.Portfolio) optionally provides the incrementally maintained state of the ongoing events.
+        """
+
         if len(ongoing_events) == 0:
             self.calculate_bet_size()
             return
-        cuopt = utility.CollectiveUtilityOptimizer(ongoing_events=ongoing_events, event=self)
+        if portfolio is None:
+            cuopt = utility.CollectiveUtilityOptimizer(ongoing_events=ongoing_events, event=self)
+        else:
+            cuopt = portfolio.collective_optimizer(ongoing_events, self)
         self.s = self.PART_KELLY * cuopt.kelly_bet_size()
         self.keu = cuopt.expected_log_utility(self.s)
         self.calculated_prt = self.profit_ratio_tensor(self.s)
@@ -72,12 +92,37 @@ class Event:
 
         return (self.TAX * self.var2outcome_odds.T - 1) @ s.reshape((-1, 1)).reshape((-1,))
 
+    def weighted_profit(self, w: np.ndarray) -> np.ndarray:
+        """
+        Return the sum over outcomes of 'w' times the profit-to-budget ratio coefficient of each variable (shaped as s).
+        """
+
+        return (self.TAX * self.var2outcome_odds - 1) @ w
+
+    def weighted_squared_profit(self, w: np.ndarray) -> np.ndarray:
+        """
+        Return the sum over outcomes of 'w' times the squared profit-to-budget ratio coefficient of each variable (shaped as s).
+        """
+
+        return (self.TAX * self.var2outcome_odds - 1)**2 @ w
+
+    def outcome_index(self, outcome: int) -> int:
+        """
+        Return the position of the canonical outcome index 'outcome' in the outcome space of the event.
+        """
+
+        index = int(np.searchsorted(self.outcomes, outcome))
+        if index == self.n or self.outcomes[index] != outcome:
+            raise ValueError(f"outcome {outcome} is not in the outcome space of the event")
+
+        return index
+
     def profit_ratio(self, outcome: int) -> float:
         """
-        Return profit-to-budget ratio of the outcome.
+        Return profit-to-budget ratio of the outcome (canonical index).
         """
 
-        return (((self.TAX * self.var2outcome_odds.T - 1)[outcome]) @ self.s.reshape((-1, 1)))[0]
+        return (((self.TAX * self.var2outcome_odds.T - 1)[self.outcome_index(outcome)]) @ self.s.reshape((-1, 1)))[0]
 
     def total_return(self, outcome: int) -> float:
         return self.retrieval_budget * (self.s.sum() + self.profit_ratio(outcome))
@@ -87,9 +132,9 @@ class Event:
         Calculate logarithmic utility of the outcome.
         """
 
-        r = ((self.TAX*self.var2outcome_odds.T - 1)[outcome]) @ self.s 
+        r = ((self.TAX*self.var2outcome_odds.T - 1)[self.outcome_index(outcome)]) @ self.s.reshape((-1,))
 
-        return np.log(r+1)[0]
+        return np.log(r+1)
 
     def __repr__(self) -> str:
         return ("Probabilities =\n"
@@ -105,12 +150,25 @@ class Event:
 class MultiEvent(Event):
     type = "MultiEvent"
     def __init__(self, events: List[Event], rows = None):
+        """
+        A combination of single events (legs). Only the joint probability tensor is stored;
+        the joint variable-to-outcome odds tensor is the product of the legs' matrices and is never needed in full (see var2outcome_odds).
+        """
+
         self.rows = rows
-        self.events: List[Event] = [events[0]]
-        super().__init__(np.copy(events[0].probabilities), np.copy(events[0].var2outcome_odds), events[0].bet_id)
-        for event in events[1:]:
+        self.events: List[Event] = []
+        self.bet_id: List[BetIdentifier] = []
+        self.varshape = []
+
+        self.probabilities = np.ones(shape=())
+        self.m = 1
+        self.n = 1
+        for event in events:
             self.add_event(event)
 
+        self.s = None
+        self.keu = None
+
     @classmethod
     def from_event_list(cls, events: List[Event]):
         return cls(events)
@@ -135,7 +193,6 @@ class MultiEvent(Event):
         assert len(event.var2outcome_odds.shape) == 2
     
         self.probabilities = np.multiply.outer(self.probabilities, event.probabilities)
-        self.var2outcome_odds = np.moveaxis(np.multiply.outer(self.var2outcome_odds, event.var2outcome_odds), -2, 0)
 
         self.m *= event.m
         self.n *= event.n
@@ -143,9 +200,31 @@ class MultiEvent(Event):
         self.events.append(event)
         self.bet_id += event.bet_id
         self.varshape += event.varshape
-    
-        assert self.m * self.n == np.prod(self.var2outcome_odds.shape)
-        assert len(self.var2outcome_odds.shape) == 2*len(self.events)
+
+    @property
+    def var2outcome_odds(self) -> np.ndarray:
+        """
+        Joint variable-to-outcome odds tensor, with variable axes in reverse order (mk, ..., m1) followed by outcome axes (n1, ..., nk).
+
+        Materialized on every access, its size is the product of the legs' matrix sizes; computations contract the legs one by one instead.
+        """
+
+        var2outcome_odds = self.events[0].var2outcome_odds
+        for event in self.events[1:]:
+            var2outcome_odds = np.moveaxis(np.multiply.outer(var2outcome_odds, event.var2outcome_odds), -2, 0)
+
+        return var2outcome_odds
+
+    @staticmethod
+    def _contract_first_axis(x: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        # contract the first axis of x with the first axis of matrix, the second axis of matrix becomes the last axis
+        return (x.reshape((x.shape[0], -1)).T @ matrix).reshape(x.shape[1:] + matrix.shape[1:])
+
+    def _contract_outcomes(self, w: np.ndarray, power: int = 1) -> np.ndarray:
+        # sum over outcomes of w times the product of the legs' odds (to the given power), shaped as s
+        for event in self.events:
+            w = self._contract_first_axis(w, (event.var2outcome_odds**power).T)
+        return w
 
     def profit_ratio_tensor(self, s: np.ndarray) -> np.ndarray:
         """
@@ -153,14 +232,26 @@ class MultiEvent(Event):
         """
 
         assert len(s.shape) == len(self.events)
-        return np.tensordot(self.TAX * self.var2outcome_odds - 1, s, axes=(np.arange(len(self.events)-1, -1, -1), np.arange(len(self.events))))
+
+        # contract the variable axes with the legs' odds one by one
+        x = s
+        for event in self.events:
+            x = self._contract_first_axis(x, event.var2outcome_odds)
+
+        return self.TAX * x - s.sum()
+
+    def weighted_profit(self, w: np.ndarray) -> np.ndarray:
+        return self.TAX * self._contract_outcomes(w) - w.sum()
+
+    def weighted_squared_profit(self, w: np.ndarray) -> np.ndarray:
+        return self.TAX**2 * self._contract_outcomes(w, power=2) - 2 * self.TAX * self._contract_outcomes(w) + w.sum()
 
     def profit_ratio(self, outcomes: List[int]) -> float:
         """
-        Return profit-to-budget ratio of the outcomes.
+        Return profit-to-budget ratio of the outcomes (canonical indices, one per subevent).
         """
 
-        return self.calculated_prt[tuple(outcomes)]
+        return self.calculated_prt[tuple(event.outcome_index(outcome) for event, outcome in zip(self.events, outcomes))]
 
     def total_return(self, outcomes: List[int]) -> float:
         """
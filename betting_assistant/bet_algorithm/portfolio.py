@@ -0,0 +1,147 @@
+"""
+Module for the incremental state of ongoing bets during an overlap simulation.
+
+A CollectiveUtilityOptimizer needs the probability tensor over the bet id basis of the new event and its ongoing events,
+and the summed profit-to-ratio tensor of the ongoing events. Building both from scratch costs a pass over every ongoing event for every decision.
+The Portfolio keeps them per bet id basis and updates them when a bet is placed or evaluated,
+so that a decision only pays for the events that changed since the last decision on the same basis.
+The probability tensor is refreshed from the events of every decision, since a later retrieval of a bet comes with new probabilities;
+it is rebuilt only when they differ from the cached ones.
+"""
+
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List
+
+from .utility import CollectiveUtilityOptimizer, broadcast_to_basis
+
+
+class PortfolioState:
+    def __init__(self, events: list):
+        """
+        State over the bet id basis spanned by 'events' (multi-events).
+        """
+
+        basis_probabilities = self.basis_probabilities(events)
+        self.basis: Dict = {bet_id: count for count, bet_id in enumerate(basis_probabilities)} # values give the order of axes for prt
+        self.broadcast_shape = tuple(len(basis_probabilities[bet_id]) for bet_id in self.basis)
+
+        self.probabilities_list: List[np.ndarray] = []
+        self.refresh(events)
+
+        # ongoing events whose profit-to-ratio tensors are summed in 'ongoing_prt', in insertion order
+        self.members: Dict = dict()
+        self.ongoing_prt = np.zeros(self.broadcast_shape)
+
+    @staticmethod
+    def basis_probabilities(events: list) -> Dict:
+        # bet id -> probabilities, the last event with a bet id giving them (as in CollectiveUtilityOptimizer without a state)
+        return {bet_id: e.probabilities for me in events for bet_id, e in zip(me.bet_id, me.get_events())}
+
+    def refresh(self, events: list) -> None:
+        """
+        Make the probability tensor that of the probabilities of 'events' (spanning the basis), rebuilding it only if they changed.
+        """
+
+        basis_probabilities = self.basis_probabilities(events)
+        probabilities_list = [basis_probabilities[bet_id] for bet_id in self.basis]
+        if len(probabilities_list) == len(self.probabilities_list) and all(p is q or np.array_equal(p, q) for p, q in zip(probabilities_list, self.probabilities_list)):
+            return
+
+        self.probabilities_list = probabilities_list
+        self.probabilities = 1
+        for probabilities in probabilities_list:
+            self.probabilities = np.multiply.outer(self.probabilities, probabilities)
+
+    def add(self, event) -> None:
+        self.members[event] = None
+        self.ongoing_prt = self.ongoing_prt + broadcast_to_basis(event.calculated_prt, event.bet_id, self.basis, self.broadcast_shape)
+
+    def remove(self, event) -> None:
+        del self.members[event]
+        if len(self.members) == 0:
+            # start over from zeros instead of accumulating rounding errors
+            self.ongoing_prt = np.zeros(self.broadcast_shape)
+        else:
+            self.ongoing_prt = self.ongoing_prt - broadcast_to_basis(event.calculated_prt, event.bet_id, self.basis, self.broadcast_shape)
+
+    def sync(self, ongoing_events: list) -> None:
+        """
+        Make 'ongoing_events' the members of the state, adding and removing only the events that differ.
+        """
+
+        ongoing = dict.fromkeys(ongoing_events)
+        for event in [e for e in self.members if e not in ongoing]:
+            self.remove(event)
+        for event in ongoing:
+            if event not in self.members:
+                self.add(event)
+
+
+class Portfolio:
+    """
+    Ongoing (placed and not yet evaluated) events, indexed by bet id, and the states of recently used bet id bases.
+    """
+
+    MAX_ENTANGLED = 20 # number of ongoing events collected for a new event
+    MAX_ONGOING = 4 # number of ongoing events taken into the collective utility
+    MAX_STATES = 32
+
+    def __init__(self):
+        self.bet_id_map_event: Dict = dict() # bet id -> ongoing events (as dict keys, in order of placement)
+        self.states: OrderedDict = OrderedDict() # frozenset of bet ids -> PortfolioState, least recently used first
+
+    def __len__(self) -> int:
+        return len({e for events in self.bet_id_map_event.values() for e in events})
+
+    def place(self, event) -> None:
+        for bid in event.bet_id:
+            self.bet_id_map_event.setdefault(bid, dict())[event] = None
+
+    def settle(self, event) -> None:
+        for bid in event.bet_id:
+            del self.bet_id_map_event[bid][event]
+            if len(self.bet_id_map_event[bid]) == 0:
+                del self.bet_id_map_event[bid]
+
+        for state in self.states.values():
+            if event in state.members:
+                state.remove(event)
+
+    def entangled_events(self, event) -> list:
+        """
+        Return ongoing events sharing a bet id with 'event', in order of placement.
+        """
+
+        events = dict()
+        for bid in event.bet_id:
+            for e in self.bet_id_map_event.get(bid, ()):
+                if len(events) == self.MAX_ENTANGLED:
+                    break
+                events[e] = None
+
+        return list(events)[:self.MAX_ONGOING]
+
+    def state(self, events: list) -> PortfolioState:
+        """
+        Return the state of the bet id basis spanned by 'events', created if not cached.
+        """
+
+        key = frozenset(bid for e in events for bid in e.bet_id)
+        if key in self.states:
+            self.states.move_to_end(key)
+            return self.states[key]
+
+        state = PortfolioState(events)
+        self.states[key] = state
+        if len(self.states) > self.MAX_STATES:
+            self.states.popitem(last=False)
+
+        return state
+
+    def collective_optimizer(self, ongoing_events: List, event) -> CollectiveUtilityOptimizer:
+        state = self.state(ongoing_events + [event])
+        state.refresh(ongoing_events + [event])
+        state.sync(ongoing_events)
+
+        return CollectiveUtilityOptimizer(ongoing_events=ongoing_events, event=event, state=state)
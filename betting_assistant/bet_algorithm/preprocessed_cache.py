@@ -0,0 +1,180 @@
+"""
+Module for the on-disk cache of preprocessed data.
+
+preprocessing.start(DBLoader(days).all_data) is assembled from per-day entries: the preprocessed odds retrieved on a day,
+joined with the match data and results of their matches. A match listed on several days of 'days' takes the data of its first listing, as in DBLoader
+(matches are listed a few days before they start and results a few days after, rescheduled matches again).
+An entry is keyed by preprocessing.VERSION, a fingerprint of the day's odds files (sha256 of their contents, including segments not yet compacted,
+see scraper.segment_log) and of the match data and results joined with them (the first listings of its matches, see first_listings),
+so it depends only on the day's odds and the data of its own matches. Only new or changed days are preprocessed again;
+moving the start or the end of the range of days recomputes only the days whose matches have another first listing in the new range.
+
+Entries are pickled DataFrames in 'cache_path'. When their total size exceeds MAX_SIZE, the least recently used entries are evicted.
+
+Usage:
+    event_df = preprocessed_cache.load(utils.days_list_dbformat(START, END))
+"""
+
+import os
+import hashlib
+import pandas as pd
+from typing import Dict, List, Set
+
+from . import data_loading
+from . import preprocessing
+from ..scraper import scraper_main, segment_log
+
+cache_path = os.path.join(os.path.dirname(scraper_main.__file__), 'data', 'preprocessed')
+MAX_SIZE = 2 * 2**30 # bytes
+INFO_COLUMNS = {'match_data': ['Date'], 'results': ['Result', 'Partial results']} # columns joined with the odds (see Loader._combine_odds_match_data)
+
+
+def _table_path(table: str) -> str:
+    return os.path.join(data_loading.scraper_package_path, 'data', table)
+
+def _file_digest(path: str) -> str:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return 'missing'
+
+def day_digests(table: str, day: str) -> List[str]:
+    """
+    Return digests of the csv file and of the segments of the day's 'table'.
+    """
+
+    table_path = _table_path(table)
+    return [_file_digest(segment_log.day_file(table_path, day))] + [f"{n}:{_file_digest(segment)}" for n, segment in segment_log.segments(table_path, day)]
+
+def day_ids(day: str) -> Set[str]:
+    """
+    Return the match IDs of the odds of 'day' (empty if the day has no odds).
+    """
+
+    try:
+        return set(segment_log.read_day(_table_path('odds'), day, usecols=['ID'])['ID'].dropna())
+    except FileNotFoundError:
+        return set()
+
+def first_listings(table: str, days: List[str]) -> pd.DataFrame:
+    """
+    Return the INFO_COLUMNS of 'table' ('match_data' or 'results') of every match listed on 'days', indexed by ID,
+    from its first listing in the order of 'days' (as in DBLoader), with the day of the listing in column 'Day'.
+    """
+
+    dfs = []
+    for day in days:
+        try:
+            dfs.append(segment_log.read_day(_table_path(table), day, usecols=['ID'] + INFO_COLUMNS[table]).assign(Day=day))
+        except FileNotFoundError:
+            pass
+
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=INFO_COLUMNS[table] + ['Day'], index=pd.Index([], name='ID'))
+
+    listings = pd.concat(dfs, axis=0, ignore_index=True).set_index('ID')
+    return listings[~listings.index.duplicated(keep='first')]
+
+def match_info(day: str, listings: Dict[str, pd.DataFrame], ids=day_ids) -> Dict[str, pd.DataFrame]:
+    """
+    Return the first listings (see first_listings) of the matches of the odds of 'day', sorted by ID, per table of 'listings'.
+    """
+
+    match_ids = ids(day)
+    return {table: df[df.index.isin(match_ids)].sort_index() for table, df in listings.items()}
+
+def info_days(days: List[str], info: Dict[str, pd.DataFrame]) -> List[str]:
+    """
+    Return the days of 'days' holding the first listings 'info' (see match_info), in the order of 'days'.
+
+    Loading match data and results of these days only gives the same first listings of the matches as loading all of 'days'.
+    """
+
+    listing_days = set().union(*(df['Day'] for df in info.values()))
+    return [day for day in days if day in listing_days]
+
+def fingerprint(day: str, info: Dict[str, pd.DataFrame], digests=day_digests) -> str:
+    """
+    Return the key of the entry of 'day' with match data and results 'info' (see match_info). 'digests'(table, day) gives digests of source files.
+    """
+
+    sha = hashlib.sha256(f"{preprocessing.VERSION};{day};odds:{','.join(digests('odds', day))}".encode())
+
+    # the listed data, not the day it is listed on
+    for table, df in info.items():
+        sha.update(f";{table}:".encode())
+        sha.update(df[INFO_COLUMNS[table]].to_csv().encode())
+
+    return sha.hexdigest()
+
+
+def _entry_path(day: str, key: str) -> str:
+    return os.path.join(cache_path, f"{day}-{key}.pkl")
+
+def preprocess_day(day: str, info_days: List[str]) -> pd.DataFrame:
+    """
+    Return the preprocessed odds of 'day' joined with match data and results of 'info_days' (empty if there are none).
+    """
+
+    data = data_loading.DBLoader(days=[day], info_days=info_days).all_data
+    if data.empty:
+        return pd.DataFrame()
+
+    return preprocessing.start(data)
+
+def load_day(day: str, days: List[str], listings: Dict[str, pd.DataFrame], digests=day_digests, ids=day_ids) -> pd.DataFrame:
+    """
+    Return the entry of 'day' for a load of 'days' ('listings' as given by first_listings for 'days'), preprocessing and caching it if it is missing.
+    """
+
+    info = match_info(day, listings, ids)
+    path = _entry_path(day, fingerprint(day, info, digests))
+
+    try:
+        data = pd.read_pickle(path)
+        os.utime(path) # mark as recently used
+        return data
+    except FileNotFoundError:
+        pass
+
+    data = preprocess_day(day, info_days(days, info))
+
+    os.makedirs(cache_path, exist_ok=True)
+    data.to_pickle(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+    return data
+
+def evict(max_size: int = MAX_SIZE) -> None:
+    """
+    Remove the least recently used entries until their total size is at most 'max_size'.
+    """
+
+    try:
+        entries = [os.path.join(cache_path, name) for name in os.listdir(cache_path) if name.endswith('.pkl')]
+    except FileNotFoundError:
+        return
+
+    stats = sorted(((os.stat(entry), entry) for entry in entries), key=lambda x: x[0].st_mtime)
+    size = sum(stat.st_size for stat, _ in stats)
+    for stat, entry in stats:
+        if size <= max_size:
+            break
+        os.remove(entry)
+        size -= stat.st_size
+
+def load(days: List[str]) -> pd.DataFrame:
+    """
+    Return preprocessed data of 'days', like preprocessing.start(data_loading.DBLoader(days).all_data), from the cache.
+    """
+
+    listings = {table: first_listings(table, days) for table in INFO_COLUMNS}
+
+    dfs = [df for df in (load_day(day, days, listings) for day in days) if not df.empty]
+    evict()
+
+    if len(dfs) == 0:
+        return pd.DataFrame()
+
+    return preprocessing.sort_by_index(pd.concat(dfs, axis=0), 'Retrieval date')
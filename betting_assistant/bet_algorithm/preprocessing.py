@@ -1,30 +1,27 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 
 from . import probability
 from . import utils
-from .result_classification import ResultClassifier, Var2outcomeMatrix
-from .events import Event
-from .bet_identifier import BetIdentifier
+from .result_classification import ResultClassifier, BetTypeTable
 from ..scraper.aliases import bks, polish_bks, foreign_bks
 
 
-def change_dates_format(data: pd.DataFrame) -> pd.DataFrame:
-    """
-    Adjust date format in the DataFrame to "<year>,<month>,<day>,<hour>,<minute>" with no padded zeros.
-    """
+date_columns = ("Date", "Retrieval date", "End date", "Date spec") # int64 minutes since the epoch after change_dates_format
 
-    def remove_padded_zeros(number: str) -> str:
-        return str(int(number))
+VERSION = 1 # version of the output of start(); increase it when the output changes, to invalidate preprocessed_cache entries
 
+PROFILER = None # profiling.StageProfiler measuring the stages of start(); None runs them directly
+
+def change_dates_format(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert dates in the DataFrame to minutes since the epoch (int64).
 
-    # 'Retrieval date' -> remove padded zeros and reorder to match column 'Date'
-    new_order = [2, 1, 0, 3, 4]
-    data["Retrieval date"] = data["Retrieval date"].apply(lambda date: ','.join([remove_padded_zeros(date.split(',')[i]) for i in new_order]))
+    'Retrieval date' is given in "<day>,<month>,<year>,<hour>,<minute>" format, 'Date' in "<year>,<month>,<day>,<hour>,<minute>" format.
+    """
 
-    # 'Date' -> remove padded zeros
-    data["Date"] = data["Date"].apply(lambda date: ','.join(map(remove_padded_zeros, date.split(','))))
+    data["Retrieval date"] = utils.dates2minutes(data["Retrieval date"], day_first=True)
+    data["Date"] = utils.dates2minutes(data["Date"])
 
     return data
 
@@ -36,15 +33,14 @@ def add_approximate_end_date(data: pd.DataFrame) -> pd.DataFrame:
     It is approximated to be two hours after the start date.
     """
 
-    end_dates = data["Date"].apply(lambda date: utils.datetime2str(utils.str2datetime(date)+timedelta(hours=2)))
-    data["End date"] = end_dates
+    data["End date"] = data["Date"] + 2*60
     data = data.drop("Date", axis=1)
 
     # reorder columns
     data = data[[data.columns.tolist()[-1]] + data.columns.tolist()[:-1]]
 
     # drop rows with retrieval date later than end date
-    data = data[data.apply(lambda x: utils.later_date_str(x["Retrieval date"], x["End date"]), axis=1)]
+    data = data[(data["Retrieval date"] < data["End date"]).to_numpy()]
 
     return data
 
@@ -53,26 +49,29 @@ def filter_rows(data: pd.DataFrame) -> pd.DataFrame:
     Filter entries in the DataFrame.
     """
 
+    bet_types = data["Bet type"].to_numpy(dtype=np.int64)
+
     # keep only diagonal bets
-    data = data[data.apply(lambda x: ResultClassifier.is_bet_diagonal(x["Bet type"], x["Bet type value"]), axis=1)]
+    keep = BetTypeTable.is_bet_diagonal(bet_types, data["Bet type value"].to_numpy(dtype=float))
 
     # filter bet types
     # selected_bet_types = [1]
-    # data = data[data.apply(lambda x: x["Bet type"] in selected_bet_types, axis=1)]
+    # keep &= np.isin(bet_types, selected_bet_types)
 
     # drop asian bets
-    # data = data[data.apply(lambda x: not ResultClassifier.is_bet_asian(x["Bet type"], x["Bet type value"]), axis=1)]
+    # keep &= ResultClassifier.line_class(data["Bet type value"].to_numpy(dtype=float)) != 2
 
     # filter out rows with no results
-    data = data[data.apply(lambda x: not np.any(pd.isna(x["Result"])), axis=1)]
+    keep &= data["Result"].notna().to_numpy()
 
     # filter out rows where the number of listed odds doesn't match the correct value for the given bet type
-    data = data[data.apply(lambda x: len(x["25"]) == len(ResultClassifier.bet_type_variables[x["Bet type"]-1]), axis=1)]
+    n_variables = BetTypeTable.n_variables[np.clip(bet_types-1, 0, len(BetTypeTable.n_variables)-1)]
+    keep &= (data["25"].astype(object).str.len().to_numpy(dtype=float) == n_variables)
 
 
     # TODO: add new filters
 
-    data = data.reset_index(drop=True)
+    data = data[keep].reset_index(drop=True)
 
     return data
 
@@ -90,9 +89,8 @@ def sort_by_index(data: pd.DataFrame, level: str) -> pd.DataFrame:
     Sort by a specified index level.
     """
 
-    if level in ("Date", "Retrieval date", "End date", "Date spec"): # sort date in "Y,M,D,H,M" format
-        sort_key = lambda dates: dates.map(lambda date: (int(elem) for elem in date.split(',')))
-        return data.sort_index(axis=0, level=level, key=sort_key)
+    if level in date_columns: # dates in minutes since the epoch, rows with equal dates keep their order
+        return data.iloc[np.argsort(data.index.get_level_values(level).to_numpy(), kind='stable')]
     else:
         return data.sort_index(axis=0, level=level)
 
@@ -101,9 +99,8 @@ def sort_by_column(data: pd.DataFrame, column: str) -> pd.DataFrame:
     Sort by a specified column.
     """
 
-    if column in ("Date", "Retrieval date", "End date", "Date spec"): # sort date in "Y,M,D,H,M" format
-        sort_key = lambda dates_col: dates_col.apply(lambda date: tuple(int(elem) for elem in date.split(',')))
-        return data.sort_values(axis=0, by=column, key=sort_key)
+    if column in date_columns: # dates in minutes since the epoch, rows with equal dates keep their order
+        return data.sort_values(axis=0, by=column, kind='stable')
     else:
         return data.sort_values(axis=0, by=column)
 
@@ -129,23 +126,27 @@ def filter_invalid_odds(data: pd.DataFrame) -> pd.DataFrame:
     data = data[f]
     return data
 
-def add_var2outcome_column(data: pd.DataFrame) -> pd.DataFrame:
+def filter_odds_length(data: pd.DataFrame) -> pd.DataFrame:
     """
-    Create variable-to-outcome odds matrix for each row.
+    Drop rows where the number of listed odds doesn't match the number of variables of the bet type.
     """
-    
-    data['var2outcome'] = data.apply(lambda x: Var2outcomeMatrix.bet_type_var2outcome(x["Bet type"], x["Odds"]), axis=1)
 
-    data = data.dropna(subset=['var2outcome'])
+    bet_types = data["Bet type"].to_numpy(dtype=np.int64)
+    n_variables = BetTypeTable.n_variables[np.clip(bet_types-1, 0, len(BetTypeTable.n_variables)-1)]
 
-    return data
+    return data[data["Odds"].astype(object).str.len().to_numpy(dtype=float) == n_variables]
 
-def add_probability_column(data: pd.DataFrame) -> pd.DataFrame:
+def add_probability_column(data: pd.DataFrame, batched: bool = True) -> pd.DataFrame:
     """
     Infer probability for each row.
+
+    With 'batched', rows sharing bet type and impossible outcomes are solved together (see probability.infer_batch).
     """
     
-    data["Probability"] = data.apply(lambda x: probability.infer(x["25"], x["Bet type"], x["Bet type value"]), axis=1)
+    if batched and not data.empty:
+        data["Probability"] = probability.infer_batch(data["25"].tolist(), data["Bet type"].to_numpy(), data["Bet type value"].to_numpy())
+    else:
+        data["Probability"] = data.apply(lambda x: probability.infer(x["25"], x["Bet type"], x["Bet type value"]), axis=1)
 
     return data
 
@@ -154,56 +155,65 @@ def add_outcome_column(data: pd.DataFrame) -> pd.DataFrame:
     Classify result for each row.
     """
     
-    data['Outcome'] = data.apply(lambda x: ResultClassifier.bet_type_outcomes[x["Bet type"]-1].index(ResultClassifier.classify(x["Bet type"], x["Bet type value"], x["Result"], x["Partial results"])), axis=1)
+    goals = np.array(data["Result"].tolist(), dtype=np.int64).reshape((-1, 2))
+    data['Outcome'] = ResultClassifier.classify_array(data["Bet type"].to_numpy(dtype=np.int64), data["Bet type value"].to_numpy(dtype=float), goals[:, 0], goals[:, 1])
 
     data = data.drop(["Result", "Partial results"], axis=1)
 
     return data
 
-def add_bet_id_column(data: pd.DataFrame) -> pd.DataFrame:
-    data['Bet ID'] = data.apply(lambda x: BetIdentifier(x["ID"], x["Bet type"], x["Bet type value"]), axis=1)
-    return data
-
 def add_retrieval_batch_column(data: pd.DataFrame) -> pd.DataFrame:
-    data["Retrieval batch"] = data.apply(lambda x: x["Retrieval date"] if len(x["Retrieval date"].split(',')[-1]) == 1 else x["Retrieval date"][:-1], axis=1)
+    # the retrieval date with the last digit of a two-digit minute dropped: minutes 0-9 are kept, minutes 10-59 are grouped by tens
+    minute = data["Retrieval date"] % 60
+    data["Retrieval batch"] = data["Retrieval date"] - minute + np.where(minute < 10, minute, minute // 10)
     return data
 
-def create_events(data: pd.DataFrame) -> pd.DataFrame:
+
+def run_stage(stage, data: pd.DataFrame, *args) -> pd.DataFrame:
     """
-    Create an Event object for each bet.
+    Return stage(data, *args), measured by PROFILER if one is installed (see profiling.profile_stages).
     """
-    
-    data['Event'] = data.apply(lambda x: Event(x["Probability"], x["var2outcome"], [BetIdentifier(x["ID"], x["Bet type"], x["Bet type value"])], add_null_variable=True), axis=1)
 
-    return data
+    if PROFILER is None:
+        return stage(data, *args)
+
+    return PROFILER.run(stage, data, *args)
+
+def drop_duplicate_bets(data: pd.DataFrame) -> pd.DataFrame:
+    return data.drop_duplicates(subset=["ID", "Bet type", "Bet type value", "Bookmaker", "Retrieval batch"]) # same bet identifier, bookmaker and batch
 
 
 def prepare_rows(data: pd.DataFrame) -> pd.DataFrame:
-    data = filter_rows(data)
-    data = change_dates_format(data)
-    data = add_approximate_end_date(data)
-    data = add_outcome_column(data)
-    data = add_probability_column(data)
+    data = run_stage(filter_rows, data)
+    data = run_stage(change_dates_format, data)
+    data = run_stage(add_approximate_end_date, data)
+    data = run_stage(add_outcome_column, data)
+    data = run_stage(add_probability_column, data)
 
     return data
 
 def rows_to_event_format(data: pd.DataFrame) -> pd.DataFrame:
-    data = separate_bookmakers(data)
-    data = filter_invalid_odds(data)
-    data = add_var2outcome_column(data)
-    data = add_bet_id_column(data)
-    data = add_retrieval_batch_column(data)
-    data = data.drop_duplicates(subset=["Bet ID", "Bookmaker", "Retrieval batch"])
+    data = run_stage(separate_bookmakers, data)
+    data = run_stage(filter_invalid_odds, data)
+    data = run_stage(filter_odds_length, data)
+    data = run_stage(add_retrieval_batch_column, data)
+    data = run_stage(drop_duplicate_bets, data)
 
     return data
 
 
 def start(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Preprocess loaded data into event rows ["End date", "Outcome", "Probability", "Odds", ...] indexed by
+    ["Retrieval date", "Bookmaker", "ID", "Bet type", "Bet type value"].
+
+    Events are not created per row; event_collections.EventCollection stores them in an event_table.EventTable.
+    """
+
     data = prepare_rows(data)
     data = rows_to_event_format(data)
-    data = create_events(data)
-    data = index_by(data, levels=["Retrieval date", "Bookmaker", "ID", "Bet type", "Bet type value"])
-    data = sort_by_index(data, 'Retrieval date')
+    data = run_stage(index_by, data, ["Retrieval date", "Bookmaker", "ID", "Bet type", "Bet type value"])
+    data = run_stage(sort_by_index, data, 'Retrieval date')
 
     return data
     
\ No newline at end of file
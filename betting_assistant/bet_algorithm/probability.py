@@ -7,10 +7,12 @@ which leaves the possibility of easily calculating the probabilities as the inve
 
 import numpy as np
 import numpy.linalg as la
+import pandas as pd
 import scipy.optimize as opt 
-from typing import List, Optional, Dict
+from collections import defaultdict
+from typing import List, Optional, Dict, Tuple
 
-from .result_classification import Var2outcomeMatrix, ResultClassifier
+from .result_classification import Var2outcomeMatrix, Var2outcomeSchema, ResultClassifier
     
 
 def infer_impossible_outcomes(bet_type: int, bet_type_value: Optional[float] = None) -> List[int]:
@@ -23,6 +25,70 @@ def infer_impossible_outcomes(bet_type: int, bet_type_value: Optional[float] = N
     return zero_prob_outcomes
 
 
+def fair_odds(var2outcome_odds: np.ndarray, margin: float | np.ndarray, m: int) -> np.ndarray:
+    """
+    Remove the margin, spread evenly over m variables, from the odds in a var2outcome odds matrix (zero entries stay zero).
+
+    'margin' may be an array of shape (N,) for an (N, m, n) stack of matrices.
+    """
+
+    margin = np.reshape(margin, np.shape(margin) + (1,) * (var2outcome_odds.ndim - np.ndim(margin)))
+    nonzero = var2outcome_odds != 0
+    inverse_odds = np.divide(1, var2outcome_odds, out=np.zeros_like(var2outcome_odds, dtype=float), where=nonzero)
+
+    return np.divide(1, inverse_odds - margin/m, out=np.zeros(np.broadcast_shapes(inverse_odds.shape, margin.shape)), where=nonzero)
+
+
+def solve_margin_system(var2outcome_odds: np.ndarray, var2outcome_constant: np.ndarray, tol: float = 1e-10, max_iter: int = 50) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Solve the probabilities-plus-margin system of many bets at once with Newton's method.
+
+    'var2outcome_odds' is an (N, m, n) stack with m == n and 'var2outcome_constant' an (m, n) matrix shared by the stack.
+    For every bet, finds probabilities p and margin M such that (fair_odds(var2outcome_odds, M) - 1 + var2outcome_constant) @ p = 0 and sum(p) = 1.
+    Returns probabilities (N, n), margins (N,) and a boolean array (N,) of convergence status.
+    """
+
+    N, m, n = var2outcome_odds.shape
+    nonzero = var2outcome_odds != 0
+
+    x = np.empty(shape=(N, n+1))
+    x[:, :n] = 1/n
+    x[:, n] = 0.05
+
+    active = np.ones(shape=(N,), dtype=bool) # rows still iterating
+    converged = np.zeros(shape=(N,), dtype=bool)
+    for _ in range(max_iter+1):
+        if not np.any(active):
+            break
+
+        p, M = x[active, :n], x[active, n]
+        g = fair_odds(var2outcome_odds[active], M, m)
+        A = g - 1 + var2outcome_constant
+
+        residual = np.empty(shape=(len(p), m+1))
+        residual[:, :m] = np.einsum('bji,bi->bj', A, p)
+        residual[:, m] = p.sum(axis=1) - 1
+
+        rows = np.flatnonzero(active)
+        done = np.max(np.abs(residual), axis=1) <= tol
+        converged[rows[done]] = True
+
+        # analytic jacobian; d/dM 1/(1/x - M/m) = (1/m) * (1/(1/x - M/m))^2
+        jacobian = np.zeros(shape=(len(p), m+1, n+1))
+        jacobian[:, :m, :n] = A
+        jacobian[:, :m, n] = np.einsum('bji,bi->bj', np.where(nonzero[active], g**2, 0)/m, p)
+        jacobian[:, m, :n] = 1
+
+        # rows with a singular jacobian or a non-finite residual are given up on
+        solvable = ~done & np.isfinite(residual).all(axis=1) & (np.abs(la.det(jacobian)) > 1e-14)
+        active[rows[~solvable]] = False
+
+        if np.any(solvable):
+            x[rows[solvable]] -= la.solve(jacobian[solvable], residual[solvable][:, :, np.newaxis])[:, :, 0]
+
+    return x[:, :n], x[:, n], converged
+
+
 def infer(odds: List[float], bet_type: int, bet_type_value: Optional[float] = None):
     """
     Infer probabilities of outcomes based on bet type and listed odds.
@@ -45,12 +111,6 @@ def infer(odds: List[float], bet_type: int, bet_type_value: Optional[float] = No
     n -= len(zero_prob)
 
 
-    def fair_odds(matrix: np.ndarray, margin: float):
-        result = np.vectorize(lambda x: 0 if x==0 else 1/(1/x - margin/m)) (matrix)
-        result -= 1
-        return result
-
-
     if m == n:
         # no constant probability coefficients -> we can extract margin and odds from lhs by multiplying by 1/odds - M/m
         if np.min(var2outcome_constant) == 0 and np.max(var2outcome_constant) == 0:
@@ -72,7 +132,7 @@ def infer(odds: List[float], bet_type: int, bet_type_value: Optional[float] = No
 
                 const_term = np.append(np.zeros(shape=(m,1)), [[-1]], axis=0)
 
-                A = fair_odds(var2outcome_odds, M) + var2outcome_constant
+                A = fair_odds(var2outcome_odds, M, m) - 1 + var2outcome_constant
                 A = np.append(A, np.ones(shape=(1, n)), axis=0)
 
                 return (np.matmul(A, p) + const_term).reshape((-1,))
@@ -101,3 +161,102 @@ def infer(odds: List[float], bet_type: int, bet_type_value: Optional[float] = No
         solution = np.insert(solution, [elem-count for count, elem in enumerate(zero_prob)], [0 for _ in zero_prob])
 
     return solution.reshape((-1,))
+
+
+def infer_group(odds: np.ndarray, bet_type: int, bet_type_value: Optional[float] = None) -> np.ndarray:
+    """
+    Infer probabilities for a group of bets sharing bet type and impossible outcomes (any bet type value of the group can be given).
+
+    'odds' is an (N, m) array of listed odds. Returns an (N, n) array of probabilities, where n is the number of outcomes of the bet type.
+    Strict bets with no constant probability coefficients are solved in closed form, stacking their (m+1)x(m+1) systems into a single solve.
+    Strict bets with constant coefficients (stake returns, half-losses) are solved together with solve_margin_system().
+    """
+
+    odds = np.asarray(odds, dtype=float).reshape((len(odds), -1))
+    N, m = odds.shape
+    n_all = len(ResultClassifier.bet_type_outcomes[bet_type-1])
+
+    if m != len(ResultClassifier.bet_type_variables[bet_type-1]):
+        raise ValueError(f"bet type {bet_type} requires {len(ResultClassifier.bet_type_variables[bet_type-1])} listed odds, got {m}")
+
+    # preliminary inference
+    zero_prob = infer_impossible_outcomes(bet_type, bet_type_value)
+    possible = [e for e in range(n_all) if e not in zero_prob]
+    n = len(possible)
+
+    odds_coefficient = Var2outcomeSchema.bet_type_odds_coefficient[bet_type-1][:, possible]
+    var2outcome_constant = Var2outcomeSchema.bet_type_constant[bet_type-1][:, possible]
+
+    if m != n:
+        # not enough listed odds to infer the probabilities
+        return np.full(shape=(N, n_all), fill_value=np.nan)
+
+    var2outcome_odds = odds_coefficient[np.newaxis, :, :] * odds[:, :, np.newaxis] # (N, m, n)
+    probabilities = np.zeros(shape=(N, n_all))
+
+    if np.any(var2outcome_constant != 0):
+        # no closed form; newton iterations on the whole group, rows that did not converge are left to fsolve
+        solution, _, converged = solve_margin_system(var2outcome_odds, var2outcome_constant)
+        probabilities[:, possible] = solution
+        for i in np.flatnonzero(~converged):
+            probabilities[i] = infer(odds[i].tolist(), bet_type, bet_type_value)
+
+        return probabilities
+
+    variable_odds = np.max(var2outcome_odds, axis=2, keepdims=True) # (N, m, 1)
+
+    rhs = np.ones(shape=(N, m+1, 1))
+    rhs[:, :m, :] = 1/variable_odds
+
+    lhs = np.zeros(shape=(N, m+1, n+1))
+    lhs[:, :m, :n] = var2outcome_odds/variable_odds
+    lhs[:, :m, n] = 1/m
+    lhs[:, m, :n] = 1
+
+    solution = la.solve(lhs, rhs)[:, :n, 0]
+
+    # insert back the preliminarily inferred probabilities
+    probabilities[:, possible] = solution
+
+    return probabilities
+
+
+def infer_batch(odds: List[List[float]], bet_types: np.ndarray, bet_type_values: np.ndarray) -> np.ndarray:
+    """
+    Infer probabilities of outcomes for many bets at once.
+
+    Rows are grouped by (bet type, impossible outcomes) and every group is solved with infer_group().
+    Returns a 1-D object array with the same per-row results as infer().
+    """
+
+    bet_types = np.asarray(bet_types)
+    bet_type_values = np.asarray(bet_type_values, dtype=float)
+    probabilities = np.full(shape=(len(odds),), fill_value=np.nan, dtype=object)
+
+    # impossible outcomes depend only on (bet type, bet type value); evaluate them once per distinct pair
+    pairs = pd.DataFrame({"Bet type": bet_types, "Bet type value": bet_type_values})
+    groups = defaultdict(list)
+    group_bet_type_value = dict() # a representative bet type value of each group
+    for (bet_type, bet_type_value), rows in pairs.groupby(["Bet type", "Bet type value"], dropna=False).indices.items():
+        key = (bet_type, tuple(infer_impossible_outcomes(bet_type, bet_type_value)))
+        groups[key].append(rows)
+        group_bet_type_value[key] = bet_type_value
+
+    for (bet_type, zero_prob), rows in groups.items():
+        rows = np.concatenate(rows)
+        m = len(ResultClassifier.bet_type_variables[bet_type-1])
+
+        # rows with a wrong number of listed odds are left to infer()
+        regular = np.array([len(odds[i]) == m for i in rows], dtype=bool)
+        for i in rows[~regular]:
+            probabilities[i] = infer(odds[i], bet_type, bet_type_values[i])
+
+        rows = rows[regular]
+        if len(rows) == 0:
+            continue
+
+        group_probabilities = infer_group(np.array([odds[i] for i in rows]), bet_type, group_bet_type_value[(bet_type, zero_prob)])
+        for i, p in zip(rows, group_probabilities):
+            probabilities[i] = np.nan if np.all(np.isnan(p)) else p
+
+    return probabilities
@@ -0,0 +1,109 @@
+"""
+Module for profiling the stages of the preprocessing pipeline (preprocessing.start).
+
+Every stage run through preprocessing.run_stage() is measured while a StageProfiler is installed as preprocessing.PROFILER:
+wall time, CPU time, row counts of its input and output and the change of traced memory (tracemalloc) with its peak.
+Optionally each stage is run under cProfile and its statistics are dumped to '<cprofile_dir>/<index>_<stage>.prof'.
+With no profiler installed (the default), stages are called directly.
+
+Usage:
+    with profiling.profile_stages() as profiler:
+        event_df = preprocessing.start(data)
+    print(profiler.report())
+"""
+
+import os
+import time
+import cProfile
+import tracemalloc
+import pandas as pd
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    wall_time: float # seconds
+    cpu_time: float # seconds
+    rows_in: int
+    rows_out: int
+    memory_delta: int # bytes of traced memory allocated and not freed by the stage
+    memory_peak: int # bytes of traced memory at the peak of the stage, above its start
+
+
+class StageProfiler:
+    def __init__(self, cprofile_dir: Optional[str] = None, memory: bool = True):
+        self.cprofile_dir = cprofile_dir
+        self.memory = memory
+        self.records: List[StageRecord] = []
+        self.started_tracing = False
+
+    def close(self) -> None:
+        """
+        Stop tracing memory if this profiler started it.
+        """
+
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def run(self, stage: Callable, data: pd.DataFrame, *args):
+        """
+        Return stage(data, *args), recording its measurements.
+        """
+
+        rows_in = len(data) # stages may modify 'data' in place
+        profile = cProfile.Profile() if self.cprofile_dir is not None else None
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if self.memory:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profile is not None:
+            result = profile.runcall(stage, data, *args)
+        else:
+            result = stage(data, *args)
+        wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+        memory_delta = memory_peak = 0
+        if self.memory:
+            memory_end, peak = tracemalloc.get_traced_memory()
+            memory_delta, memory_peak = memory_end - memory_start, peak - memory_start
+
+        if profile is not None:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            profile.dump_stats(os.path.join(self.cprofile_dir, f"{len(self.records):02d}_{stage.__name__}.prof"))
+
+        self.records.append(StageRecord(stage.__name__, wall_time, cpu_time, rows_in, len(result), memory_delta, memory_peak))
+
+        return result
+
+    def report(self) -> pd.DataFrame:
+        """
+        Return the records of the profiled stages in order of running, one row per stage.
+        """
+
+        return pd.DataFrame([asdict(record) for record in self.records], columns=list(StageRecord.__dataclass_fields__))
+
+
+@contextmanager
+def profile_stages(cprofile_dir: Optional[str] = None, memory: bool = True):
+    """
+    Install a new StageProfiler as preprocessing.PROFILER for the duration of the block and yield it.
+    """
+
+    from . import preprocessing
+
+    previous = preprocessing.PROFILER
+    profiler = StageProfiler(cprofile_dir, memory)
+    preprocessing.PROFILER = profiler
+    try:
+        yield profiler
+    finally:
+        preprocessing.PROFILER = previous
+        profiler.close()
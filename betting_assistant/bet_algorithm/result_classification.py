@@ -4,7 +4,7 @@ from typing import List, Optional
 eps = 0.01
 
 def float_equals(a, b):
-    return abs(a-b) <= eps:
+    return abs(a-b) <= eps
 
     
 class ResultClassifier:
@@ -60,6 +60,22 @@ class ResultClassifier:
         return impossible
 
 
+    line_classes = ['whole', 'half', 'quarter'] # bet type value ends in .0, .5 or .25/.75
+    line_class_values = [0.0, 0.5, 0.25] # representative bet type value of each line class
+
+    @staticmethod
+    def line_class(bet_type_values: np.ndarray) -> np.ndarray:
+        """
+        Return indices of line classes (see ResultClassifier.line_classes) of bet type values. NaN values are classified as whole lines.
+        """
+
+        line_classes = np.zeros(len(bet_type_values), dtype=np.int64)
+        with np.errstate(invalid='ignore'):
+            line_classes[np.abs(bet_type_values % 0.5 - 0.25) <= eps] = 2
+            line_classes[np.abs(bet_type_values % 1 - 0.5) <= eps] = 1
+
+        return line_classes
+
     @staticmethod
     def classify(bet_type: int, bet_type_value: Optional[float], goals: List[int], partial_goals: List[int]) -> str:
         """
@@ -121,6 +137,53 @@ class ResultClassifier:
             raise ValueError
 
 
+    @staticmethod
+    def classify_array(bet_types: np.ndarray, bet_type_values: np.ndarray, home_goals: np.ndarray, away_goals: np.ndarray) -> np.ndarray:
+        """
+        Vectorized ResultClassifier.classify. Returns indices of outcomes in ResultClassifier.bet_type_outcomes of the respective bet types.
+        """
+
+        if np.any((bet_types < 1) | (bet_types > len(ResultClassifier.bet_type_outcomes))):
+            raise ValueError
+
+        home_win = home_goals > away_goals
+        draw = home_goals == away_goals
+
+        # lines: under-over is classified by the total goals, asian-handicap by the handicapped goal difference
+        with np.errstate(invalid='ignore'):
+            diff = np.where(bet_types == 2, home_goals + away_goals - bet_type_values, home_goals - away_goals + bet_type_values)
+            line_outcomes = np.select([diff >= 0.5 - eps, diff <= -0.5 + eps, diff >= 0.25 - eps, diff <= -0.25 + eps], [0, 1, 2, 3], default=4)
+
+        outcomes = np.select([(bet_types == 1) | (bet_types == 5), # ['1', 'x', '2']
+                              (bet_types == 2) | (bet_types == 4), # ['over', 'under', 'half-over', 'half-under', '-'] or ['1', '2', 'half-1', 'half-2', '-']
+                              bet_types == 3], # ['1', '2', '-']
+                             [np.where(home_win, 0, np.where(draw, 1, 2)),
+                              line_outcomes,
+                              np.where(home_win, 0, np.where(draw, 2, 1))],
+                             default=np.where((home_goals > 0) & (away_goals > 0), 0, 1)) # ['yes', 'no']
+
+        return outcomes.astype(np.int64)
+
+
+class BetTypeTable: # properties of bet types precomputed for every bet type and line class, for use on whole columns
+    n_variables = np.array([len(variables) for variables in ResultClassifier.bet_type_variables])
+    n_outcomes = np.array([len(outcomes) for outcomes in ResultClassifier.bet_type_outcomes])
+    possible_outcomes = [[[outcome for outcome in range(len(ResultClassifier.bet_type_outcomes[bet_type-1])) if outcome not in ResultClassifier.impossible_outcomes(bet_type, value)]
+                            for value in ResultClassifier.line_class_values] for bet_type in range(1, 7)]
+    diagonal = np.array([[ResultClassifier.is_bet_diagonal(bet_type, value) for value in ResultClassifier.line_class_values] for bet_type in range(1, 7)])
+
+    @staticmethod
+    def is_bet_diagonal(bet_types: np.ndarray, bet_type_values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized ResultClassifier.is_bet_diagonal. Unknown bet types are not diagonal.
+        """
+
+        known = (bet_types >= 1) & (bet_types <= len(BetTypeTable.diagonal))
+        bet_type_indices = np.where(known, bet_types-1, 0)
+
+        return known & BetTypeTable.diagonal[bet_type_indices, ResultClassifier.line_class(bet_type_values)]
+
+
 class Var2outcomeSchemaMethods: # defined in a separate class before Var2outcomeSchema in order to initalize static attributes in Var2outcomeSchema
     @staticmethod
     def _odds_coefficient(bet_type: int):
@@ -2,13 +2,143 @@ import pandas as pd
 import numpy as np
 from scipy.optimize import minimize
 from typing import List, Dict
+from collections import defaultdict
 from itertools import product as cartesian_product
 from time import time
 
 
+def diagonal_kelly_bet_size(probabilities: np.ndarray, odds: np.ndarray) -> np.ndarray:
+    """
+    Return log-utility optimal bet sizes for bets on mutually exclusive outcomes, one variable per outcome.
+
+    'probabilities' and 'odds' are (N, k) arrays: the probability of the outcome won by each variable and its effective decimal odds.
+    Outcomes not won by any variable are implied by the probabilities summing to less than 1.
+    Uses the exact sort-and-threshold solution: variables are sorted by expected return p*c and added while p*c exceeds
+    the reserve rate R = (1 - sum of p) / (1 - sum of 1/c) of the variables added so far; then s = p - R/c.
+    """
+
+    p = np.atleast_2d(np.asarray(probabilities, dtype=float))
+    c = np.atleast_2d(np.asarray(odds, dtype=float))
+    N, k = p.shape
+
+    order = np.argsort(-p*c, axis=1, kind='stable')
+    p_sorted = np.take_along_axis(p, order, axis=1)
+    c_sorted = np.take_along_axis(c, order, axis=1)
+
+    reserve_denominator = 1 - np.cumsum(1/c_sorted, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reserve_rate = (1 - np.cumsum(p_sorted, axis=1)) / reserve_denominator # after adding the first j+1 variables
+    reserve_rate_before = np.append(np.ones(shape=(N, 1)), reserve_rate[:, :-1], axis=1)
+
+    # a variable is added if it beats the current reserve rate and keeps the reserve rate well defined
+    added = (p_sorted*c_sorted > reserve_rate_before) & (reserve_denominator > 0)
+    n_added = np.cumprod(added, axis=1).sum(axis=1)
+
+    R = np.take_along_axis(np.append(np.ones(shape=(N, 1)), reserve_rate, axis=1), n_added.reshape((-1, 1)), axis=1)
+    s_sorted = np.where(np.arange(k) < n_added.reshape((-1, 1)), np.maximum(p_sorted - R/c_sorted, 0), 0)
+
+    s = np.empty_like(s_sorted)
+    np.put_along_axis(s, order, s_sorted, axis=1)
+
+    return s
+
+
+def profit_matrix(event) -> np.ndarray:
+    """
+    Return the (variables, outcomes) matrix of profit-to-budget ratio coefficients of an (multi)event,
+    with variables ordered as in s.reshape(-1) and outcomes as in probabilities.reshape(-1).
+    """
+
+    k = len(event.varshape)
+    coefficients = event.TAX * event.var2outcome_odds - 1
+
+    # variable axes are stored in reverse order (see MultiEvent.profit_ratio_tensor)
+    coefficients = np.transpose(coefficients, list(range(k-1, -1, -1)) + list(range(k, 2*k)))
+
+    return coefficients.reshape((int(np.prod(event.varshape)), -1))
+
+
+def initial_bet_size(event, budget: float = 1.0) -> np.ndarray:
+    """
+    Return a deterministic starting point for the optimizers, without the null variable (the last one).
+
+    Every variable is sized independently by the second-order approximation of log utility (mean / second moment of its profit),
+    then the sizes are scaled down to use at most half of the available budget.
+    """
+
+    mean = event.weighted_profit(event.probabilities).reshape((-1,))[:-1]
+    second_moment = event.weighted_squared_profit(event.probabilities).reshape((-1,))[:-1]
+    s0 = np.clip(mean / np.where(second_moment > 0, second_moment, 1), 0, 1)
+
+    if s0.sum() > budget/2:
+        s0 *= (budget/2) / s0.sum()
+
+    return s0
+
+
+def maximize_log_utility(utility, gradient, s0: np.ndarray, budget: float = 1.0, hessian=None, method: str = 'SLSQP') -> np.ndarray:
+    """
+    Maximize expected log utility over bet size vectors whose last (null) variable is fixed to zero.
+
+    The null variable is removed from the search space; 'utility', 'gradient' and 'hessian' are evaluated on full bet size vectors.
+    Returns the full bet size vector.
+    """
+
+    full = lambda x: np.append(x, 0)
+
+    options = dict()
+    if hessian is not None and method in ('trust-constr', 'Newton-CG', 'trust-ncg', 'trust-krylov', 'trust-exact'):
+        options['hess'] = lambda x: -hessian(full(x))[:-1, :-1]
+
+    result = minimize(lambda x: -utility(full(x)),
+                        s0,
+                        jac=lambda x: -gradient(full(x))[:-1],
+                        constraints=[{'type': 'ineq', 'fun': lambda x: budget-x.sum(), 'jac': lambda x: -np.ones_like(x)}],
+                        bounds=[(0,1)]*len(s0),
+                        tol=1e-9, # expected log utilities are typically of order 1e-4; cheap with exact gradients
+                        method=method,
+                        **options)
+
+    return full(result.x)
+
+
 class UtilityOptimizer:
     def __init__(self, event):
         self.event = event
+        self._profit_matrix = None
+
+    @property
+    def profit_matrix(self) -> np.ndarray:
+        if self._profit_matrix is None:
+            self._profit_matrix = profit_matrix(self.event)
+        return self._profit_matrix
+
+    @staticmethod
+    def kelly_bet_sizes(events: list) -> List[np.ndarray]:
+        """
+        Return Kelly bet size vectors for many events at once.
+
+        Diagonal events with the same number of variables are solved together with diagonal_kelly_bet_size(), the rest one by one.
+        """
+
+        optimizers = [UtilityOptimizer(event) for event in events]
+        bet_sizes = [None] * len(events)
+
+        diagonal_groups = defaultdict(list)
+        for i, uopt in enumerate(optimizers):
+            outcomes = uopt.diagonal_outcomes()
+            if outcomes is None:
+                bet_sizes[i] = uopt.kelly_bet_size()
+            else:
+                diagonal_groups[len(outcomes)].append((i, outcomes))
+
+        for group in diagonal_groups.values():
+            p = np.array([optimizers[i].event.probabilities[outcomes] for i, outcomes in group])
+            c = np.array([optimizers[i].diagonal_odds(outcomes) for i, outcomes in group])
+            for (i, _), s in zip(group, diagonal_kelly_bet_size(p, c)):
+                bet_sizes[i] = optimizers[i]._discard_small_bets(np.append(s, 0))
+
+        return bet_sizes
 
     def expected_log_utility(self, s: np.ndarray) -> float:
         """
@@ -22,18 +152,70 @@ class UtilityOptimizer:
         else:
             return np.sum(self.event.probabilities * np.log(1 + prt))
 
+    def diagonal_outcomes(self) -> np.ndarray | None:
+        """
+        Return the outcome won by each (non-null) variable if the event is diagonal, None otherwise.
+
+        In a diagonal event every variable wins exactly one possible outcome and no possible outcome is won by two variables.
+        """
+
+        if self.event.type != "Event" or len(self.event.var2outcome_odds.shape) != 2:
+            return None
+
+        possible = np.flatnonzero(self.event.probabilities > 0)
+        wins = self.event.var2outcome_odds[:-1, possible] != 0 # the last variable is the null variable
+
+        if np.any(wins.sum(axis=1) != 1) or np.any(wins.sum(axis=0) > 1):
+            return None
+
+        return possible[np.argmax(wins, axis=1)]
+
+    def diagonal_odds(self, outcomes: np.ndarray) -> np.ndarray:
+        """
+        Return effective (taxed) odds of each variable of a diagonal event.
+        """
+
+        return self.event.TAX * self.event.var2outcome_odds[np.arange(len(outcomes)), outcomes]
+
     def kelly_bet_size(self) -> np.ndarray:
         """
         Return a bet size vector that optimizes logarithmic utility.
+
+        Diagonal events are solved exactly, other structures numerically with SLSQP.
+        """
+
+        outcomes = self.diagonal_outcomes()
+        if outcomes is not None:
+            s = diagonal_kelly_bet_size(self.event.probabilities[outcomes], self.diagonal_odds(outcomes))[0]
+            return self._discard_small_bets(np.append(s, 0))
+
+        s0 = initial_bet_size(self.event)
+        s = maximize_log_utility(self.expected_log_utility, self.gradient_log_utility, s0, hessian=self.hessian_log_utility)
+
+        return self._discard_small_bets(s)
+
+    def gradient_log_utility(self, s: np.ndarray) -> np.ndarray:
+        """
+        Gradient of expected logarithmic utility with respect to the flattened bet size.
         """
 
-        result = minimize(lambda x: -self.expected_log_utility(x), 
-                        (1/(self.event.m+1))*np.random.random(self.event.m), 
-                        constraints=[{'type': 'ineq', 'fun': lambda x: 1-x.sum()},
-                                    {'type': 'eq', 'fun': lambda x: x[-1]}], 
-                        bounds=[(0,1)]*self.event.m, 
-                        tol=0.0001)
-        s = result.x.reshape((-1,))
+        prt = self.event.profit_ratio_tensor(s.reshape(self.event.varshape))
+        if np.any(prt <= -1):
+            return np.zeros(shape=(self.event.m,))
+        return self.event.weighted_profit(self.event.probabilities / (1 + prt)).reshape((-1,))
+
+    def hessian_log_utility(self, s: np.ndarray) -> np.ndarray:
+        """
+        Hessian of expected logarithmic utility with respect to the flattened bet size.
+        """
+
+        prt = s.reshape((-1,)) @ self.profit_matrix
+        if np.any(prt <= -1):
+            return np.zeros(shape=(self.event.m, self.event.m))
+        weights = self.event.probabilities.reshape((-1,)) / (1 + prt)**2
+        return -(self.profit_matrix * weights) @ self.profit_matrix.T
+
+    def _discard_small_bets(self, s: np.ndarray) -> np.ndarray:
         s *= s>0.01 # discard small bet sizes
 
         if self.expected_log_utility(s) <= 1e-6:
@@ -41,18 +223,42 @@ class UtilityOptimizer:
         
         return s.reshape(self.event.varshape)
 
+def broadcast_to_basis(prt: np.ndarray, bet_ids: list, basis: Dict, broadcast_shape: tuple) -> np.ndarray:
+    """
+    Broadcast and transpose a profit-to-ratio tensor with axes given by 'bet_ids' to the bet id basis (bet id -> axis).
+    """
+
+    diff_to_basis = [bid for bid in basis if bid not in set(bet_ids)]
+    if len(diff_to_basis) > 0:
+        prt = np.expand_dims(prt, tuple(range(-1, -1-len(diff_to_basis), -1)))
+    perm = {basis[bid]: ind for ind, bid in enumerate(list(bet_ids) + diff_to_basis)}
+    prt = prt.transpose([perm[k] for k in range(len(basis))])
+    return np.broadcast_to(prt, broadcast_shape)
+
+
 class CollectiveUtilityOptimizer:
-    def __init__(self, ongoing_events, event):
+    def __init__(self, ongoing_events, event, state=None):
+        """
+        'state' optionally provides the bet id basis, the probability tensor and the summed ongoing profit-to-ratio tensor
+        (see portfolio.Portfolio); otherwise they are built from 'ongoing_events'.
+        """
+
         self.ongoing_events = ongoing_events
         self.event = event
 
-        self.unique_bet_ids = {bet_id for e in ongoing_events+[event] for bet_id in e.bet_id}
-        self.basis = {bet_id: count for count, bet_id in enumerate(self.unique_bet_ids)} # values give the order of axes for prt
-        self.basis_n = {bet_id: e.n for me in ongoing_events+[event] for bet_id, e in zip(me.bet_id, me.get_events())}
-        self.broadcast_shape = tuple(map(lambda x: self.basis_n[x], self.basis))
-        self.basis_probabilities = {bet_id: e.probabilities for me in ongoing_events+[event] for bet_id, e in zip(me.bet_id, me.get_events())}
-        self.probabilities_list = list(map(lambda x: self.basis_probabilities[x], self.basis))
-        self.probabilities = self.create_probability_tensor()
+        if state is None:
+            self.unique_bet_ids = {bet_id for e in ongoing_events+[event] for bet_id in e.bet_id}
+            self.basis = {bet_id: count for count, bet_id in enumerate(self.unique_bet_ids)} # values give the order of axes for prt
+            self.basis_n = {bet_id: e.n for me in ongoing_events+[event] for bet_id, e in zip(me.bet_id, me.get_events())}
+            self.broadcast_shape = tuple(map(lambda x: self.basis_n[x], self.basis))
+            self.basis_probabilities = {bet_id: e.probabilities for me in ongoing_events+[event] for bet_id, e in zip(me.bet_id, me.get_events())}
+            self.probabilities_list = list(map(lambda x: self.basis_probabilities[x], self.basis))
+            self.probabilities = self.create_probability_tensor()
+        else:
+            self.basis = state.basis
+            self.unique_bet_ids = set(self.basis)
+            self.broadcast_shape = state.broadcast_shape
+            self.probabilities = state.probabilities
 
         # total budget - sizes of ongoing bets included
         self.total_budget = self.event.retrieval_budget + np.sum([e.retrieval_budget * e.s.sum() for e in self.ongoing_events])
@@ -64,8 +270,20 @@ class CollectiveUtilityOptimizer:
         self.event_transpose_order = tuple(perm[k] for k in range(len(self.basis)))
         self.event_expand_dims = tuple(range(-1, -1-len(self.event_diff_to_basis), -1))
 
-        self.ongoing_prt = np.sum([self.broadcast_ongoing_prt(e.calculated_prt, ind) for ind, e in enumerate(ongoing_events)], axis=0)
+        if state is None:
+            self.ongoing_prt = np.sum([self.broadcast_ongoing_prt(e.calculated_prt, ind) for ind, e in enumerate(ongoing_events)], axis=0)
+        else:
+            self.ongoing_prt = state.ongoing_prt
         self.expected_ongoing_log_utility = np.sum(self.probabilities * np.log(1+self.ongoing_prt))
+
+        self._profit_matrix = None
+        self.event_axes_order = tuple(np.argsort(self.event_transpose_order)) # inverse of event_transpose_order
+
+    @property
+    def profit_matrix(self) -> np.ndarray:
+        if self._profit_matrix is None:
+            self._profit_matrix = profit_matrix(self.event)
+        return self._profit_matrix
     
     def create_probability_tensor(self):
         """
@@ -82,12 +300,7 @@ class CollectiveUtilityOptimizer:
         Broadcast and tranpose the profit-to-ratio tensor of ongoing events to bet id basis.
         """
         
-        if len(self.ongoing_diff_to_basis[event_ind]) > 0:
-            prt = np.expand_dims(prt, tuple(range(-1, -1-len(self.ongoing_diff_to_basis[event_ind]), -1)))
-        perm = {self.basis[bid]: ind for ind, bid in enumerate(self.ongoing_events[event_ind].bet_id + list(self.ongoing_diff_to_basis[event_ind]))}
-        prt = prt.transpose([perm[k] for k in range(len(self.basis))])
-        prt = np.broadcast_to(prt, self.broadcast_shape)
-        return prt
+        return broadcast_to_basis(prt, self.ongoing_events[event_ind].bet_id, self.basis, self.broadcast_shape)
 
     def broadcast_event_prt(self, prt: np.ndarray) -> np.ndarray:
         """
@@ -110,18 +323,47 @@ class CollectiveUtilityOptimizer:
         else:
             return np.sum(self.probabilities * np.log(1 + total_prt))
 
+    def _event_marginal(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        Sum a tensor in the bet id basis over the axes that do not belong to the event, returning it with the event's outcome axes.
+        """
+
+        tensor = tensor.transpose(self.event_axes_order)
+        return tensor.sum(axis=tuple(range(len(self.event.bet_id), len(self.basis))))
+
+    def _total_prt(self, s: np.ndarray) -> np.ndarray:
+        prt = self.event.profit_ratio_tensor(s.reshape(self.event.varshape))
+        return self.broadcast_event_prt(prt) + self.ongoing_prt
+
+    def gradient_log_utility(self, s: np.ndarray) -> np.ndarray:
+        """
+        Gradient of expected logarithmic utility with respect to the flattened bet size.
+        """
+
+        total_prt = self._total_prt(s)
+        if np.any(total_prt <= -1):
+            return np.zeros(shape=(self.event.m,))
+        return self.event.weighted_profit(self._event_marginal(self.probabilities / (1 + total_prt))).reshape((-1,))
+
+    def hessian_log_utility(self, s: np.ndarray) -> np.ndarray:
+        """
+        Hessian of expected logarithmic utility with respect to the flattened bet size.
+        """
+
+        total_prt = self._total_prt(s)
+        if np.any(total_prt <= -1):
+            return np.zeros(shape=(self.event.m, self.event.m))
+        weights = self._event_marginal(self.probabilities / (1 + total_prt)**2).reshape((-1,))
+        return -(self.profit_matrix * weights) @ self.profit_matrix.T
+
     def kelly_bet_size(self) -> np.ndarray:
         """
         Return a bet size vector that optimizes logarithmic utility.
         """
 
-        result = minimize(lambda x: -self.expected_log_utility(x), 
-                        (1/(1+self.event.m))*np.random.random(self.event.m), 
-                        constraints=[{'type': 'ineq', 'fun': lambda x: 1-self.current_bet_size-x.sum()},
-                                    {'type': 'eq', 'fun': lambda x: x[-1]}], 
-                        bounds=[(0,1)]*self.event.m, 
-                        tol=0.0001)
-        s = result.x
+        budget = 1-self.current_bet_size
+        s0 = initial_bet_size(self.event, budget)
+        s = maximize_log_utility(self.expected_log_utility, self.gradient_log_utility, s0, budget, hessian=self.hessian_log_utility)
         s *= s>0.01 # discard small bet sizes
 
         if self.expected_log_utility(s) <= self.expected_ongoing_log_utility + 1e-6:
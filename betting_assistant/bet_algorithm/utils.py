@@ -1,3 +1,5 @@
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 from typing import List
 
@@ -46,4 +48,32 @@ def later_date_str(date1: str, date2: str) -> bool:
     Return True if date2 is later, False otherwise.
     """
 
-    return str2datetime(date1) < str2datetime(date2)
\ No newline at end of file
+    return str2datetime(date1) < str2datetime(date2)
+
+
+def dates2minutes(dates, day_first: bool = False) -> np.ndarray:
+    """
+    Return minutes since the epoch (int64) of dates given in "Y,M,D,H,m" string format ("D,M,Y,H,m" if 'day_first').
+    """
+
+    if len(dates) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    parts = pd.Series(dates, dtype=object).str.split(',', expand=True).astype(np.int64)
+    parts.columns = ["day", "month", "year", "hour", "minute"] if day_first else ["year", "month", "day", "hour", "minute"]
+
+    return pd.to_datetime(parts).to_numpy().astype('datetime64[m]').astype(np.int64)
+
+def minutes2dates(minutes: np.ndarray, fields: int = 5) -> np.ndarray:
+    """
+    Return dates in "Y,M,D,H,m" string format of minutes since the epoch, truncated to the first 'fields' fields (e.g. 3 for "Y,M,D").
+    """
+
+    dates = pd.DatetimeIndex(np.asarray(minutes, dtype=np.int64).astype('datetime64[m]'))
+    parts = [dates.year, dates.month, dates.day, dates.hour, dates.minute][:fields]
+
+    result = pd.Series(parts[0].astype(str))
+    for part in parts[1:]:
+        result = result + ',' + part.astype(str)
+
+    return result.to_numpy(dtype=object)
@@ -0,0 +1,112 @@
+import asyncio
+import aiohttp
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Dict, Hashable, Iterable, Tuple
+
+from . import http_cache
+
+# maximum number of concurrent requests per host
+HOST_CONNECTIONS = {"d.flashscore.pl": 3, "www.betexplorer.com": 6}
+DEFAULT_CONNECTIONS = 4
+
+TIMEOUT = 30 # seconds per request
+KEEPALIVE_TIMEOUT = 60 # seconds an idle connection is kept in the pool
+
+
+class Fetcher:
+    """
+    Asynchronous HTTP client for the scrapers.
+
+    All requests share one connection pool with keep-alive connections. The number of concurrent requests to a host
+    is capped by 'connections' (host -> cap, completed by HOST_CONNECTIONS and DEFAULT_CONNECTIONS).
+    'origins' reroutes requests, e.g. {"https://d.flashscore.pl": "http://127.0.0.1:8000"} sends flashscore requests to a local server;
+    caps still apply to the original hosts.
+
+    Usage:
+        async with Fetcher() as fetcher:
+            text = await fetcher.get(url, headers)
+    """
+
+    def __init__(self, connections: Dict[str, int] | None = None, timeout: float = TIMEOUT, origins: Dict[str, str] | None = None):
+        self.connections = {**HOST_CONNECTIONS, **(connections or {})}
+        self.timeout = timeout
+        self.origins = dict(origins or {})
+
+        self.session: aiohttp.ClientSession | None = None
+        self.semaphores: Dict[str, asyncio.Semaphore] = dict()
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=0, keepalive_timeout=KEEPALIVE_TIMEOUT) # connections are limited per host by the semaphores
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.connections.get(host, DEFAULT_CONNECTIONS))
+
+        return self.semaphores[host]
+
+    def route(self, url: str) -> str:
+        for origin, replacement in self.origins.items():
+            if url.startswith(origin):
+                return replacement + url[len(origin):]
+
+        return url
+
+    async def get(self, url: str, headers: Dict[str, str] | None = None) -> str:
+        """
+        Return the text response of a GET request, served according to http_cache.MODE.
+        """
+
+        async def fetch():
+            async with self.semaphore(urlsplit(url).hostname):
+                async with self.session.get(self.route(url), headers=headers) as response:
+                    return await response.text()
+
+        return await http_cache.get_async(url, fetch)
+
+    async def try_get(self, url: str, headers: Dict[str, str] | None = None) -> str | None:
+        """
+        'get()' returning None if the request fails or is not recorded in the replayed cache.
+        """
+
+        try:
+            return await self.get(url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, http_cache.CacheMiss):
+            return None
+
+    async def as_completed(self, requests: Iterable[Tuple[Hashable, str, Dict[str, str]]]) -> AsyncIterator[Tuple[Hashable, str | None]]:
+        """
+        Send all 'requests' (key, url, headers) and yield (key, text) in order of completion.
+
+        The text of a failed request is None.
+        """
+
+        async def keyed_get(key, url, headers):
+            return key, await self.try_get(url, headers)
+
+        tasks = [asyncio.ensure_future(keyed_get(key, url, headers)) for key, url, headers in requests]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # cancel the remaining requests if the consumer stops early
+            for task in tasks:
+                task.cancel()
+
+
+def run(scraper, *args, fetcher_options: Dict | None = None):
+    """
+    Run the coroutine function 'scraper'(*args, fetcher=fetcher) with a new Fetcher(**fetcher_options) and return its result.
+    """
+
+    async def main():
+        async with Fetcher(**(fetcher_options or {})) as fetcher:
+            return await scraper(*args, fetcher=fetcher)
+
+    return asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+On-disk cache of scraper responses, for replaying scrape cycles offline.
+
+Responses are stored compressed under the sha256 of their content ('objects/<digest>.gz'), so identical responses are stored once.
+The index maps a url and a time bucket (BUCKET seconds) to the digest of the response: 'index/<sha256 of url>/<bucket>'.
+
+MODE selects how requests are served:
+    'pass'   - every request goes to the site (the default),
+    'record' - responses of the current time bucket are served from the cache, other requests go to the site and are recorded,
+    'replay' - every request is served from the cache, with the latest recording at or before TIME (the latest recording if TIME is None);
+               CacheMiss is raised for requests never recorded.
+
+Usage:
+    http_cache.MODE = 'replay'
+    bets = scrape_matches(match_links)
+"""
+
+import os
+import gzip
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable
+
+MODE = 'pass' # 'pass', 'record' or 'replay'
+PATH = os.path.join(os.path.dirname(__file__), 'data', 'http_cache')
+BUCKET = 30 * 60 # seconds; the scraper runs every 30 minutes
+TIME: datetime | None = None # time of the responses served in 'replay' mode; None for the latest recording
+
+
+class CacheMiss(Exception):
+    """
+    Raised in 'replay' mode for a request with no recorded response.
+    """
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _bucket(time: datetime) -> int:
+    return int(time.timestamp()) // BUCKET
+
+def _index_dir(url: str) -> str:
+    return os.path.join(PATH, 'index', _digest(url.encode()))
+
+def _object_path(digest: str) -> str:
+    return os.path.join(PATH, 'objects', digest[:2], digest + '.gz')
+
+def _write_file(path: str, data: bytes) -> None:
+    # atomically create or replace 'path'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def lookup(url: str, time: datetime | None = None, latest: bool = False) -> str | None:
+    """
+    Return the recorded response of 'url' in the time bucket of 'time' (now by default), or None.
+
+    With 'latest', the latest recording at or before that bucket is returned (the latest recording if 'time' is None).
+    """
+
+    if latest:
+        try:
+            buckets = [int(name) for name in os.listdir(_index_dir(url)) if name.isdigit()]
+        except FileNotFoundError:
+            return None
+        if time is not None:
+            buckets = [bucket for bucket in buckets if bucket <= _bucket(time)]
+        if len(buckets) == 0:
+            return None
+        bucket = max(buckets)
+    else:
+        bucket = _bucket(datetime.now() if time is None else time)
+
+    try:
+        with open(os.path.join(_index_dir(url), str(bucket))) as f:
+            digest = f.read()
+        with open(_object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+    except FileNotFoundError:
+        return None
+
+def store(url: str, text: str, time: datetime | None = None) -> None:
+    """
+    Record 'text' as the response of 'url' in the time bucket of 'time' (now by default).
+    """
+
+    data = text.encode('utf-8')
+    digest = _digest(data)
+
+    if not os.path.exists(_object_path(digest)):
+        _write_file(_object_path(digest), gzip.compress(data))
+    _write_file(os.path.join(_index_dir(url), str(_bucket(datetime.now() if time is None else time))), digest.encode())
+
+
+def _cached(url: str) -> str | None:
+    # response served from the cache in the current MODE
+    if MODE == 'replay':
+        text = lookup(url, TIME, latest=True)
+        if text is None:
+            raise CacheMiss(url)
+        return text
+
+    return lookup(url)
+
+def get(url: str, fetch: Callable[[], str]) -> str:
+    """
+    Return the response of 'url' according to MODE, with fetch() requesting it from the site.
+    """
+
+    if MODE == 'pass':
+        return fetch()
+
+    text = _cached(url)
+    if text is None:
+        text = fetch()
+        store(url, text)
+
+    return text
+
+async def get_async(url: str, fetch: Callable[[], Awaitable[str]]) -> str:
+    """
+    'get()' with an asynchronous fetch().
+    """
+
+    if MODE == 'pass':
+        return await fetch()
+
+    text = _cached(url)
+    if text is None:
+        text = await fetch()
+        store(url, text)
+
+    return text
@@ -1,17 +1,22 @@
 from bs4 import BeautifulSoup
+import lxml.html
 import numpy as np
 import re
 import requests
 from datetime import datetime
 from .aliases import *
 import time
-import concurrent.futures
 import pandas as pd
 from copy import deepcopy
 from typing import List
 
+from . import fetch, http_cache
+from .fetch import Fetcher
+
 session = requests.Session()
 
+TREE_BUILDER = 'bs4' # parser of odds responses: 'bs4' (BeautifulSoup with lxml) or 'lxml' (lxml.html, faster)
+
 bookie_ids = [207, 1039, 11, 102, 147, 25, 148, 41, 43, 45, 241]
 bookmakers = ['10Bet','1xBet','bet365','bet-at-home','BetVictor','Pinnacle','William Hill','Betway','Unibet','Interwetten','Betsson']
 
@@ -37,18 +42,14 @@ def http_match_data(betexplorer_link):
 
     return betexplorer_link, match_data_soup
 
-def http_betexplorer_odds(betexplorer_link: str, bet_type: str) -> tuple:
+def betexplorer_odds_request(betexplorer_link: str, bet_type: str) -> tuple:
     """
-    Request odds from betexplorer.com
-    
-    Sends an http request to betexplorer.com to obtain polish 'bet_type' odds for a match on 'betexplorer_link'. 
-    Returns a tuple of three elements ("match_id", "bet_type", "odds_soup"), where "odds_soup" is the text response of the site.
+    Return the url and headers of the request for 'bet_type' odds of a match on 'betexplorer_link' from betexplorer.com.
     """
 
     match_id = betexplorer_link[-9:-1]
     url = 'https://www.betexplorer.com/match-odds/' + match_id + '/0/' + bet_type + '/'
-
-    text = session.get(url, headers = {
+    headers = {
             "authority": "www.betexplorer.com",
             "method": "GET",
             "path": "/match-odds/" + match_id + "/0/" + bet_type + "/",
@@ -61,123 +62,216 @@ def http_betexplorer_odds(betexplorer_link: str, bet_type: str) -> tuple:
             "sec-fetch-site": "same-origin",
             "user-agent": "Mozilla/5.0",
             "x-requested-with": "XMLHttpRequest",
-        }).text.replace("\\", "")
+        }
+
+    return url, headers
 
+def betexplorer_odds_response(match_id: str, bet_type: str, text: str) -> tuple:
+    """
+    Return the tuple ("match_id", "bet_type", "odds_soup") of the text response of a betexplorer.com odds request.
+
+    The text is parsed by the TREE_BUILDER; with "lxml", "odds_soup" is an lxml.html tree (None for an empty response).
+    """
 
-    odds_soup = BeautifulSoup(text, 'lxml')
+    text = text.replace("\\", "")
+
+    if TREE_BUILDER == 'lxml':
+        odds_soup = lxml.html.document_fromstring(text) if text.strip() else None
+    else:
+        odds_soup = BeautifulSoup(text, 'lxml')
 
     return match_id, bet_type, odds_soup
+
+def http_betexplorer_odds(betexplorer_link: str, bet_type: str) -> tuple:
+    """
+    Request odds from betexplorer.com
     
+    Sends an http request to betexplorer.com to obtain polish 'bet_type' odds for a match on 'betexplorer_link'. 
+    Returns a tuple of three elements ("match_id", "bet_type", "odds_soup"), where "odds_soup" is the text response of the site.
+    """
 
+    url, headers = betexplorer_odds_request(betexplorer_link, bet_type)
 
-def get_betexplorer_odds(http_response: str, bt_values: List[int]) -> dict: # bet type values
+    text = http_cache.get(url, lambda: session.get(url, headers=headers).text)
+
+    return betexplorer_odds_response(betexplorer_link[-9:-1], bet_type, text)
+    
+
+
+def _exact_class(element_class) -> str:
+    # class attribute as matched by a [class="..."] selector: a list (BeautifulSoup) or a string (lxml)
+    if element_class is None:
+        return None
+    return ' '.join(element_class if isinstance(element_class, list) else element_class.split())
+
+def _odds_table_soup(soup: BeautifulSoup) -> tuple:
     """
-    Processes scraped http response from betexplorer to provide a list of dictionaries of odds for a given match, bet type and bet type values (bet type arguments)
+    Return the number of outcomes and the rows {data-bid: [(bet type value text or None, listed odds)]} of an odds table parsed by BeautifulSoup.
+
+    Rows are visited once, in document order. A row belongs to a bookmaker if one of its cells holds a link with the bookmaker's data-bid.
     """
 
-    match_id, bet_type, soup = http_response
-    d = datetime.now()
-    retrieval_date = '{d.day},{d.month},{d.year},{d.hour}'.format(d = d) + d.strftime(",%M")
-    no_val = np.any(pd.isnull(bt_values))
-    bt_values = [str(val) for val in bt_values]
+    n_outcomes = None
+    rows = dict()
 
+    for tr in soup.find_all('tr'):
+        children = tr.find_all(recursive=False)
 
+        if n_outcomes is None and any(c.name == 'th' and _exact_class(c.get('class')) == 'table-main__detail-odds' for c in children):
+            n_outcomes = len([th for th in tr.find_all('th') if _exact_class(th.get('class')) == 'table-main__detail-odds'])
 
-    div = soup.select_one('tr:has(> th[class="table-main__detail-odds"])')
-    if div is not None:
-        n_outcomes = len(div.select('th[class="table-main__detail-odds"]'))
-    else:
-        n_outcomes = 0 # we won't be able to fetch odds
+        bids = [a['data-bid'] for td in children if td.name == 'td' for a in td.find_all('a', recursive=False) if a.has_attr('data-bid')]
+        if len(bids) == 0:
+            continue
 
-    
+        value = next((td.text for td in tr.find_all('td') if _exact_class(td.get('class')) == 'table-main__doubleparameter'), None)
+        odds = [td['data-odd'] for td in tr.find_all('td') if td.has_attr('data-odd') and 'inactive' not in td.get('class', [])]
+        for bid in dict.fromkeys(bids):
+            rows.setdefault(bid, []).append((value, odds))
 
-    bets = {val: {"ID": match_id, "Retrieval date": retrieval_date} for val in bt_values}
+    return (0 if n_outcomes is None else n_outcomes), rows
 
+def _odds_table_lxml(root) -> tuple:
+    """
+    '_odds_table_soup()' for a tree parsed by lxml.html.
+    """
 
-    if no_val:
-        for bookie_id in bookie_ids:
-            a = soup.select_one("tr:has(> td:has(> a[data-bid='" + str(bookie_id) + "']))")
+    n_outcomes = None
+    rows = dict()
 
-            if a is None:
-                continue
-            
-            b = a.select('td[data-odd]:not(.inactive)')
+    if root is None:
+        return 0, rows
 
-            if b is None or len(b) != n_outcomes:
-                continue
+    for tr in root.iter('tr'):
+        if n_outcomes is None and any(c.tag == 'th' and _exact_class(c.get('class')) == 'table-main__detail-odds' for c in tr):
+            n_outcomes = len([th for th in tr.iter('th') if _exact_class(th.get('class')) == 'table-main__detail-odds'])
 
-            bets[str(np.nan)][str(bookie_id)] = str([float(elem_odds['data-odd']) for elem_odds in b])
+        bids = [a.get('data-bid') for td in tr if td.tag == 'td' for a in td if a.tag == 'a' and a.get('data-bid') is not None]
+        if len(bids) == 0:
+            continue
 
-    else:
-        for bookie_id in bookie_ids:
-            a = soup.select("tr:has(> td:has(> a[data-bid='" + str(bookie_id) + "']))")
+        value = next((td.text_content() for td in tr.iter('td') if _exact_class(td.get('class')) == 'table-main__doubleparameter'), None)
+        odds = [td.get('data-odd') for td in tr.iter('td') if td.get('data-odd') is not None and 'inactive' not in td.get('class', '').split()]
+        for bid in dict.fromkeys(bids):
+            rows.setdefault(bid, []).append((value, odds))
 
-            if a is None or a == []:
-                continue
-            
-            for tr in a:
-                val = tr.select_one('td[class="table-main__doubleparameter"]')
-                if val is None:
+    return (0 if n_outcomes is None else n_outcomes), rows
+
+def get_betexplorer_odds(http_response: tuple, bt_values: List[int]) -> dict: # bet type values
+    """
+    Processes scraped http response from betexplorer to provide a list of dictionaries of odds for a given match, bet type and bet type values (bet type arguments)
+
+    The odds table is walked once (see '_odds_table_soup()'). Without bet type values, the first row of every bookmaker is taken;
+    otherwise every row with a requested bet type value, later rows replacing earlier ones. Rows with inactive odds are skipped.
+    """
+
+    match_id, bet_type, tree = http_response
+    d = datetime.now()
+    retrieval_date = '{d.day},{d.month},{d.year},{d.hour}'.format(d = d) + d.strftime(",%M")
+    no_val = np.any(pd.isnull(bt_values))
+    bt_values = [str(val) for val in bt_values]
+
+    n_outcomes, rows = _odds_table_soup(tree) if isinstance(tree, BeautifulSoup) else _odds_table_lxml(tree)
+
+    bets = {val: {"ID": match_id, "Retrieval date": retrieval_date} for val in bt_values}
+
+    for bookie_id in bookie_ids:
+        bookie_rows = rows.get(str(bookie_id), [])
+
+        for value, odds in (bookie_rows[:1] if no_val else bookie_rows):
+            if no_val:
+                val = str(np.nan)
+            else:
+                if value is None:
                     continue
-                val = val.text
 
                 try:
-                    val = str(float(val))
-                except:
+                    val = str(float(value))
+                except ValueError:
                     continue
 
                 if val not in bt_values:
                     continue
-                
-                b = tr.select('td[data-odd]:not(.inactive)')
-
-                if b is None or len(b) != n_outcomes:
-                    continue
 
-                bets[str(val)][str(bookie_id)] = str([float(elem_odds['data-odd']) for elem_odds in b])
+            if len(odds) != n_outcomes:
+                continue
 
+            bets[val][str(bookie_id)] = str([float(odd) for odd in odds])
 
     return bets
 
 
 
     
-def scraper_betexplorer(match_ids: list, betexplorer_links: dict, flashscore_odds: dict, match_bet_types: dict, sports: list) -> list:
+def add_betexplorer_odds(http_response: tuple, bt: int, flashscore_odds: dict, all_bets: list) -> None:
     """
-    Appends flashscore-scraped polish odds by odds from betexplorer for matches in 'match_ids' playing 'sport'
+    Update flashscore bets of the match and bet type 'bt' of 'http_response' with the betexplorer odds, 
+    and append the bets with pinnacle odds to 'all_bets'.
+    """
+
+    match_id = http_response[0]
+    bt_values = [bet['Bet type value'] for bet in flashscore_odds[match_id] if bet['Bet type'] == bt]
+
+    bets = get_betexplorer_odds(http_response, bt_values)
+
+    for bet in flashscore_odds[match_id]:
+        if bt != bet['Bet type'] or str(bet['Bet type value']) not in bets.keys():
+            continue
+
+        bet.update(bets[str(bet['Bet type value'])])
 
-    Returns a list of bets.
+        if '25' in bet.keys() and not np.any(pd.isnull(bet['25'])): # make sure there are pinnacle odds for this bet
+            all_bets.append(bet)
+
+def sort_bets(bets: list, match_ids: list, flashscore_odds: dict) -> list:
+    """
+    Return 'bets' (flashscore bets of matches in 'match_ids') in the order of matches in 'match_ids' and of bets in 'flashscore_odds'.
     """
-    CONNECTIONS = 6
 
-    all_bets = []
+    position = {id(bet): i for i, bet in enumerate(bet for match_id in match_ids for bet in flashscore_odds[match_id])}
 
-    # add all matches and their corresponding bet types to the executor
-    with concurrent.futures.ThreadPoolExecutor(CONNECTIONS) as executor:
-        future_match_id = {executor.submit(http_betexplorer_odds, betexplorer_links[match_id], betexplorer_aliases[bt]): {'match_id': match_id, 'bt': bt} for sport in sports for match_id in match_ids[sport] for bt in match_bet_types[match_id]}
+    return sorted(bets, key=lambda bet: position[id(bet)])
 
+async def scraper_betexplorer_match_async(betexplorer_link: str, flashscore_odds: dict, bet_types: list, fetcher: Fetcher) -> list:
+    """
+    'scraper_betexplorer_async()' for a single match on 'betexplorer_link' and its flashscore 'bet_types'.
+    """
 
-    for future in concurrent.futures.as_completed(future_match_id):
-        match_id = future_match_id[future]['match_id']
-        bt = future_match_id[future]['bt'] # bet type
-        try:
-            http_response = future.result()
-        except:
+    match_id = betexplorer_link[-9:-1]
+    all_bets = []
+
+    async for bt, text in fetcher.as_completed((bt, *betexplorer_odds_request(betexplorer_link, betexplorer_aliases[bt])) for bt in bet_types):
+        if text is None:
             continue
-        finally:
-            bt_values = [bet['Bet type value'] for bet in flashscore_odds[match_id] if bet['Bet type'] == bt]
 
-            bets = get_betexplorer_odds(http_response, bt_values)
+        add_betexplorer_odds(betexplorer_odds_response(match_id, betexplorer_aliases[bt], text), bt, flashscore_odds, all_bets)
 
-            for bet in flashscore_odds[match_id]:
-                if bt != bet['Bet type'] or str(bet['Bet type value']) not in bets.keys():
-                    continue
+    return sort_bets(all_bets, [match_id], flashscore_odds)
+
+async def scraper_betexplorer_async(match_ids: list, betexplorer_links: dict, flashscore_odds: dict, match_bet_types: dict, sports: list, fetcher: Fetcher) -> list:
+    """
+    Asynchronous 'scraper_betexplorer()' with requests sent through 'fetcher'.
 
-                bet.update(bets[str(bet['Bet type value'])])
+    Every response is processed as soon as it arrives; failed requests are skipped.
+    Bets are returned in the order of matches and of their flashscore bets (see 'sort_bets()').
+    """
+
+    all_bets = []
 
-                if '25' in bet.keys() and not np.any(pd.isnull(bet['25'])): # make sure there are pinnacle odds for this bet
-                    all_bets.append(bet)
+    requests = ((match_id, bt, *betexplorer_odds_request(betexplorer_links[match_id], betexplorer_aliases[bt])) for sport in sports for match_id in match_ids[sport] for bt in match_bet_types[match_id])
+    async for (match_id, bt), text in fetcher.as_completed(((match_id, bt), url, headers) for match_id, bt, url, headers in requests):
+        if text is None:
+            continue
 
+        add_betexplorer_odds(betexplorer_odds_response(match_id, betexplorer_aliases[bt], text), bt, flashscore_odds, all_bets)
 
-    
-    return all_bets
+    return sort_bets(all_bets, [match_id for sport in sports for match_id in match_ids[sport]], flashscore_odds)
+
+def scraper_betexplorer(match_ids: list, betexplorer_links: dict, flashscore_odds: dict, match_bet_types: dict, sports: list, fetcher_options: dict | None = None) -> list:
+    """
+    Appends flashscore-scraped polish odds by odds from betexplorer for matches in 'match_ids' playing 'sport'
+
+    Requests are sent through a Fetcher with 'fetcher_options'. Returns a list of bets.
+    """
+
+    return fetch.run(scraper_betexplorer_async, match_ids, betexplorer_links, flashscore_odds, match_bet_types, sports, fetcher_options=fetcher_options)
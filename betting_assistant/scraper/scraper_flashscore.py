@@ -1,159 +1,104 @@
 import pandas as pd
 import numpy as np
-import re
 import requests
-import concurrent.futures
 from typing import List, Dict
 
 from .aliases import *
+from . import fetch, http_cache
+from .fetch import Fetcher
 
 session = requests.Session()
 
 
-def get_flashscore_odds(http_response: str) -> dict:
+def _record_fields(record: str) -> dict:
+    # fields of a record with fields without '÷'
+    fields = dict()
+    name = '' # a field without '÷' is the beginning of the name of the next field
+    for field in record.split('¬')[:-1]:
+        key, separator, value = (name + field).partition('÷')
+        if separator:
+            fields[key] = value
+            name = ''
+        else:
+            name += field + '¬'
+
+    return fields
+
+
+def tokenize_flashscore_feed(text: str):
+    """
+    Yield the records of a flashscore feed as dictionaries {field name: value}, in one pass over 'text'.
+
+    Records end with '~' and fields with '¬'; field names are separated from values by '÷'.
+    """
+
+    for record in text.split('~')[:-1]:
+        if '\n' in record: # records do not span lines
+            record = record.rpartition('\n')[2]
+
+        try:
+            yield dict(field.split('÷', 1) for field in record.split('¬')[:-1])
+        except ValueError:
+            yield _record_fields(record)
+
+
+def _last_number(value: str) -> float:
+    # odds values may be preceded by previous values, e.g. '2.10[d]1.95'
+    return float(value[len(value.rstrip('.0123456789')):])
+
+
+def get_flashscore_odds(http_response: str) -> list:
     """
     Processes scraped http response to provide odds in a list of dictionaries.
+
+    The feed is a sequence of bet type (OA), scope (OB) and bet type value (OC) records, each followed by bookmaker odds records (OE).
+    Every group of active odds records (OG equal to 1) under the same bet type, scope and value gives one bet, in order of the feed.
     """
 
-    match_id = http_response['match_id']
     text = http_response['text']
-    sport = http_response['sport']
-
-    matches = list(re.finditer(r"(.*?)~", text))
-
-    class Node:
-        def __init__(self, level, parent, label, value):
-            self.children = []
-            self.level = level
-            self.parent = parent
-            self.label = label
-            self.value = value
-
-    class Tree:
-        def __init__(self):
-            self.root = Node(-1, None, None, None)
-
-        def addNode(self, level, label, value):
-            c = self.root
-            while len(c.children) > 0 and (c.children[0].level != level):
-                c = c.children[-1]
-            c.children.append(Node(level, c, label, value))
-        
-        @staticmethod
-        def printableTree(root):
-            if len(root.children) == 0:
-                return []
-
-            if root.children[0].level == 3: # compile odds
-                return [[elem1 for elem1 in [root.label, root.value] if elem1 is not None] + elem for elem in [[{k.label: str(k.value) for k in root.children}]]]
-
-            else:
-                r = []
-
-                for c in root.children:
-                    r += [[elem1 for elem1 in [root.label, root.value] if elem1 is not None] + elem for elem in Tree.printableTree(c)]
-
-                return r
-
-        def printTree(self):
-            for elem in Tree.printableTree(self.root):
-                odds = elem.pop(-1)
-                bet_data = {"Bet type": elem}
-                bet_data.update(odds)
-                print(bet_data)
-        
-        # clean branches with no odds
-        @staticmethod
-        def staticCleanTree(node):
-            # check if leaf
-            if len(node.children) == 0:
-                if node.level != 3:
-                    # prune single branch
-                    while node.parent is not None and len(node.parent.children) == 1:
-                        node = node.parent
-
-                    if node.parent is not None:
-                        p = node.parent
-                        p.children.remove(node)
-                    else:
-                        node.children = []
-            
-            else:
-                for c in node.children:
-                    Tree.staticCleanTree(c)
-        
-        def cleanTree(self):
-            Tree.staticCleanTree(self.root)
-            
-        def matchBets(self):
-            match_bets = []
-
-            for elem in Tree.printableTree(self.root):
-                odds = elem.pop(-1)
-                bet_data = {"Bet type": elem}
-                bet_data.update(odds)
-                match_bets.append(bet_data)
-            
-            return match_bets
-
-        
-
-    tree = Tree()
-
-    for match in matches:
-        d = {elem.group(1): elem.group(2) for elem in re.finditer(r"(.*?)÷(.*?)¬", match.group(1))}
-        if 'OA' in d.keys():
-            tree.addNode(0, d['OAI'], None)
-        elif 'OB' in d.keys():
-            tree.addNode(1, d['OBI'], None)
-        elif 'OC' in d.keys():
-            tree.addNode(2, None, d['OC'])
-        elif 'OE' in d.keys() and d['OG']=='1':
-            tree.addNode(3, d['OE'], [float(re.search(r"[.0-9]*$", val).group(0)) for key, val in d.items() if key[0] == 'X'])
-
-    tree.cleanTree()
-
-    # tree.printTree()
+    aliases = flashscore_aliases[http_response['sport']]
+
+    scope = [] # labels of the current bet type, scope and bet type value
+    groups = [] # [bet type id, bet type value, odds] of every group of odds records
+    odds = None # odds of the current group
+
+    for fields in tokenize_flashscore_feed(text):
+        if 'OA' in fields:
+            scope, odds = [fields['OAI']], None
+        elif 'OB' in fields:
+            scope, odds = scope[:1] + [fields['OBI']], None
+        elif 'OC' in fields:
+            scope, odds = scope[:2] + [fields['OC']], None
+        elif 'OE' in fields and fields['OG'] == '1':
+            if odds is None:
+                odds = dict()
+                if str(scope) in aliases:
+                    groups.append([aliases[str(scope)], np.nan, odds])
+                elif str(scope[:-1]) in aliases:
+                    groups.append([aliases[str(scope[:-1])], float(scope[-1]), odds])
+                else:
+                    odds = False # unknown bet type, odds are skipped
+
+            if odds is not False:
+                odds[fields['OE']] = str([_last_number(value) for key, value in fields.items() if key[:1] == 'X'])
 
     match_bets = []
+    for bt_id, bt_value, odds in groups:
+        bet = {"Bet type": bt_id}
+        bet.update(odds)
+        bet['Bet type value'] = bt_value
+        match_bets.append(bet)
 
-    for bet in tree.matchBets():
-        bt_id = None
-
-        if str(bet['Bet type']) in flashscore_aliases[sport].keys():
-            bt_id = flashscore_aliases[sport][str(bet['Bet type'])]
-            bet['Bet type value'] = np.nan
-            bet['Bet type'] = bt_id
-
-            found_duplicate = False
-            for i, b in enumerate(match_bets):
-                if b['Bet type'] == bet['Bet type'] and b['Bet type value'] == bet['Bet type value']:
-                    found_duplicate = True
-                    if len(bet.keys()) > len(b.keys()):
-                        match_bets[i] = bet
-                        break
-            if not found_duplicate:
-                match_bets.append(bet)
-
-        elif str(bet['Bet type'][:-1]) in flashscore_aliases[sport].keys():
-            bt_id = flashscore_aliases[sport][str(bet['Bet type'][:-1])]
-            bet['Bet type value'] = float(bet['Bet type'][-1])
-            bet['Bet type'] = bt_id
-            match_bets.append(bet)
-    
     return match_bets
 
 
-def http_flashscore_odds(match_id: str, sport: str) -> dict:
+def flashscore_odds_request(match_id: str) -> tuple:
     """
-    Request polish odds from flashscore.pl.
-    
-    Sends an http request to flashscore.pl to obtain polish odds for a match with 'match_id', playing 'sport'. 
-    Returns a dictionary of three keys {"match_id", "text", "sport"}, where "text" is the text response of the site.
+    Return the url and headers of the request for polish odds of a match with 'match_id' from flashscore.pl.
     """
 
     url = "https://d.flashscore.pl/x/feed/df_od_1_" + match_id
-    text = session.get(url, headers = {
+    headers = {
                 "authority": "d.flashscore.pl",
                 "method": "GET",
                 "path": "/x/feed/df_od_1_" + match_id,
@@ -169,38 +114,58 @@ def http_flashscore_odds(match_id: str, sport: str) -> dict:
                 "sec-gpc": "1",
                 "user-agent": "Mozilla/5.0",
                 "x-fsign": "SW9D1eZo"
-                }).text
+                }
+
+    return url, headers
+
+
+def http_flashscore_odds(match_id: str, sport: str) -> dict:
+    """
+    Request polish odds from flashscore.pl.
+    
+    Sends an http request to flashscore.pl to obtain polish odds for a match with 'match_id', playing 'sport'. 
+    Returns a dictionary of three keys {"match_id", "text", "sport"}, where "text" is the text response of the site.
+    """
+
+    url, headers = flashscore_odds_request(match_id)
+    text = http_cache.get(url, lambda: session.get(url, headers=headers).text)
 
     return {'match_id': match_id, 'text': text, 'sport': sport}
 
 
+async def scraper_flashscore_async(match_ids: List[str], sport: str, fetcher: Fetcher) -> dict:
+    """
+    Asynchronous 'scraper_flashscore()' with requests sent through 'fetcher'.
 
-def scraper_flashscore(match_ids: List[str], sport: str) -> dict:
+    Every response is processed as soon as it arrives.
     """
-    Scrapes and compiles odds for every match in 'match_ids' playing 'sport'
 
-    Uses 'http_flashscore_odds()' to get polish odds for every match in 'match_ids' playing 'sport'. 
-    Then uses 'get_flashscore_odds()' to organize the odds into a dictionary {'match_id': 'odds'}, 
-    where 'odds' is the dictionary returned by 'get_flashscore_odds()' for 'match_id'. 
+    flashscore_odds = dict()
+
+    async for match_id, text in fetcher.as_completed((match_id, *flashscore_odds_request(match_id)) for match_id in match_ids):
+        flashscore_odds[match_id] = get_flashscore_odds({'match_id': match_id, 'text': "" if text is None else text, 'sport': sport})
+
+    return {match_id: flashscore_odds[match_id] for match_id in match_ids}
+
+
+async def scraper_flashscore_match_async(match_id: str, sport: str, fetcher: Fetcher) -> list:
+    """
+    Request and process polish odds of a single match through 'fetcher' (see 'get_flashscore_odds()').
     """
 
-    CONNECTIONS = 3
+    text = await fetcher.try_get(*flashscore_odds_request(match_id))
 
-    flashscore_odds = dict()
+    return get_flashscore_odds({'match_id': match_id, 'text': "" if text is None else text, 'sport': sport})
 
-    with concurrent.futures.ThreadPoolExecutor(CONNECTIONS) as executor:
-        future_match_id = {executor.submit(http_flashscore_odds, match_id, sport): match_id for match_id in match_ids}
 
-    for future in future_match_id:
-        match_id = future_match_id[future]
+def scraper_flashscore(match_ids: List[str], sport: str, fetcher_options: dict | None = None) -> dict:
+    """
+    Scrapes and compiles odds for every match in 'match_ids' playing 'sport'
 
-        try:
-            http_response = future.result()
-        except Exception as exc:
-            http_response = {'match_id': match_id, 'text': "", 'sport': sport}
-        finally:
-            flashscore_odds[match_id] = get_flashscore_odds(http_response)
-            # print(match_id, "DONE")
-    
+    Requests polish odds for every match in 'match_ids' playing 'sport' (see 'flashscore_odds_request()') through a Fetcher with 'fetcher_options'. 
+    Then uses 'get_flashscore_odds()' to organize the odds into a dictionary {'match_id': 'odds'}, 
+    where 'odds' is the dictionary returned by 'get_flashscore_odds()' for 'match_id'. 
+    Matches whose request failed get the odds of an empty response.
+    """
 
-    return flashscore_odds
+    return fetch.run(scraper_flashscore_async, match_ids, sport, fetcher_options=fetcher_options)
@@ -3,11 +3,17 @@ import pandas as pd
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import time
+import asyncio
 import requests
 import pickle
 import re
-from .scraper_flashscore import scraper_flashscore
-from .scraper_betexplorer import scraper_betexplorer
+from functools import partial
+from .scraper_flashscore import scraper_flashscore, scraper_flashscore_async, scraper_flashscore_match_async
+from .scraper_betexplorer import scraper_betexplorer, scraper_betexplorer_async, scraper_betexplorer_match_async
+from . import fetch
+from . import segment_log
+from . import http_cache
+from .fetch import Fetcher
 from .aliases import *
 from .utils import *
 
@@ -30,7 +36,7 @@ def get_match_data(d):
 
     for sport, start_links_ in start_links.items():
         for i, start_link in enumerate(start_links_):
-            h = requests.get(start_link, headers = {
+            headers = {
             "authority": "www.betexplorer.com",
             "method": "GET",
             "path": start_link[start_link.find("/next"):],
@@ -43,7 +49,8 @@ def get_match_data(d):
             "sec-fetch-mode": "cors",
             "sec-fetch-site": "same-origin",
             "user-agent": "Mozilla/5.0",
-            }).text
+            }
+            h = http_cache.get(start_link, lambda: requests.get(start_link, headers=headers).text)
 
             soup = BeautifulSoup(h, 'lxml')
 
@@ -91,7 +98,7 @@ def get_results(datestr):
 
     for sport, start_links_ in start_links.items():
         for start_link in start_links_:
-            h = requests.get(start_link, headers = {
+            headers = {
             "authority": "www.betexplorer.com",
             "method": "GET",
             "path": start_link[start_link.find("/next"):],
@@ -104,7 +111,8 @@ def get_results(datestr):
             "sec-fetch-mode": "cors",
             "sec-fetch-site": "same-origin",
             "user-agent": "Mozilla/5.0",
-            }).text
+            }
+            h = http_cache.get(start_link, lambda: requests.get(start_link, headers=headers).text)
 
             soup = BeautifulSoup(h, 'lxml')
 
@@ -160,7 +168,7 @@ def load_match_links(max = 200):
 
     # try to load match data dataframe for today
     try:
-        df = pd.read_csv(package_path + '/data/match_data/' + d + '.csv')
+        df = segment_log.read_day(package_path + '/data/match_data/', d)
         df = df[['Link', 'Date', 'Sport']]
     # if there isn't one in our database, fetch it from the site
     except:
@@ -181,7 +189,7 @@ def load_match_links(max = 200):
     
     # try to load match data dataframe for tomorrow
     try:
-        df2 = pd.read_csv(package_path + '/data/match_data/' + d2 + '.csv')
+        df2 = segment_log.read_day(package_path + '/data/match_data/', d2)
         df2 = df2[['Link', 'Date', 'Sport']]
 
         # append
@@ -234,11 +242,14 @@ def load_match_links(max = 200):
 
     return match_links
 
-def scrape_matches(match_links: dict) -> list:
+async def scrape_matches_async(match_links: dict, fetcher: Fetcher, pipelined: bool = True) -> list:
     """
-    Scrapes matches in 'match_links'
+    Asynchronous 'scrape_matches()' with requests sent through 'fetcher'.
     """
 
+    if pipelined:
+        return await scrape_matches_pipelined(match_links, fetcher)
+
     # create match_ids and betexplorer_links dictionaries:
     # match_ids = {sport: list of match ids}
     # betexplorer_links = {match id: betexplorer link}
@@ -253,7 +264,7 @@ def scrape_matches(match_links: dict) -> list:
     # craate a dictionary of flashscore odds
     flashscore_odds = dict()
     for sport in sports:
-        flashscore_odds.update(scraper_flashscore(match_ids[sport], sport))
+        flashscore_odds.update(await scraper_flashscore_async(match_ids[sport], sport, fetcher=fetcher))
     print("DONE FLASHSCORE")
 
     match_bet_types = dict() # bet types scraped from flashscore for each match 
@@ -262,37 +273,57 @@ def scrape_matches(match_links: dict) -> list:
             match_bet_types[match_id] = list(set([elem['Bet type'] for elem in flashscore_odds[match_id]]))
 
     # append the dictionary of flashscore odds by the odds scraped from betexplorer
-    all_bets = scraper_betexplorer(match_ids, betexplorer_links, flashscore_odds, match_bet_types, sports)
+    all_bets = await scraper_betexplorer_async(match_ids, betexplorer_links, flashscore_odds, match_bet_types, sports, fetcher=fetcher)
     print("DONE BETEXPLORER")
     
     return all_bets
 
+async def scrape_matches_pipelined(match_links: dict, fetcher: Fetcher) -> list:
+    """
+    Pipelined 'scrape_matches_async()': the betexplorer requests of a match are sent as soon as its flashscore odds are processed,
+    instead of after the flashscore odds of all matches.
+    """
+
+    async def scrape_match(link: str, sport: str) -> list:
+        match_id = link[-9:-1]
+        flashscore_odds = {match_id: await scraper_flashscore_match_async(match_id, sport, fetcher=fetcher)}
+        bet_types = list(set([elem['Bet type'] for elem in flashscore_odds[match_id]]))
+
+        return await scraper_betexplorer_match_async(link, flashscore_odds, bet_types, fetcher=fetcher)
+
+    # bets of every match, in the order of matches
+    match_bets = await asyncio.gather(*[scrape_match(link, sport) for sport in sports for link in match_links[sport]])
+    print("DONE FLASHSCORE AND BETEXPLORER")
+
+    return [bet for bets in match_bets for bet in bets]
+
+def scrape_matches(match_links: dict, fetcher_options: dict | None = None, pipelined: bool = True) -> list:
+    """
+    Scrapes matches in 'match_links'
+
+    Requests to both sites are sent through one Fetcher with 'fetcher_options' (see fetch.Fetcher).
+    Unless 'pipelined' is False, matches go through betexplorer as soon as they are done on flashscore (see 'scrape_matches_pipelined()');
+    otherwise all matches are scraped on flashscore first. Both give the same bets in the same order.
+    """
+
+    return fetch.run(partial(scrape_matches_async, pipelined=pipelined), match_links, fetcher_options=fetcher_options)
+
 def save_data(data, save_path = package_path + '/data/', date = None) -> None:
     """
-    Saves 'data' to 'save_path' in a csv file named 'Y_M_D.csv'
+    Saves 'data' to 'save_path' as a new segment of the day 'Y_M_D' (see segment_log)
 
+    Segments are compacted into the csv file 'Y_M_D.csv' once there are more than segment_log.MAX_SEGMENTS of them.
     For the function to work properly, 'data' must be convertible to a pandas DataFrame.
     """
 
     if date is None: # if no date is given
         date = datetime.now()
 
-    def load_csv():
-        try:
-            return pd.read_csv(save_path+date2str(date)+'.csv')
-        except:
-            return pd.DataFrame()
-    
-    def save_csv(df):
-        # avoid any errors when df is empty
-        if not df.empty:
-            df.to_csv(save_path+date2str(date)+'.csv', index=False)
-
-    # append odds to the existing file / create new file
-    df = load_csv()
-    app_df = pd.DataFrame(data) # dataframe to be appended
-    df = pd.concat([df, app_df])
-    save_csv(df)
+    day = date2str(date)
+    segment_log.append(save_path, day, pd.DataFrame(data))
+
+    if len(segment_log.segments(save_path, day)) > segment_log.MAX_SEGMENTS:
+        segment_log.compact(save_path, day)
 
 def fill_pending_results():
     date = datetime.now()
@@ -0,0 +1,146 @@
+"""
+Append-only storage of scraped data per day.
+
+A batch of rows is written as a new segment file '<day>.log/<n>.csv' next to the day's csv file '<day>.csv',
+so that saving costs only the size of the batch. compact() merges the segments into the day's csv file, replacing it atomically.
+read_day() reads the day's csv file together with segments not yet compacted.
+
+A compaction interrupted by a crash is detected from its journal file and finished by recover():
+before the journal is written, the day's csv file is unchanged; after it, the csv file is replaced unless its temporary file still exists.
+"""
+
+import os
+import pandas as pd
+from typing import List, Tuple
+
+MAX_SEGMENTS = 16 # number of segments of a day after which they are compacted by the scraper
+
+
+def day_file(path: str, day: str) -> str:
+    return os.path.join(path, day + '.csv')
+
+def log_dir(path: str, day: str) -> str:
+    return os.path.join(path, day + '.log')
+
+def _journal(path: str, day: str) -> str:
+    return os.path.join(log_dir(path, day), 'compaction')
+
+def segments(path: str, day: str) -> List[Tuple[int, str]]:
+    """
+    Return (sequence number, file path) of the segments of the day, in order of writing.
+    """
+
+    try:
+        names = os.listdir(log_dir(path, day))
+    except FileNotFoundError:
+        return []
+
+    return sorted((int(name[:-4]), os.path.join(log_dir(path, day), name)) for name in names if name.endswith('.csv') and name[:-4].isdigit())
+
+def days(path: str) -> List[str]:
+    """
+    Return days with a csv file or segments in 'path'.
+    """
+
+    return sorted({name[:-4] for name in os.listdir(path) if name.endswith('.csv') or name.endswith('.log')})
+
+
+def _write_file(path: str, write) -> None:
+    # write(file) to a file flushed to disk
+    with open(path, 'w', newline='') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _replace_file(path: str, write) -> None:
+    # atomically replace 'path' with a file written by write(file)
+    _write_file(path + '.tmp', write)
+    os.replace(path + '.tmp', path)
+
+def _compacted_segment(path: str, day: str) -> int:
+    # sequence number of the last segment already in the day's csv file, after an interrupted compaction
+    try:
+        with open(_journal(path, day)) as f:
+            last = int(f.read())
+    except FileNotFoundError:
+        return 0
+
+    return 0 if os.path.exists(day_file(path, day) + '.tmp') else last
+
+
+def append(path: str, day: str, data: pd.DataFrame) -> None:
+    """
+    Write 'data' as a new segment of the day. Empty data is not written.
+    """
+
+    if data.empty:
+        return
+
+    recover(path, day)
+    os.makedirs(log_dir(path, day), exist_ok=True)
+
+    n = max([n for n, _ in segments(path, day)], default=0) + 1
+    _replace_file(os.path.join(log_dir(path, day), f"{n:06d}.csv"), lambda f: data.to_csv(f, index=False))
+
+def read_day(path: str, day: str, usecols: List[str] | None = None) -> pd.DataFrame:
+    """
+    Read the rows of the day: the day's csv file followed by segments not yet compacted. 'usecols' selects columns as in pd.read_csv.
+
+    Raises FileNotFoundError if the day has neither.
+    """
+
+    dfs = []
+    try:
+        dfs.append(pd.read_csv(day_file(path, day), usecols=usecols))
+    except FileNotFoundError:
+        pass
+
+    compacted = _compacted_segment(path, day)
+    dfs += [pd.read_csv(segment, usecols=usecols) for n, segment in segments(path, day) if n > compacted]
+
+    if len(dfs) == 0:
+        raise FileNotFoundError(day_file(path, day))
+
+    return pd.concat(dfs, ignore_index=True)
+
+def recover(path: str, day: str) -> None:
+    """
+    Finish or roll back an interrupted compaction of the day.
+    """
+
+    tmp = day_file(path, day) + '.tmp'
+
+    if not os.path.exists(_journal(path, day)):
+        if os.path.exists(tmp): # interrupted before the journal
+            os.remove(tmp)
+        return
+
+    compacted = _compacted_segment(path, day)
+    if compacted == 0: # interrupted before the replacement
+        os.remove(tmp)
+    for n, segment in segments(path, day):
+        if n <= compacted:
+            os.remove(segment)
+    os.remove(_journal(path, day))
+
+def compact(path: str, day: str) -> None:
+    """
+    Merge the segments of the day into the day's csv file.
+    """
+
+    recover(path, day)
+    day_segments = segments(path, day)
+    if len(day_segments) == 0:
+        return
+
+    data = read_day(path, day)
+
+    _write_file(day_file(path, day) + '.tmp', lambda f: data.to_csv(f, index=False))
+    _replace_file(_journal(path, day), lambda f: f.write(str(day_segments[-1][0])))
+    os.replace(day_file(path, day) + '.tmp', day_file(path, day))
+
+    for _, segment in day_segments:
+        os.remove(segment)
+    os.remove(_journal(path, day))
+    if len(os.listdir(log_dir(path, day))) == 0:
+        os.rmdir(log_dir(path, day))